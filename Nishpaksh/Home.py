@@ -198,12 +198,67 @@ if "num_protected_attrs" not in st.session_state:
 # --------------------------------------------------
 # File uploads (widget-only)
 # --------------------------------------------------
-data_file = st.file_uploader(
-    "Upload tabular dataset (CSV)",
-    type=["csv"],
-    key="data_file_input",
+PREVIEW_ROWS = 5000
+COUNTS_SOURCE = "Aggregated counts table (CSV)"
+
+data_source = st.radio(
+    "Dataset source",
+    ["Upload CSV", "Large CSV on disk (chunked evaluation)", COUNTS_SOURCE],
+    horizontal=True,
+    key="data_source_input",
 )
 
+if data_source != COUNTS_SOURCE:
+    st.session_state.pop("count_column", None)
+
+data_file = None
+if data_source == "Upload CSV":
+    data_file = st.file_uploader(
+        "Upload tabular dataset (CSV)",
+        type=["csv"],
+        key="data_file_input",
+    )
+    st.session_state.pop("chunked_source", None)
+elif data_source == COUNTS_SOURCE:
+    data_file = st.file_uploader(
+        "Upload counts table (CSV)",
+        type=["csv"],
+        key="counts_file_input",
+        help="One row per distinct (protected attributes, ground truth, predictions) "
+             "combination with a column holding how many records share it.",
+    )
+    st.session_state.pop("chunked_source", None)
+else:
+    csv_path = st.text_input(
+        "Path to CSV file",
+        value=st.session_state.get("chunked_source", {}).get("path", ""),
+        key="csv_path_input",
+    )
+    chunk_size = st.number_input(
+        "Rows per chunk",
+        min_value=10_000,
+        value=int(st.session_state.get("chunked_source", {}).get("chunk_size", 500_000)),
+        step=50_000,
+        key="chunk_size_input",
+        help="Metrics are computed chunk by chunk; only the ground truth, "
+             f"protected and prediction columns are read. The first {PREVIEW_ROWS} "
+             "rows are loaded for configuration and the other pages.",
+    )
+    if csv_path:
+        if (
+            st.session_state.get("chunked_source", {}).get("path") != csv_path
+            or "uploaded_data" not in st.session_state
+        ):
+            try:
+                data_file = pd.read_csv(csv_path, nrows=PREVIEW_ROWS)
+            except Exception as e:
+                st.error(f"Failed to read CSV at {csv_path}: {e}")
+                st.stop()
+        st.session_state["chunked_source"] = {
+            "path": csv_path,
+            "chunk_size": int(chunk_size),
+        }
+
 model_file = st.file_uploader(
     "Upload trained model (.pkl or .joblib)",
     type=["pkl", "joblib"],
@@ -215,7 +270,7 @@ model_file = st.file_uploader(
 # --------------------------------------------------
 if data_file is not None:
     try:
-        df = pd.read_csv(data_file)
+        df = data_file if isinstance(data_file, pd.DataFrame) else pd.read_csv(data_file)
 
         # Detect dataset change
         if (
@@ -250,6 +305,30 @@ if df is not None:
 
     columns = df.columns.tolist()
 
+    # ------------------------------
+    # Count column (aggregated tables)
+    # ------------------------------
+    if data_source == COUNTS_SOURCE:
+        numeric_cols = [c for c in columns if pd.api.types.is_numeric_dtype(df[c])]
+        if not numeric_cols:
+            st.error("A counts table needs a numeric count column.")
+            st.stop()
+
+        saved_count = st.session_state.get("count_column")
+        count_col = st.selectbox(
+            "Select count column",
+            options=numeric_cols,
+            index=numeric_cols.index(saved_count) if saved_count in numeric_cols else len(numeric_cols) - 1,
+            key="count_column_input",
+        )
+        st.session_state["count_column"] = count_col
+
+        counts = pd.to_numeric(df[count_col], errors="coerce")
+        if counts.isna().any() or (counts < 0).any():
+            st.warning(f"`{count_col}` has missing or negative values; they are counted as 0.")
+        st.caption(f"{len(df):,} rows representing {counts.clip(lower=0).sum():,.0f} records.")
+        columns = [c for c in columns if c != count_col]
+
     # ------------------------------
     # Ground truth
     # ------------------------------
@@ -349,6 +428,8 @@ with st.expander("saved session variables", expanded=False):
             config_display[f"privileged_class_{i}"] = st.session_state[f"privileged_class_{i}"]
 
     config_display["uploaded_data_present"] = "uploaded_data" in st.session_state
+    config_display["chunked_source"] = st.session_state.get("chunked_source")
+    config_display["count_column"] = st.session_state.get("count_column")
     config_display["model_file_present"] = "model_file" in st.session_state
 
     st.json(config_display)
@@ -144,6 +144,7 @@ problem = st.radio(
 )
 
 st.markdown(f"**Problem type:** `{problem}`")
+st.session_state["problem_type"] = problem
 
 # --------------------------------------------------
 # Guard + reconstruct protected attributes (AUTHORITATIVE)
@@ -188,7 +189,7 @@ if not isinstance(ground_truth, str) or ground_truth == "":
 # --------------------------------------------------
 # Fairness metrics (UNCHANGED)
 # --------------------------------------------------
-GROUP_METRICS = [
+CLASSIFICATION_METRICS = [
     "Statistical Parity Difference",
     "Disparate Impact",
     "Average Odds Difference",
@@ -197,6 +198,30 @@ GROUP_METRICS = [
     "Calibration Difference (global)",
 ]
 
+# Computed from grouped sums of targets, predictions and residuals; the mean
+# differences and the Wasserstein distance are in target standard deviations
+REGRESSION_METRICS = [
+    "Mean Residual Difference",
+    "Mean Prediction Difference",
+    "MAE Ratio",
+    "RMSE Ratio",
+    "Bounded Group Loss",
+    "KS Distance",
+    "Wasserstein Distance",
+]
+
+# Computed from per-query ranks of (query, item, score) impressions
+RANKING_METRICS = [
+    "Exposure Ratio",
+    "Top-k Selection Parity Difference",
+    "Attention-Weighted Disparity",
+]
+
+GROUP_METRICS = {
+    "regression": REGRESSION_METRICS,
+    "recommendation": RANKING_METRICS,
+}.get(problem, CLASSIFICATION_METRICS)
+
 DEFAULTS = {
     "Statistical Parity Difference": 0.10,
     "Disparate Impact": 0.20,
@@ -204,6 +229,16 @@ DEFAULTS = {
     "Equal Opportunity Difference": 0.10,
     "Error Rate Difference": 0.10,
     "Calibration Difference (global)": 0.05,
+    "Mean Residual Difference": 0.10,
+    "Mean Prediction Difference": 0.10,
+    "MAE Ratio": 0.20,
+    "RMSE Ratio": 0.20,
+    "Bounded Group Loss": 0.50,
+    "KS Distance": 0.10,
+    "Wasserstein Distance": 0.10,
+    "Exposure Ratio": 0.20,
+    "Top-k Selection Parity Difference": 0.10,
+    "Attention-Weighted Disparity": 0.10,
 }
 
 # --------------------------------------------------
@@ -231,6 +266,8 @@ for p in protected_attrs:
     if sel_key not in st.session_state or st.session_state.get(prob_key) != problem:
         st.session_state[sel_key] = {m: True for m in GROUP_METRICS}
         st.session_state[prob_key] = problem
+        for m in [m for m in attr_thresholds if m not in GROUP_METRICS]:
+            attr_thresholds.pop(m)
 
     # -------------------------------
     # Select / Clear buttons (2-col)
@@ -259,14 +296,14 @@ for p in protected_attrs:
     st.markdown("### Choose fairness metrics")
 
     # -------------------------------
-    # Metrics grid (2 × 3, HARD SAFE)
+    # Metrics grid (2 columns, HARD SAFE)
     # Each metric in its OWN container
     # -------------------------------
     col_left, col_right = st.columns(2, gap="large")
     metric_cols = [col_left, col_right]
 
     for idx_m, metric in enumerate(GROUP_METRICS):
-        target_col = metric_cols[idx_m // 3]
+        target_col = metric_cols[idx_m // math.ceil(len(GROUP_METRICS) / 2)]
 
         with target_col:
             with st.container():  # 🔒 CRITICAL: isolates CSS
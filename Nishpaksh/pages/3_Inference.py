@@ -8,9 +8,46 @@ import numpy as np
 
 import hashlib
 
-from utils.two_class_metrics import GroupMetrics, FairnessMetrics
+from utils.two_class_metrics import (
+    CALIBRATION_METRIC,
+    COUNT_METRICS,
+    GroupMetrics,
+    FairnessMetrics,
+    RATIO_METRICS,
+    calibration_from_sums,
+    calibration_sums,
+    calibration_sums_from_counts,
+    collapse_duplicates,
+    confusion_tensor_multi,
+    effective_counts,
+    encode_groups,
+    individual_entropy,
+    kish_effective_size,
+    metrics_from_tensor,
+    privileged_mask,
+    resample_counts,
+    worst_group_disparities,
+)
+from utils.bootstrap import adaptive_bootstrap, paired_bootstrap_counts, paired_differences
+from utils.confidence_intervals import analytic_intervals, intervals_frame
+from utils.counterfactual import counterfactual_flips, iter_frame_chunks
+from utils.intersectional import intersectional_group_tables
+from utils.permutation import PVALUE_CORRECTIONS, permutation_pvalues, pvalue_tables
+from utils.chunked import (
+    accumulate_csv,
+    accumulate_multiclass_csv,
+    accumulate_ranking_csv,
+    accumulate_regression_csv,
+)
+from utils.ranking_metrics import RANKING_RATIO_METRICS
+from utils.multiclass_metrics import aggregate_classes, class_labels
+from utils.scoring import ScoreCache, ScoringService, model_digest
+from utils.regression_metrics import REGRESSION_RATIO_METRICS, bin_edges
+from utils.slice_finder import SLICE_METRICS, discretize, find_slices
+from utils.threshold_sweep import threshold_sweep, select_operating_point
 from utils.viz_utils import (
     _as01,
+    _as01_matrix,
     plot_bar_single_metric,
     plot_line_single_metric,
     plot_fairness_error_bars,
@@ -19,6 +56,7 @@ from utils.viz_utils import (
     plot_disparity_in_performance,
     plot_group_error_panel,
     plot_fairness_accuracy_scatter,
+    plot_threshold_sweep,
 )
 
 # --------------------------------------------------
@@ -144,6 +182,9 @@ st.markdown(
 data = st.session_state.get("uploaded_data")
 ground_truth = st.session_state.get("ground_truth")
 num_protected = st.session_state.get("num_protected_attrs")
+chunked_source = st.session_state.get("chunked_source")
+# Aggregated (group, label, prediction, count) tables: the count column weights every row
+COUNT_COL = st.session_state.get("count_column")
 
 if not isinstance(data, pd.DataFrame) or data.empty:
     st.warning("No dataset available. Complete earlier steps first.")
@@ -153,6 +194,9 @@ if not isinstance(ground_truth, str) or ground_truth == "":
     st.error("Ground truth must be set on the Home page.")
     st.stop()
 
+if COUNT_COL not in data.columns:
+    COUNT_COL = None
+
 if not isinstance(num_protected, int) or num_protected < 1:
     st.error("Protected attributes not configured on Home page.")
     st.stop()
@@ -172,17 +216,489 @@ for i in range(1, num_protected + 1):
     protected_attrs.append(
         {"attribute": attr, "privileged_class": priv}
     )
+protected_cols = {p["attribute"] for p in protected_attrs}
+
+
+def weight_array(df, weight_col):
+    if weight_col is None:
+        return None
+    w = pd.to_numeric(df[weight_col], errors="coerce").fillna(0).to_numpy(dtype=float)
+    return np.clip(w, 0, None)
+
+
+def prediction_columns(frame):
+    """
+    (pred_cols, score_candidates) of `frame`: binary 0/1 prediction columns,
+    and continuous scores / probabilities (numeric, non-binary, not an attribute).
+    """
+    pred_cols = [
+        c for c in frame.columns
+        if c != ground_truth
+        and c != COUNT_COL
+        and set(pd.Series(frame[c]).dropna().unique()).issubset({0, 1})
+    ]
+    score_candidates = [
+        c for c in frame.columns
+        if c != ground_truth
+        and c != COUNT_COL
+        and c not in pred_cols
+        and c not in protected_cols
+        and pd.api.types.is_numeric_dtype(frame[c])
+        and frame[c].nunique(dropna=True) > 2
+    ]
+    return pred_cols, score_candidates
+
+# --------------------------------------------------
+# Model-in-the-loop scoring
+# --------------------------------------------------
+def scoring_service():
+    """
+    Worker pool serving the model uploaded on the Home page, started once
+    per distinct file. The model is only ever unpickled in the workers.
+    """
+    model_file = st.session_state.get("model_file")
+    if model_file is None:
+        return None
+    raw = model_file.getvalue()
+    service = st.session_state.get("scoring_service")
+    if service is None or service.digest != model_digest(raw):
+        if service is not None:
+            service.close()
+        st.session_state.pop("scoring_service", None)
+        service = ScoringService(raw)
+        st.session_state["scoring_service"] = service
+    return service
+
+
+model_file = st.session_state.get("model_file")
+if model_file is not None:
+    with st.expander("Score the uploaded model", expanded=False):
+        stem = "".join(ch if ch.isalnum() else "_" for ch in model_file.name.rsplit(".", 1)[0]) or "model"
+        out_pred, out_score = f"{stem}_pred", f"{stem}_score"
+
+        if chunked_source:
+            st.info("Scoring appends columns to the in-memory data and is not available in chunked mode.")
+        else:
+            st.caption(
+                f"Runs `{model_file.name}` in separate worker processes, in batches, and adds "
+                f"`{out_pred}` (and `{out_score}` for classifiers with probabilities) to the "
+                "data. Results are reused while neither the model nor its input columns change."
+            )
+            sc1, sc2 = st.columns(2)
+            scoring_chunk = int(sc1.number_input(
+                "Rows per batch", min_value=1_000, value=50_000, step=10_000, key="scoring_chunk"
+            ))
+            if out_pred in data.columns:
+                sc2.success(f"`{out_pred}` is in the data.")
+
+            if st.button("Score dataset"):
+                with st.spinner("Scoring…"):
+                    try:
+                        service = scoring_service()
+                        service.chunk_size = scoring_chunk
+                        # Other models' predictions and scores are outputs, not features;
+                        # protected attributes stay model inputs
+                        outputs = set().union(*prediction_columns(data)) - protected_cols
+                        features = service.features(
+                            data.columns, exclude={ground_truth, COUNT_COL, out_pred, out_score, *outputs}
+                        )
+                        scored = service.score(
+                            data, features, cache=st.session_state.setdefault("scoring_cache", ScoreCache())
+                        )
+                    except Exception as e:
+                        failed = st.session_state.pop("scoring_service", None)
+                        if failed is not None:
+                            failed.close()
+                        st.error(f"Scoring failed: {e}")
+                        st.stop()
+
+                # New columns on the session's frame; existing columns are not copied
+                data[out_pred] = scored["pred"]
+                if scored["score"] is not None:
+                    data[out_score] = scored["score"]
+                st.success(f"Scored {len(data):,} rows with `{service.info['type']}`.")
+
+
+# --------------------------------------------------
+# Regression, ranking and multi-class problems
+# --------------------------------------------------
+# The in-memory frame and a chunked file go through the same accumulators,
+# so these problem types share one compute, store and display path.
+PROBLEM_SOURCE = (chunked_source["path"], chunked_source["chunk_size"]) if chunked_source else (data, len(data))
+
+
+def results_from_accumulators(accs, row, **tables):
+    """
+    Session entries from {attr: {model: accumulator}}: results_by_attr with
+    one row(acc) per model and, for every keyword, {attr: {model: table(acc)}}
+    under that name.
+    """
+    results = {
+        "results_by_attr": {
+            attr: pd.DataFrame([{"Model": col, **row(acc)} for col, acc in by_model.items()])
+            for attr, by_model in accs.items()
+        }
+    }
+    for name, table in tables.items():
+        results[name] = {
+            attr: {col: table(acc) for col, acc in by_model.items()} for attr, by_model in accs.items()
+        }
+    return results
+
+
+def problem_key(problem, *parts):
+    """Compute key of a problem type's inputs, the protected attributes and the chunked source."""
+    h = hashlib.sha256()
+    h.update(":".join([problem, *map(str, parts), str(data.shape)]).encode())
+    for p in protected_attrs:
+        h.update(f"{p['attribute']}={p['privileged_class']}".encode())
+    if chunked_source:
+        h.update(f"{chunked_source['path']}:{chunked_source['chunk_size']}".encode())
+    return h.hexdigest()
+
+
+def problem_results(problem, compute_key, compute):
+    """
+    Store the entries compute() returns as the inference results of
+    `problem` when "Compute metrics" is pressed. Returns the stored results,
+    or stops the page until they exist for the current inputs.
+    """
+    if st.button("Compute metrics"):
+        with st.spinner("Computing metrics…"):
+            results = compute()
+
+        st.session_state["inference"] = {
+            "completed": True,
+            "compute_key": compute_key,
+            "problem": problem,
+            "bootstrap_by_attr": {},
+            "intervals_by_attr": {},
+            "bootstrap_info": None,
+            "calibration_by_attr": {},
+            "intersectional_by_model": None,
+            "y_true": None,
+            "chunked": bool(chunked_source),
+            **results,
+        }
+        st.session_state["metrics_ready"] = True
+
+    inference = st.session_state.get("inference") or {}
+    if not st.session_state.get("metrics_ready") or inference.get("problem") != problem:
+        st.stop()
+    if inference["compute_key"] != compute_key:
+        st.warning("Inputs changed. Please recompute metrics.")
+        st.stop()
+    return inference
+
+
+def show_problem_results(inference, title, models, detail_title, detail_key, key_prefix,
+                         ratio_metrics=RATIO_METRICS):
+    """Per protected attribute: the model table and plot, one model's `detail_key` table and its group tables."""
+    for sens_col, df_res in inference["results_by_attr"].items():
+        st.markdown(f"## {title} — `{sens_col}`")
+        st.dataframe(df_res, use_container_width=True, hide_index=True)
+
+        metric = st.selectbox(
+            f"Metric ({sens_col})",
+            [c for c in df_res.columns if c != "Model"],
+            key=f"{key_prefix}_metric_{sens_col}",
+        )
+        st.pyplot(plot_bar_single_metric(df_res, metric))
+
+        model = st.selectbox(f"Model ({sens_col})", models, key=f"{key_prefix}_model_{sens_col}")
+        st.markdown(f"#### {detail_title}")
+        st.dataframe(inference[detail_key][sens_col][model], use_container_width=True)
+
+        group_table = inference["group_tables_by_attr"][sens_col][model]
+        st.markdown("#### Each group vs privileged class")
+        st.dataframe(group_table, use_container_width=True)
+        st.markdown("#### Worst-group disparities")
+        st.dataframe(
+            worst_group_disparities(group_table, ratio_metrics=ratio_metrics),
+            use_container_width=True,
+            hide_index=True,
+        )
+
+
+# --------------------------------------------------
+# Regression models (problem type set on the Metrics & Thresholds page)
+# --------------------------------------------------
+def compute_regression_metrics(source, chunk_size, label_col, pred_cols, protected_attrs, edges,
+                               weight_col=None):
+    """
+    Regression fairness per (protected attribute, model) from grouped sums
+    with fixed histogram edges. Returns the results_by_attr,
+    group_tables_by_attr and group_summaries_by_attr entries.
+    """
+    accs = accumulate_regression_csv(
+        source, label_col, pred_cols, protected_attrs, edges,
+        chunk_size=chunk_size, weight_col=weight_col,
+    )
+    return results_from_accumulators(
+        accs,
+        lambda acc: acc.metrics(),
+        group_tables_by_attr=lambda acc: acc.group_table(),
+        group_summaries_by_attr=lambda acc: acc.group_summary(),
+    )
+
+
+if st.session_state.get("problem_type") == "regression":
+    if pd.to_numeric(data[ground_truth], errors="coerce").notna().mean() < 0.5:
+        st.error(f"Ground truth `{ground_truth}` is not numeric; regression metrics need a continuous target.")
+        st.stop()
+
+    reg_protected = {p["attribute"] for p in protected_attrs}
+    numeric_cols = [
+        c for c in data.columns
+        if c not in (ground_truth, COUNT_COL)
+        and c not in reg_protected
+        and pd.api.types.is_numeric_dtype(data[c])
+    ]
+
+    rc1, rc2 = st.columns(2)
+    if COUNT_COL:
+        REG_WEIGHT_COL = COUNT_COL
+        rc1.info(f"Counts table: every row stands for `{COUNT_COL}` records.")
+    else:
+        reg_weight = rc1.selectbox(
+            "Sample weight column",
+            ["(none)", *numeric_cols],
+            help="Survey or frequency weights; every sum becomes a weighted sum.",
+        )
+        REG_WEIGHT_COL = None if reg_weight == "(none)" else reg_weight
+    REG_BINS = int(rc2.number_input(
+        "Histogram bins",
+        min_value=10,
+        max_value=10_000,
+        value=200,
+        step=10,
+        help="Bins of the prediction histograms behind the KS and Wasserstein distances.",
+    ))
+
+    reg_candidates = [c for c in numeric_cols if c != REG_WEIGHT_COL]
+    REG_PRED_COLS = st.multiselect("Prediction columns", reg_candidates, default=reg_candidates)
+    if not REG_PRED_COLS:
+        st.error("Select at least one prediction column.")
+        st.stop()
+
+    reg_key = problem_key("regression", ground_truth, REG_WEIGHT_COL, REG_BINS, ",".join(REG_PRED_COLS))
+
+    def compute():
+        # Histogram edges are fixed from the data (the preview when chunked) before streaming
+        preview = np.column_stack([pd.to_numeric(data[c], errors="coerce") for c in REG_PRED_COLS])
+        return compute_regression_metrics(
+            *PROBLEM_SOURCE,
+            ground_truth,
+            REG_PRED_COLS,
+            protected_attrs,
+            bin_edges(preview, REG_BINS),
+            weight_col=REG_WEIGHT_COL,
+        )
+
+    show_problem_results(
+        problem_results("regression", reg_key, compute),
+        "Regression fairness",
+        REG_PRED_COLS,
+        "Per-group errors",
+        "group_summaries_by_attr",
+        "reg",
+        ratio_metrics=REGRESSION_RATIO_METRICS,
+    )
+    st.stop()
+
+# --------------------------------------------------
+# Ranked outputs (problem type "recommendation")
+# --------------------------------------------------
+def compute_ranking_metrics(source, chunk_size, query_col, score_cols, protected_attrs, k=10, patience=0.5):
+    """
+    Exposure fairness per (protected attribute, model) of the rankings the
+    score columns induce within each query. Returns the results_by_attr,
+    group_tables_by_attr and group_summaries_by_attr entries.
+    """
+    accs = accumulate_ranking_csv(
+        source, query_col, score_cols, protected_attrs, k=k, patience=patience, chunk_size=chunk_size,
+    )
+    return results_from_accumulators(
+        accs,
+        lambda acc: acc.metrics(),
+        group_tables_by_attr=lambda acc: acc.group_table(),
+        group_summaries_by_attr=lambda acc: acc.group_summary(),
+    )
+
+
+if st.session_state.get("problem_type") == "recommendation":
+    rk_protected = {p["attribute"] for p in protected_attrs}
+    rk_columns = [c for c in data.columns if c not in rk_protected]
+
+    rk1, rk2, rk3 = st.columns(3)
+    QUERY_COL = rk1.selectbox(
+        "Query / user id column",
+        rk_columns,
+        help="Items are ranked against the other items of the same query.",
+    )
+    TOP_K = int(rk2.number_input("Slate size k", min_value=1, value=10, step=1))
+    PATIENCE = float(rk3.number_input(
+        "User patience",
+        min_value=0.0,
+        max_value=0.99,
+        value=0.5,
+        step=0.05,
+        help="Probability of moving on to the next position; position r gets "
+             "attention patience^(r-1) * (1 - patience).",
+    ))
+
+    score_options = [
+        c for c in rk_columns
+        if c not in (QUERY_COL, ground_truth)
+        and pd.api.types.is_numeric_dtype(data[c])
+    ]
+    RANK_SCORE_COLS = st.multiselect("Ranking score columns", score_options, default=score_options[:1])
+    if not RANK_SCORE_COLS:
+        st.error("Select at least one score column.")
+        st.stop()
+
+    if chunked_source:
+        st.caption("The file is streamed one query at a time and must be grouped by the query column.")
+
+    rk_key = problem_key("ranking", QUERY_COL, TOP_K, PATIENCE, ",".join(RANK_SCORE_COLS))
+
+    show_problem_results(
+        problem_results(
+            "recommendation",
+            rk_key,
+            lambda: compute_ranking_metrics(
+                *PROBLEM_SOURCE, QUERY_COL, RANK_SCORE_COLS, protected_attrs, k=TOP_K, patience=PATIENCE,
+            ),
+        ),
+        f"Exposure fairness (top {TOP_K})",
+        RANK_SCORE_COLS,
+        "Exposure by group",
+        "group_summaries_by_attr",
+        "rk",
+        ratio_metrics=RANKING_RATIO_METRICS,
+    )
+    st.stop()
+
+# --------------------------------------------------
+# Multi-class models (one-vs-rest per class)
+# --------------------------------------------------
+def sorted_classes(values):
+    """Distinct class labels, in numeric order when they are all numbers."""
+    classes = pd.unique(pd.Series(class_labels(values)).dropna()).tolist()
+    try:
+        return sorted(classes, key=float)
+    except ValueError:
+        return sorted(classes)
+
+
+def compute_multiclass_metrics(source, chunk_size, label_col, pred_cols, protected_attrs, classes,
+                               how="macro", weight_col=None):
+    """
+    One (group x true class x predicted class) count tensor per protected
+    attribute and model. Returns the results_by_attr (class metrics
+    aggregated with `how`), group_tables_by_attr and class_tables_by_attr
+    entries.
+    """
+    accs = accumulate_multiclass_csv(
+        source, label_col, pred_cols, protected_attrs, classes,
+        chunk_size=chunk_size, weight_col=weight_col,
+    )
+    return results_from_accumulators(
+        accs,
+        lambda acc: {m: float(v) for m, v in aggregate_classes(acc.per_class(), how).items()},
+        group_tables_by_attr=lambda acc: acc.group_table(how),
+        class_tables_by_attr=lambda acc: acc.class_table(),
+    )
+
+
+MAX_CLASSES = 50
+
+CLASSES = sorted_classes(data[ground_truth])
+MULTICLASS = 2 < len(CLASSES) <= MAX_CLASSES and st.checkbox(
+    f"Multi-class evaluation ({len(CLASSES)} classes in `{ground_truth}`)",
+    value=True,
+    help="Every class is scored one-vs-rest from a single (group x true class x "
+         "predicted class) count tensor. Untick to binarise against one positive class.",
+)
+
+if MULTICLASS:
+    mc_protected = {p["attribute"] for p in protected_attrs}
+    class_set = set(CLASSES)
+    mc_candidates = [
+        c for c in data.columns
+        if c not in (ground_truth, COUNT_COL)
+        and c not in mc_protected
+        and set(pd.Series(class_labels(data[c])).dropna()).issubset(class_set)
+    ]
+    if not mc_candidates:
+        st.error(f"No prediction columns with values among the classes of `{ground_truth}` detected.")
+        st.stop()
+
+    mc1, mc2 = st.columns(2)
+    if COUNT_COL:
+        MC_WEIGHT_COL = COUNT_COL
+        mc1.info(f"Counts table: every row stands for `{COUNT_COL}` records.")
+    else:
+        mc_weights = [
+            c for c in data.columns
+            if c not in (ground_truth, *mc_candidates)
+            and c not in mc_protected
+            and pd.api.types.is_numeric_dtype(data[c])
+        ]
+        mc_weight = mc1.selectbox(
+            "Sample weight column",
+            ["(none)", *mc_weights],
+            help="Survey or frequency weights; every count becomes a sum of weights.",
+        )
+        MC_WEIGHT_COL = None if mc_weight == "(none)" else mc_weight
+    CLASS_AGG = mc2.selectbox(
+        "Class aggregation (Bias Index)",
+        ["macro", "worst"],
+        format_func={"macro": "Macro: mean |per-class value|", "worst": "Worst class"}.get,
+    )
+
+    MC_PRED_COLS = st.multiselect("Prediction columns", mc_candidates, default=mc_candidates)
+    if not MC_PRED_COLS:
+        st.error("Select at least one prediction column.")
+        st.stop()
+
+    mc_key = problem_key(
+        "multiclass", ground_truth, MC_WEIGHT_COL, CLASS_AGG, ",".join(MC_PRED_COLS), ",".join(CLASSES)
+    )
+
+    if chunked_source:
+        st.caption(
+            f"Classes are taken from the preview ({', '.join(CLASSES)}); rows with "
+            "other labels or predictions are skipped."
+        )
+
+    show_problem_results(
+        problem_results(
+            "multiclass",
+            mc_key,
+            lambda: compute_multiclass_metrics(
+                *PROBLEM_SOURCE, ground_truth, MC_PRED_COLS, protected_attrs, CLASSES,
+                how=CLASS_AGG, weight_col=MC_WEIGHT_COL,
+            ),
+        ),
+        f"Multi-class fairness ({CLASS_AGG} over classes)",
+        MC_PRED_COLS,
+        "Per class (one-vs-rest)",
+        "class_tables_by_attr",
+        "mc",
+    )
+    st.stop()
 
 # --------------------------------------------------
 # Detect prediction columns
 # --------------------------------------------------
-pred_cols = [
-    c for c in data.columns
-    if c != ground_truth
-    and set(pd.Series(data[c]).dropna().unique()).issubset({0, 1})
+pred_cols, score_candidates = prediction_columns(data)
+default_scores = [
+    c for c in score_candidates
+    if data[c].min() >= 0 and data[c].max() <= 1
 ]
 
-if not pred_cols:
+if not pred_cols and not default_scores:
     st.error("No prediction columns detected.")
     st.stop()
 
@@ -204,11 +720,511 @@ POS_TRUE = c1.selectbox(
     label_vals,
     index=label_vals.index(_guess_positive(label_vals)),
 )
-POS_PRED = c2.selectbox(
-    "Positive class (predictions)",
-    pred_vals,
-    index=pred_vals.index(_guess_positive(pred_vals)),
-)
+POS_PRED = None
+if pred_vals:
+    POS_PRED = c2.selectbox(
+        "Positive class (predictions)",
+        pred_vals,
+        index=pred_vals.index(_guess_positive(pred_vals)),
+    )
+
+# --------------------------------------------------
+# Sample weights
+# --------------------------------------------------
+NO_WEIGHTS = "(none)"
+weight_candidates = [
+    c for c in data.columns
+    if c != ground_truth
+    and c not in pred_cols
+    and c not in protected_cols
+    and pd.api.types.is_numeric_dtype(data[c])
+]
+
+# Survey weights scale the estimates but not the sample size; frequency
+# weights are record multiplicities and count as rows
+WEIGHT_KINDS = {
+    "Survey (sampling) weights": True,
+    "Frequency weights (row multiplicities)": False,
+}
+SURVEY_WEIGHTS = False
+
+wc1, wc2 = st.columns(2)
+if COUNT_COL:
+    WEIGHT_COL = COUNT_COL
+    wc1.info(
+        f"Counts table: every row stands for `{COUNT_COL}` records "
+        f"({pd.to_numeric(data[COUNT_COL], errors='coerce').clip(lower=0).sum():,.0f} in total)."
+    )
+else:
+    weight_choice = wc1.selectbox(
+        "Sample weight column",
+        [NO_WEIGHTS, *weight_candidates],
+        help="Survey or frequency weights; every count becomes a sum of weights.",
+    )
+    WEIGHT_COL = None if weight_choice == NO_WEIGHTS else weight_choice
+    if WEIGHT_COL:
+        SURVEY_WEIGHTS = WEIGHT_KINDS[wc1.radio(
+            "Weight type",
+            list(WEIGHT_KINDS),
+            help="Survey weights: confidence intervals and tests reflect the rows "
+                 "actually observed (Kish effective sample size), whatever the scale "
+                 "of the weights. Frequency weights: a weight of k stands for k records.",
+        )]
+COLLAPSE = False
+if not chunked_source and not COUNT_COL:
+    COLLAPSE = wc2.checkbox(
+        "Collapse duplicate rows into weights",
+        value=False,
+        disabled=SURVEY_WEIGHTS,
+        help="Identical (label, protected attributes, predictions, scores) rows are "
+             "evaluated once with their multiplicity as weight. Metrics are unchanged. "
+             "Not available with survey weights, whose rows must stay distinct.",
+    ) and not SURVEY_WEIGHTS
+
+
+# --------------------------------------------------
+# Threshold sweep over score columns
+# --------------------------------------------------
+# Cached on its arguments: widget clicks elsewhere on the page rerun the
+# script but not the sort and sweep of the score column
+@st.cache_data(show_spinner="Sweeping thresholds…", max_entries=8)
+def compute_threshold_curve(df, label_col, score_col, sens_col, priv_val, pos_true, max_points, metrics,
+                            weight_col=None):
+    y_true = _as01(df[label_col].values, positive=pos_true)
+    scores = pd.to_numeric(df[score_col], errors="coerce").to_numpy(dtype=float)
+    codes, labels = encode_groups(df[sens_col].astype(str).values)
+    return threshold_sweep(
+        y_true, scores, codes, len(labels), privileged_mask(labels, priv_val),
+        max_points=max_points, metrics=metrics, sample_weight=weight_array(df, weight_col),
+    )
+
+
+with st.expander(" Threshold sweep from score columns", expanded=not pred_cols):
+    if chunked_source:
+        st.info("Threshold sweeps need the full score column and are not available in chunked mode.")
+    elif not score_candidates:
+        st.info("No numeric score or probability columns detected.")
+    else:
+        sc1, sc2, sc3 = st.columns(3)
+        score_col = sc1.selectbox(
+            "Score column",
+            score_candidates,
+            index=score_candidates.index(default_scores[0]) if default_scores else 0,
+            help="Rows scoring at or above the threshold are predicted positive.",
+        )
+        sweep_attr = sc2.selectbox(
+            "Protected attribute",
+            [p["attribute"] for p in protected_attrs],
+            key="sweep_attr",
+        )
+        max_points = int(sc3.number_input(
+            "Max thresholds", min_value=10, value=1001, step=100,
+            help="All distinct scores are used up to this many; beyond that, score quantiles.",
+        ))
+
+        # Tolerances from the Metrics & Thresholds page, SPD/EOD by default
+        attr_limits = {
+            m: cfg["value"]
+            for m, cfg in st.session_state.get("thresholds", {}).get(sweep_attr, {}).items()
+            if m in COUNT_METRICS
+        } or {"Statistical Parity Difference": 0.1, "Equal Opportunity Difference": 0.1}
+        shown = list(dict.fromkeys(
+            ["Statistical Parity Difference", "Equal Opportunity Difference", *attr_limits]
+        ))
+
+        priv_value = next(p["privileged_class"] for p in protected_attrs if p["attribute"] == sweep_attr)
+        sweep_columns = list(dict.fromkeys([ground_truth, score_col, sweep_attr, *([WEIGHT_COL] if WEIGHT_COL else [])]))
+        curve = compute_threshold_curve(
+            data[sweep_columns], ground_truth, score_col, sweep_attr, priv_value, POS_TRUE, max_points, shown,
+            weight_col=WEIGHT_COL,
+        )
+        best = select_operating_point(curve, attr_limits, objective="Accuracy")
+        st.pyplot(
+            plot_threshold_sweep(
+                curve, shown, limits=attr_limits,
+                operating_point=None if best is None else float(best["Threshold"]),
+                title=f"{score_col} across thresholds ({sweep_attr})",
+            )
+        )
+
+        if best is None:
+            st.warning("No threshold keeps every selected metric within its tolerance.")
+        else:
+            st.success(
+                f"Most accurate threshold within tolerance: **{best['Threshold']:.4f}** "
+                f"(accuracy {best['Accuracy']:.3f}, selection rate {best['Selection Rate']:.3f})"
+            )
+            st.dataframe(
+                best[["Threshold", "Accuracy", "Selection Rate", *attr_limits]].to_frame("Value"),
+                use_container_width=True,
+            )
+
+if not pred_cols:
+    st.info("No binary prediction columns detected; only the threshold sweep is available.")
+    st.stop()
+
+# --------------------------------------------------
+# Worst-performing slices
+# --------------------------------------------------
+def compute_slices(df, label_col, pred_col, feature_cols, pos_true, pos_pred, metric, min_support=30,
+                   max_level=3, top_k=10, n_bins=4, weight_col=None):
+    _, codes, labels = discretize(df, feature_cols, n_bins=n_bins)
+    return find_slices(
+        codes, labels,
+        _as01(df[label_col].values, positive=pos_true),
+        _as01(df[pred_col].values, positive=pos_pred),
+        metric, min_support=min_support, max_level=max_level, top_k=top_k,
+        sample_weight=weight_array(df, weight_col),
+    )
+
+
+with st.expander("Worst-performing slices", expanded=False):
+    feature_candidates = [
+        c for c in data.columns
+        if c not in {ground_truth, COUNT_COL, WEIGHT_COL, *pred_cols, *score_candidates}
+    ]
+    if chunked_source:
+        st.info("Slice search needs every feature column in memory and is not available in chunked mode.")
+    elif not feature_candidates:
+        st.info("No feature columns to slice on.")
+    else:
+        st.caption(
+            "Searches conjunctions of up to three feature values (numeric features "
+            "cut at quartiles) for the subgroups whose rate differs most from the "
+            "whole population, not only the declared protected attributes."
+        )
+        sl1, sl2, sl3 = st.columns(3)
+        slice_model = sl1.selectbox("Model", pred_cols, key="slice_model")
+        slice_metric = sl2.selectbox("Rate", list(SLICE_METRICS), key="slice_metric")
+        slice_features = sl3.multiselect(
+            "Features", feature_candidates, default=feature_candidates, key="slice_features"
+        )
+        sl4, sl5, sl6 = st.columns(3)
+        slice_support = int(sl4.number_input(
+            "Minimum support", min_value=1, value=30, step=10,
+            help="Rows (or total weight) in the rate's denominator, e.g. actual "
+                 "positives for the true positive rate.",
+        ))
+        slice_level = int(sl5.number_input("Max items per slice", min_value=1, max_value=4, value=3))
+        slice_top_k = int(sl6.number_input("Slices to show", min_value=1, max_value=100, value=10))
+
+        if st.button("Find slices", disabled=not slice_features):
+            with st.spinner("Searching slices…"):
+                table, stats = compute_slices(
+                    data, ground_truth, slice_model, slice_features, POS_TRUE, POS_PRED, slice_metric,
+                    min_support=slice_support, max_level=slice_level, top_k=slice_top_k,
+                    weight_col=WEIGHT_COL,
+                )
+            st.write(
+                f"Overall {slice_metric.lower()}: **{stats['overall_rate']:.3f}** — "
+                f"{stats['slices']:,} slices over {stats['feature_sets']:,} feature combinations searched."
+            )
+            if not stats["complete"]:
+                st.caption("Beyond two items only the most unfair slices were refined further.")
+            empty = [c for c in slice_features if data[c].isna().all()]
+            if empty:
+                st.caption(f"Skipped features with no values: {', '.join(empty)}.")
+            if table.empty:
+                st.info("No slice reaches the minimum support.")
+            else:
+                st.dataframe(table.set_index("Slice"), use_container_width=True)
+
+# --------------------------------------------------
+# Counterfactual fairness of the uploaded model
+# --------------------------------------------------
+def compute_counterfactuals(predict, source, features, categories, pos_pred, joint=True, chunk_size=50_000,
+                            weight_col=None):
+    """Flip tables of `predict` over an in-memory frame or, for a path, the streamed CSV."""
+    columns = list(dict.fromkeys([*features, *([weight_col] if weight_col else [])]))
+    if isinstance(source, pd.DataFrame):
+        chunks = (chunk[columns] for chunk in iter_frame_chunks(source, chunk_size))
+    else:
+        chunks = pd.read_csv(source, usecols=columns, chunksize=chunk_size)
+    return counterfactual_flips(
+        predict, chunks, features, categories, positive=pos_pred, joint=joint, weight_col=weight_col,
+    )
+
+
+with st.expander("Counterfactual fairness (uploaded model)", expanded=False):
+    if st.session_state.get("model_file") is None:
+        st.info("Upload the trained model on the Home page to swap protected attributes and re-score it.")
+    elif COUNT_COL:
+        st.info("A counts table holds no feature rows to re-score.")
+    else:
+        # The model is only loaded once the analysis is run: expanders render
+        # (collapsed or not) on every rerun
+        st.caption(
+            "Each protected attribute that is a model input is set to every one of its "
+            "categories (and, jointly, every combination) and the model is re-scored chunk "
+            "by chunk. A flip is a changed prediction; rows already holding the value are not counted."
+            + (" Categories come from the preview rows." if chunked_source else "")
+        )
+        cc1, cc2 = st.columns(2)
+        cf_joint = cc1.checkbox("Joint combinations across attributes", value=len(protected_attrs) > 1)
+        cf_chunk = int(cc2.number_input("Rows per batch", min_value=1_000, value=50_000, step=10_000))
+
+        if st.button("Run counterfactual analysis"):
+            try:
+                cf_service = scoring_service()
+                cf_features = cf_service.features(
+                    data.columns,
+                    exclude={ground_truth, WEIGHT_COL, *pred_cols, *score_candidates},
+                )
+            except Exception as e:
+                st.error(f"Could not use the uploaded model: {e}")
+                st.stop()
+
+            cf_attrs = [p["attribute"] for p in protected_attrs if p["attribute"] in cf_features]
+            skipped = [p["attribute"] for p in protected_attrs if p["attribute"] not in cf_features]
+            if skipped:
+                st.caption(f"Not a model input, so never swapped: {', '.join(skipped)}")
+
+            if not cf_attrs:
+                st.info("None of the protected attributes is an input of the model.")
+            else:
+                categories = {a: sorted(data[a].dropna().unique().tolist()) for a in cf_attrs}
+                with st.spinner("Re-scoring counterfactual rows…"):
+                    try:
+                        flip_table, flip_summary = compute_counterfactuals(
+                            cf_service.predict,
+                            chunked_source["path"] if chunked_source else data,
+                            cf_features,
+                            categories,
+                            POS_PRED,
+                            joint=cf_joint,
+                            chunk_size=cf_chunk,
+                            weight_col=WEIGHT_COL,
+                        )
+                    except Exception as e:
+                        st.error(f"Counterfactual scoring failed: {e}")
+                        st.stop()
+
+                st.markdown("#### Share of each group with any flipped prediction")
+                st.dataframe(flip_summary.set_index(["Attribute", "Group"]), use_container_width=True)
+                st.markdown("#### Flip rates by target value")
+                st.dataframe(flip_table, use_container_width=True, hide_index=True)
+
+# --------------------------------------------------
+# Individual-level generalized entropy
+# --------------------------------------------------
+def compute_individual_entropy(source, label_col, pred_cols, protected_attrs, pos_true, pos_pred, alphas,
+                               chunk_size=500_000, weight_col=None):
+    """
+    Long (Attribute, Model, α, Index, Between, Within) frame for every
+    alpha. Group counts are taken once, from an in-memory frame or the CSV
+    streamed in chunks, and every alpha is evaluated from them.
+    """
+    if isinstance(source, pd.DataFrame):
+        y_true = _as01(source[label_col].values, positive=pos_true)
+        P = _as01_matrix(source[pred_cols], positive=pos_pred)
+        w = weight_array(source, weight_col)
+        counts_by_attr = {}
+        for p in protected_attrs:
+            codes, labels = encode_groups(source[p["attribute"]].astype(str).values)
+            counts_by_attr[p["attribute"]] = list(
+                confusion_tensor_multi(y_true, P, codes, len(labels), sample_weight=w)
+            )
+    else:
+        accs = accumulate_csv(
+            source, label_col, pred_cols, protected_attrs, pos_true, pos_pred,
+            chunk_size=chunk_size, weight_col=weight_col,
+        )
+        counts_by_attr = {a: [accs[a][col].counts for col in pred_cols] for a in accs}
+
+    rows = []
+    for attr, per_model in counts_by_attr.items():
+        for col, counts in zip(pred_cols, per_model):
+            for alpha in alphas:
+                parts = individual_entropy(counts, alpha)
+                rows.append({
+                    "Attribute": attr,
+                    "Model": col,
+                    "α": alpha,
+                    "Index": float(parts["index"]),
+                    "Between": float(parts["between"]),
+                    "Within": float(parts["within"]),
+                })
+    table = pd.DataFrame(rows, columns=["Attribute", "Model", "α", "Index", "Between", "Within"])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        table["Between share"] = table["Between"] / table["Index"]
+    return table
+
+
+with st.expander("Individual-level generalized entropy", expanded=False):
+    st.caption(
+        "Inequality of the per-row benefit b = ŷ − y + 1 (0 for a false negative, 1 for a "
+        "correct prediction, 2 for a false positive), split exactly into inequality between "
+        "the groups of each protected attribute and within them. α = 1 is the Theil index; "
+        "α ≤ 0 is infinite as soon as any row is a false negative."
+    )
+    ge1, ge2 = st.columns([2, 1])
+    alpha_text = ge1.text_input("α values (comma-separated)", value="0.5, 1, 2", key="ge_alphas")
+    ge_models = ge2.multiselect("Models", pred_cols, default=pred_cols, key="ge_models")
+
+    try:
+        ge_alphas = list(dict.fromkeys(float(a) for a in alpha_text.split(",") if a.strip()))
+    except ValueError:
+        st.error("α values must be numbers, e.g. 0.5, 1, 2.")
+        ge_alphas = []
+
+    if st.button("Compute entropy decomposition", disabled=not (ge_alphas and ge_models)):
+        with st.spinner("Counting benefits…"):
+            ge_table = compute_individual_entropy(
+                chunked_source["path"] if chunked_source else data,
+                ground_truth,
+                ge_models,
+                protected_attrs,
+                POS_TRUE,
+                POS_PRED,
+                ge_alphas,
+                chunk_size=chunked_source["chunk_size"] if chunked_source else 500_000,
+                weight_col=WEIGHT_COL,
+            )
+        st.dataframe(ge_table.set_index(["Attribute", "Model", "α"]), use_container_width=True)
+
+# --------------------------------------------------
+# Confidence interval settings
+# --------------------------------------------------
+CI_MODES = {
+    "Bootstrap, count-space (fast)": "counts",
+    "Bootstrap, row resampling": "rows",
+    "Closed-form (Wilson / Newcombe, log-ratio)": "analytic",
+}
+
+# Row resampling would expand a counts table back to one draw per record
+ci_choices = [k for k, v in CI_MODES.items() if not (COUNT_COL and v == "rows")]
+
+CI_MODE = CI_MODES[
+    st.selectbox(
+        "Confidence intervals",
+        ci_choices,
+        index=0,
+        help="Count-space resampling redraws the (group, label, prediction) "
+             "cell counts and gives the same distribution as row resampling "
+             "at a fraction of the cost. Closed-form intervals come straight "
+             "from the group counts with no resampling; paired model "
+             "comparisons need a bootstrap.",
+    )
+]
+
+# Replicates are drawn until the CIs of the metrics selected on the
+# Metrics & Thresholds page stop moving (all metrics if none are selected)
+BOOTSTRAP_OPTIONS = {}
+if CI_MODE != "analytic":
+    bc1, bc2, bc3, bc4 = st.columns(4)
+    BOOTSTRAP_OPTIONS = {
+        "seed": int(bc1.number_input("Random seed", min_value=0, value=0, step=1)),
+        "tol": float(bc2.number_input(
+            "CI tolerance", min_value=0.0001, value=0.005, step=0.001, format="%.4f",
+            help="Stop once no CI endpoint of a selected metric moves by this much "
+                 "between consecutive batches of replicates.",
+        )),
+        "max_replicates": int(bc3.number_input("Max replicates", min_value=100, value=2000, step=100)),
+        "max_seconds": float(bc4.number_input("Time limit (s)", min_value=1.0, value=30.0, step=5.0)),
+    }
+    # Only count-based metrics are resampled; an attribute whose selection has
+    # none of them (e.g. calibration only) is bootstrapped over all of them
+    selected_thresholds = st.session_state.get("thresholds", {})
+    selected_metrics = [
+        (attr, m)
+        for attr, cfg in selected_thresholds.items()
+        for m in cfg
+        if m in COUNT_METRICS
+    ]
+    BOOTSTRAP_OPTIONS["metrics"] = selected_metrics or None
+    no_bootstrap = sorted({m for cfg in selected_thresholds.values() for m in cfg if m not in COUNT_METRICS})
+    if no_bootstrap:
+        st.caption(
+            f"No bootstrap CI for {', '.join(no_bootstrap)}: only metrics computed from "
+            "the (group, label, prediction) counts are resampled."
+        )
+
+# Group labels are shuffled in count space, so the tests also run on chunked
+# sources and counts tables
+PERMUTATION_OPTIONS = None
+pc1, pc2 = st.columns(2)
+if pc1.checkbox(
+    "Permutation significance tests",
+    value=False,
+    help="p-value of every count-based metric under the null hypothesis that "
+         "outcomes do not depend on the protected attribute (group labels "
+         "shuffled across rows).",
+):
+    PERMUTATION_OPTIONS = {
+        "n_permutations": int(pc2.number_input("Permutations", min_value=100, value=2000, step=500)),
+        "seed": int(BOOTSTRAP_OPTIONS.get("seed", 0)),
+    }
+
+# --------------------------------------------------
+# Intersectional settings
+# --------------------------------------------------
+INTERSECTIONAL = False
+MIN_SUPPORT = 30
+REFERENCE = None
+
+if chunked_source:
+    st.info(
+        f"Chunked evaluation of `{chunked_source['path']}` "
+        f"({chunked_source['chunk_size']:,} rows per chunk). Column detection "
+        "and positive classes use the preview loaded on the Home page."
+    )
+elif len(protected_attrs) >= 2:
+    ic1, ic2 = st.columns(2)
+    INTERSECTIONAL = ic1.checkbox(
+        "Evaluate intersections of protected attributes",
+        value=False,
+        help="Every non-empty combination of the protected attributes is "
+             "compared against the all-privileged combination.",
+    )
+    MIN_SUPPORT = int(
+        ic2.number_input(
+            "Minimum rows per intersection",
+            min_value=1,
+            value=30,
+            step=1,
+            disabled=not INTERSECTIONAL,
+        )
+    )
+    if INTERSECTIONAL:
+        inter_attrs = [p["attribute"] for p in protected_attrs]
+        inter_sizes = data.groupby(
+            [data[a].astype(str) for a in inter_attrs], observed=True, sort=False
+        ).size().sort_values(ascending=False)
+        privileged_cell = tuple(str(p["privileged_class"]) for p in protected_attrs)
+        cells = [privileged_cell] + [c for c in inter_sizes.index[:50] if c != privileged_cell]
+        REFERENCE = st.selectbox(
+            "Reference intersection",
+            cells,
+            format_func=lambda c: " ∧ ".join(f"{a}={v.strip()}" for a, v in zip(inter_attrs, c))
+            + (" (all privileged)" if c == privileged_cell else "")
+            + f" — {int(inter_sizes.get(c, 0)):,} rows",
+            help="Every other intersection is compared against this one. The "
+                 "all-privileged combination is the default; pick another when it "
+                 "is empty or small.",
+        )
+
+# --------------------------------------------------
+# Calibration scores
+# --------------------------------------------------
+HARD_PREDICTIONS = "(hard predictions)"
+SCORE_MAP = {}
+
+if score_candidates and not chunked_source:
+    with st.expander("Calibration scores", expanded=False):
+        st.caption(
+            f"{CALIBRATION_METRIC} compares the expected calibration error of "
+            "the unprivileged and privileged groups. Pair each model with its "
+            "score column; without one, the hard predictions are used as the "
+            "forecast (their calibration error equals their error rate)."
+        )
+        for col in pred_cols:
+            choice = st.selectbox(
+                f"Scores for {col}",
+                [HARD_PREDICTIONS, *score_candidates],
+                key=f"score_for_{col}",
+            )
+            if choice != HARD_PREDICTIONS:
+                SCORE_MAP[col] = choice
 
 # --------------------------------------------------
 # Deterministic compute key
@@ -223,6 +1239,14 @@ def make_compute_key():
     h.update(str(POS_PRED).encode())
     h.update(",".join(pred_cols).encode())
     h.update(str(data.shape).encode())
+    h.update(CI_MODE.encode())
+    h.update(repr(sorted(BOOTSTRAP_OPTIONS.items(), key=lambda kv: kv[0])).encode())
+    h.update(repr(PERMUTATION_OPTIONS).encode())
+    h.update(f"{INTERSECTIONAL}:{MIN_SUPPORT}:{REFERENCE}".encode())
+    h.update(repr(sorted(SCORE_MAP.items())).encode())
+    h.update(f"{WEIGHT_COL}:{SURVEY_WEIGHTS}:{COLLAPSE}".encode())
+    if chunked_source:
+        h.update(f"{chunked_source['path']}:{chunked_source['chunk_size']}".encode())
     return h.hexdigest()
 
 compute_key = make_compute_key()
@@ -230,70 +1254,333 @@ compute_key = make_compute_key()
 # --------------------------------------------------
 # Heavy computation (multi-sensitive)
 # --------------------------------------------------
+def selected_by_attr(bootstrap_options):
+    """{attribute: [metric, ...]} of the selected (attribute, metric) pairs."""
+    selected = {}
+    for attr, metric in (bootstrap_options or {}).get("metrics") or []:
+        if metric in COUNT_METRICS:
+            selected.setdefault(attr, []).append(metric)
+    return selected
+
+
 def compute_all_metrics_multi_sensitive(
-    df, label_col, pred_cols, protected_attrs, pos_true, pos_pred, B=20
+    df, label_col, pred_cols, protected_attrs, pos_true, pos_pred,
+    ci_mode="counts", score_map=None, bootstrap_options=None, weight_col=None, permutation_options=None,
+    survey_weights=False,
 ):
+    """
+    Point estimates per (protected attribute, model) plus a paired bootstrap:
+    each replicate is drawn once and shared by every model, attribute and
+    metric, so bootstrap lists are index-aligned across models. The number
+    of replicates is set by adaptive_bootstrap (bootstrap_options are passed
+    through; metrics are (attribute, metric) pairs). Only the selected
+    metrics are evaluated on the replicates.
+
+    score_map maps prediction columns to score columns used for calibration;
+    unmapped models are calibrated on their hard predictions. weight_col
+    weights every row (counts become sums of weights). With survey_weights
+    they are sampling weights: the bootstrap resamples the observed rows
+    with their weights, and closed-form intervals and permutation tests use
+    the Kish effective sample size. Otherwise they are frequency weights.
+    With permutation_options (passed to permutation_pvalues), every
+    attribute also gets (observed, p-values) of the count-based metrics.
+
+    ci_mode:
+      - "counts":   bootstrap by multinomial resampling of the distinct
+                    (label, group, prediction) row patterns
+      - "rows":     bootstrap by classic row resampling with explicit indices
+      - "analytic": closed-form intervals only, no bootstrap
+    """
     results_by_attr = {}
     bootstrap_by_attr = {}
+    intervals_by_attr = {}
+    group_tables_by_attr = {}
+    calibration_by_attr = {}
+    permutation_by_attr = {}
+    score_map = score_map or {}
 
     y_true = _as01(df[label_col].values, positive=pos_true)
+    w = weight_array(df, weight_col)
+    survey_weights = survey_weights and w is not None
+    n_eff = kish_effective_size(w) if survey_weights else None
+    scores = {
+        col: pd.to_numeric(df[sc], errors="coerce").to_numpy(dtype=float)
+        for col, sc in score_map.items()
+    }
+
+    # (n x M) prediction matrix: every model is evaluated in the same pass
+    P = _as01_matrix(df[pred_cols], positive=pos_pred)
+    perf = [
+        GroupMetrics.from_counts(c).get_all()
+        for c in confusion_tensor_multi(y_true, P, sample_weight=w)[:, 0]
+    ]
+
+    groups = {}
+    priv_masks = {}
 
     for p in protected_attrs:
         sens_col = p["attribute"]
         priv_val = p["privileged_class"]
         sens_arr = df[sens_col].astype(str).values
 
+        codes, labels = encode_groups(sens_arr)
+        groups[sens_col] = (codes, len(labels))
+        priv_masks[sens_col] = privileged_mask(labels, priv_val)
+
+        counts = confusion_tensor_multi(y_true, P, codes, len(labels), sample_weight=w)
+        fair = metrics_from_tensor(counts, priv_masks[sens_col])
+
+        # (3, M, G, bins) reliability sums; scored models replace their slice
+        cal_sums = calibration_sums_from_counts(counts)
+        for j, col in enumerate(pred_cols):
+            if col in scores:
+                cal_sums[:, j] = calibration_sums(y_true, scores[col], codes, len(labels), sample_weight=w)
+        fair[CALIBRATION_METRIC] = calibration_from_sums(cal_sums, priv_masks[sens_col])[CALIBRATION_METRIC]
+
         rows = []
-        fairness_bootstrap = {}
+        group_tables = {}
+        calibration_tables = {}
+        for j, col in enumerate(pred_cols):
+            rows.append({
+                "Model": col,
+                **perf[j],
+                **{m: float(vals[j]) for m, vals in fair.items()},
+            })
+            fm = FairnessMetrics.from_counts(counts[j], labels, privileged_value=priv_val)
+            fm.calibration = cal_sums[:, j]
+            group_tables[col] = fm.per_group_metrics()
+            calibration_tables[col] = fm.calibration_by_group()
 
-        for col in pred_cols:
-            y_pred = _as01(df[col].values, positive=pos_pred)
-
-            perf = GroupMetrics(y_true, y_pred).get_all()
-            fair = FairnessMetrics(
-                y_true, y_pred, sens_arr,
-                privileged_value=priv_val
-            ).get_all()
-
-            rows.append({"Model": col, **perf, **fair})
-
-            for m in fair:
-                fairness_bootstrap.setdefault(m, {})[col] = []
-                for _ in range(B):
-                    idx = np.random.choice(len(y_true), len(y_true), replace=True)
-                    fb = FairnessMetrics(
-                        y_true[idx],
-                        y_pred[idx],
-                        sens_arr[idx],
-                        privileged_value=priv_val,
-                    ).get_all()
-                    fairness_bootstrap[m][col].append(fb[m])
+        results_by_attr[sens_col] = pd.DataFrame(rows)
+        group_tables_by_attr[sens_col] = group_tables
+        calibration_by_attr[sens_col] = calibration_tables
+        # Sampling error of survey weights is that of their effective sample size
+        ci_counts = effective_counts(counts, n_eff) if survey_weights else counts
+        intervals_by_attr[sens_col] = intervals_frame(
+            analytic_intervals(ci_counts, priv_masks[sens_col]), pred_cols
+        )
+        if permutation_options is not None:
+            permutation_by_attr[sens_col] = permutation_pvalues(
+                ci_counts, priv_masks[sens_col], **permutation_options
+            )
+
+    if ci_mode == "analytic":
+        return results_by_attr, bootstrap_by_attr, intervals_by_attr, group_tables_by_attr, calibration_by_attr, permutation_by_attr, None, y_true
+
+    selected = selected_by_attr(bootstrap_options)
+
+    def replicate(rng, n):
+        boot_counts = paired_bootstrap_counts(
+            y_true, P, groups, n, mode=ci_mode, rng=rng, sample_weight=w, survey=survey_weights,
+        )
+        return {
+            (sens_col, m): vals  # (n, M)
+            for sens_col, counts in boot_counts.items()
+            for m, vals in metrics_from_tensor(
+                counts, priv_masks[sens_col], selected.get(sens_col)
+            ).items()
+        }
+
+    samples, boot_info = adaptive_bootstrap(replicate, **(bootstrap_options or {}))
+    for (sens_col, m), vals in samples.items():
+        bootstrap_by_attr.setdefault(sens_col, {})[m] = {
+            col: vals[:, j].tolist() for j, col in enumerate(pred_cols)
+        }
+
+    return results_by_attr, bootstrap_by_attr, intervals_by_attr, group_tables_by_attr, calibration_by_attr, permutation_by_attr, boot_info, y_true
+
+
+def compute_all_metrics_chunked(
+    source, chunk_size, label_col, pred_cols, protected_attrs, pos_true, pos_pred,
+    ci_mode="counts", bootstrap_options=None, weight_col=None, permutation_options=None,
+    survey_weights=False,
+):
+    """
+    Same outputs as compute_all_metrics_multi_sensitive for a CSV that does
+    not fit in memory: the file is streamed into per-group count
+    accumulators. Bootstrap replicates are count-space redraws per model and
+    therefore not paired across models; ci_mode="analytic" skips them.
+    Survey weights are resampled on their Kish effective sample size.
+    """
+    results_by_attr = {}
+    bootstrap_by_attr = {}
+    intervals_by_attr = {}
+    group_tables_by_attr = {}
+    calibration_by_attr = {}
+    permutation_by_attr = {}
+
+    accs = accumulate_csv(
+        source, label_col, pred_cols, protected_attrs, pos_true, pos_pred,
+        chunk_size=chunk_size, weight_col=weight_col,
+    )
+
+    finalized = {}
+    for sens_col, per_model in accs.items():
+        rows = []
+        group_tables = {}
+        calibration_tables = {}
+        intervals = []
+        tests = []
+
+        for col, acc in per_model.items():
+            fm = acc.finalize()
+            fair = fm.get_all()
+            rows.append({"Model": col, **acc.group_metrics().get_all(), **fair})
+            group_tables[col] = fm.per_group_metrics()
+            calibration_tables[col] = fm.calibration_by_group()
+            ci_counts = effective_counts(fm.counts, acc.effective_n) if survey_weights else fm.counts
+            intervals.append(
+                intervals_frame(analytic_intervals(ci_counts[None], fm._priv_mask()), [col])
+            )
+            if permutation_options is not None:
+                tests.append(permutation_pvalues(ci_counts, fm._priv_mask(), **permutation_options))
+            finalized[sens_col, col] = fm, ci_counts
 
         results_by_attr[sens_col] = pd.DataFrame(rows)
-        bootstrap_by_attr[sens_col] = fairness_bootstrap
+        group_tables_by_attr[sens_col] = group_tables
+        calibration_by_attr[sens_col] = calibration_tables
+        intervals_by_attr[sens_col] = pd.concat(intervals, ignore_index=True)
+        if tests:
+            # Models were tested one by one; stack their scalars into (M,) arrays
+            permutation_by_attr[sens_col] = tuple(
+                {m: np.array([t[i][m] for t in tests]) for m in tests[0][i]} for i in range(2)
+            )
+
+    if ci_mode == "analytic":
+        return results_by_attr, bootstrap_by_attr, intervals_by_attr, group_tables_by_attr, calibration_by_attr, permutation_by_attr, None, None
+
+    selected = selected_by_attr(bootstrap_options)
+
+    def replicate(rng, n):
+        out = {}
+        for (sens_col, col), (fm, ci_counts) in finalized.items():
+            boot = metrics_from_tensor(
+                resample_counts(ci_counts, n, rng), fm._priv_mask(), selected.get(sens_col)
+            )
+            for m, vals in boot.items():
+                out.setdefault((sens_col, m), []).append(vals)
+        return {k: np.stack(v, axis=1) for k, v in out.items()}  # (n, M)
+
+    samples, boot_info = adaptive_bootstrap(replicate, **(bootstrap_options or {}))
+    for (sens_col, m), vals in samples.items():
+        bootstrap_by_attr.setdefault(sens_col, {})[m] = {
+            col: vals[:, j].tolist() for j, col in enumerate(pred_cols)
+        }
 
-    return results_by_attr, bootstrap_by_attr, y_true
+    return results_by_attr, bootstrap_by_attr, intervals_by_attr, group_tables_by_attr, calibration_by_attr, permutation_by_attr, boot_info, None
+
+
+def compute_intersectional(
+    df, label_col, pred_cols, protected_attrs, pos_true, pos_pred, min_support, weight_col=None,
+    reference=None,
+):
+    """Per-model tables of every intersection vs the reference (default: all-privileged) one."""
+    y_true = _as01(df[label_col].values, positive=pos_true)
+    attrs = [p["attribute"] for p in protected_attrs]
+    columns = [df[a].astype(str).values for a in attrs]
+    privileged = [p["privileged_class"] for p in protected_attrs]
+
+    return intersectional_group_tables(
+        y_true,
+        _as01_matrix(df[pred_cols], positive=pos_pred),
+        pred_cols,
+        columns,
+        attrs,
+        privileged,
+        min_support=min_support,
+        sample_weight=weight_array(df, weight_col),
+        reference=reference,
+    )
 
 # --------------------------------------------------
 # Compute trigger
 # --------------------------------------------------
 if st.button("Compute metrics"):
     with st.spinner("Computing metrics…"):
-        results_by_attr, bootstrap_by_attr, y_true = compute_all_metrics_multi_sensitive(
-            data,
-            ground_truth,
-            pred_cols,
-            protected_attrs,
-            POS_TRUE,
-            POS_PRED,
-        )
+        if chunked_source:
+            (
+                results_by_attr, bootstrap_by_attr, intervals_by_attr, group_tables_by_attr,
+                calibration_by_attr, permutation_by_attr, bootstrap_info, y_true,
+            ) = compute_all_metrics_chunked(
+                chunked_source["path"],
+                chunked_source["chunk_size"],
+                ground_truth,
+                pred_cols,
+                protected_attrs,
+                POS_TRUE,
+                POS_PRED,
+                ci_mode=CI_MODE,
+                bootstrap_options=BOOTSTRAP_OPTIONS,
+                weight_col=WEIGHT_COL,
+                permutation_options=PERMUTATION_OPTIONS,
+                survey_weights=SURVEY_WEIGHTS,
+            )
+        else:
+            eval_df, eval_weight = data, WEIGHT_COL
+            if COLLAPSE:
+                eval_df = collapse_duplicates(
+                    data,
+                    list(dict.fromkeys([
+                        ground_truth, *protected_cols, *pred_cols, *SCORE_MAP.values()
+                    ])),
+                    weight=WEIGHT_COL,
+                    weight_name="_weight",
+                )
+                eval_weight = "_weight"
+                st.info(f"Evaluating {len(eval_df):,} distinct rows in place of {len(data):,}.")
+
+            (
+                results_by_attr, bootstrap_by_attr, intervals_by_attr, group_tables_by_attr,
+                calibration_by_attr, permutation_by_attr, bootstrap_info, y_true,
+            ) = compute_all_metrics_multi_sensitive(
+                eval_df,
+                ground_truth,
+                pred_cols,
+                protected_attrs,
+                POS_TRUE,
+                POS_PRED,
+                ci_mode=CI_MODE,
+                score_map=SCORE_MAP,
+                bootstrap_options=BOOTSTRAP_OPTIONS,
+                weight_col=eval_weight,
+                permutation_options=PERMUTATION_OPTIONS,
+                survey_weights=SURVEY_WEIGHTS,
+            )
+            if COLLAPSE:
+                # Row-level plots below are drawn from the uploaded rows
+                y_true = _as01(data[ground_truth].values, positive=POS_TRUE)
+            elif COUNT_COL:
+                # Rows of a counts table are not records
+                y_true = None
+
+        intersectional_by_model, intersectional_info = None, None
+        if INTERSECTIONAL:
+            intersectional_by_model, intersectional_info = compute_intersectional(
+                eval_df,
+                ground_truth,
+                pred_cols,
+                protected_attrs,
+                POS_TRUE,
+                POS_PRED,
+                MIN_SUPPORT,
+                weight_col=eval_weight,
+                reference=REFERENCE,
+            )
 
         st.session_state["inference"] = {
             "completed": True,
             "compute_key": compute_key,
             "results_by_attr": results_by_attr,
             "bootstrap_by_attr": bootstrap_by_attr,
+            "intervals_by_attr": intervals_by_attr,
+            "bootstrap_info": bootstrap_info,
+            "group_tables_by_attr": group_tables_by_attr,
+            "calibration_by_attr": calibration_by_attr,
+            "permutation_by_attr": permutation_by_attr,
+            "intersectional_by_model": intersectional_by_model,
+            "intersectional_info": intersectional_info,
             "y_true": y_true,
+            "chunked": bool(chunked_source),
         }
         st.session_state["metrics_ready"] = True
 
@@ -307,6 +1594,11 @@ if inference["compute_key"] != compute_key:
 
 results_by_attr = inference["results_by_attr"]
 bootstrap_by_attr = inference["bootstrap_by_attr"]
+intervals_by_attr = inference.get("intervals_by_attr", {})
+group_tables_by_attr = inference["group_tables_by_attr"]
+calibration_by_attr = inference.get("calibration_by_attr", {})
+permutation_by_attr = inference.get("permutation_by_attr", {})
+intersectional_by_model = inference.get("intersectional_by_model")
 y_true = inference["y_true"]
 
 # --------------------------------------------------
@@ -320,6 +1612,7 @@ subpage = st.sidebar.radio(
         " Error Disparities",
         " Fairness–Performance Tradeoffs",
         " Model Comparison & Risk Summary",
+        " Intersectional Subgroups",
     ],
 )
 
@@ -369,29 +1662,49 @@ elif subpage == " Error Disparities":
             key=f"err_model_{sens_col}",
         )
 
-        sens_arr = data[sens_col].astype(str).values
+        group_table = group_tables_by_attr[sens_col][model]
 
-        fig, stats = plot_disparity_in_performance(
-            y_true,
-            data[model].values,
-            sens_arr,
-            positive_true=POS_TRUE,
-            positive_pred=POS_PRED,
-        )
-        st.pyplot(fig)
-        st.dataframe(stats["per_group"])
+        if y_true is not None:
+            sens_arr = data[sens_col].astype(str).values
 
-        st.pyplot(
-            plot_group_error_panel(
+            fig, stats = plot_disparity_in_performance(
                 y_true,
                 data[model].values,
                 sens_arr,
-                group_name=sens_col,
                 positive_true=POS_TRUE,
                 positive_pred=POS_PRED,
             )
+            st.pyplot(fig)
+            st.dataframe(stats["per_group"])
+        else:
+            st.info("Row-level error plots are not available for chunked evaluation or counts tables.")
+
+        st.markdown("#### Each group vs privileged class")
+        st.dataframe(group_table, use_container_width=True)
+        st.markdown("#### Worst-group disparities")
+        st.dataframe(
+            worst_group_disparities(group_table),
+            use_container_width=True,
+            hide_index=True,
         )
 
+        if model in calibration_by_attr.get(sens_col, {}):
+            source = SCORE_MAP.get(model, HARD_PREDICTIONS)
+            st.markdown(f"#### Calibration by group (scores: `{source}`)")
+            st.dataframe(calibration_by_attr[sens_col][model], use_container_width=True)
+
+        if y_true is not None:
+            st.pyplot(
+                plot_group_error_panel(
+                    y_true,
+                    data[model].values,
+                    sens_arr,
+                    group_name=sens_col,
+                    positive_true=POS_TRUE,
+                    positive_pred=POS_PRED,
+                )
+            )
+
 # ==================================================
 # 4. Fairness–Performance Tradeoffs
 # ==================================================
@@ -426,9 +1739,123 @@ elif subpage == " Fairness–Performance Tradeoffs":
 # 5. Model Comparison & Risk Summary (REMOVED PLOTS)
 # ==================================================
 elif subpage == " Model Comparison & Risk Summary":
+    pvalue_by_attr = {}
+    if permutation_by_attr:
+        correction = st.selectbox(
+            "Multiple-testing correction across protected attributes",
+            list(PVALUE_CORRECTIONS),
+            help="Each (metric, model) p-value is adjusted over the attributes it was tested on.",
+        )
+        pvalue_by_attr = pvalue_tables(
+            {a: obs for a, (obs, _) in permutation_by_attr.items()},
+            {a: pv for a, (_, pv) in permutation_by_attr.items()},
+            pred_cols,
+            method=PVALUE_CORRECTIONS[correction],
+        )
+
     for sens_col, df_res in results_by_attr.items():
         st.markdown(f"## Model Comparison & Risk Summary — `{sens_col}`")
 
-        st.pyplot(plot_fairness_error_bars(bootstrap_by_attr[sens_col]))
+        if CI_MODE == "analytic":
+            st.pyplot(
+                plot_fairness_error_bars(
+                    {},
+                    intervals=intervals_by_attr[sens_col],
+                    title="Fairness metrics (closed-form 95% CI)",
+                )
+            )
+        else:
+            st.pyplot(plot_fairness_error_bars(bootstrap_by_attr.get(sens_col, {})))
+            info = inference.get("bootstrap_info")
+            if info:
+                stop = (
+                    "CIs converged" if info["converged"]
+                    else "time limit reached" if info["timed_out"]
+                    else "replicate cap reached"
+                )
+                st.caption(
+                    f"{info['replicates']:,} bootstrap replicates, seed {info['seed']} "
+                    f"({stop}, {info['seconds']:.1f}s)."
+                )
+
+        if len(pred_cols) >= 2 and not inference.get("chunked") and CI_MODE != "analytic":
+            ca, cb = st.columns(2)
+            model_a = ca.selectbox(
+                f"Model A ({sens_col})", pred_cols, index=0,
+                key=f"paired_a_{sens_col}",
+            )
+            model_b = cb.selectbox(
+                f"Model B ({sens_col})", pred_cols, index=1,
+                key=f"paired_b_{sens_col}",
+            )
+            if model_a != model_b:
+                st.pyplot(
+                    plot_fairness_error_bars(
+                        paired_differences(
+                            bootstrap_by_attr.get(sens_col, {}), model_a, model_b
+                        ),
+                        title="Paired difference A − B (bootstrap CI)",
+                    )
+                )
 
         st.dataframe(df_res.set_index("Model"), use_container_width=True)
+
+        if sens_col in pvalue_by_attr:
+            st.markdown("#### Permutation tests")
+            st.caption(
+                f"Adjusted two-sided p-values from {PERMUTATION_OPTIONS['n_permutations']:,} "
+                "group-label permutations."
+            )
+            st.dataframe(
+                pvalue_by_attr[sens_col].pivot(index="Metric", columns="Model", values="Adjusted p-value"),
+                use_container_width=True,
+            )
+            with st.expander(f"All p-values ({sens_col})", expanded=False):
+                st.dataframe(pvalue_by_attr[sens_col], use_container_width=True, hide_index=True)
+
+# ==================================================
+# 6. Intersectional Subgroups
+# ==================================================
+elif subpage == " Intersectional Subgroups":
+    st.markdown("## Intersectional Subgroups")
+
+    if not intersectional_by_model:
+        st.info(
+            "Enable intersectional evaluation above (requires at least two "
+            "protected attributes) and recompute metrics."
+        )
+        st.stop()
+
+    reference_info = inference.get("intersectional_info")
+    if reference_info and not reference_info["ok"]:
+        st.warning(
+            f"The reference intersection {reference_info['label']} has "
+            f"{reference_info['n']:,.0f} rows, below the minimum of {MIN_SUPPORT}; "
+            "metrics against it are undefined or unreliable. Choose another "
+            "reference intersection above and recompute."
+        )
+    elif reference_info:
+        st.caption(f"Reference intersection: {reference_info['label']} ({reference_info['n']:,.0f} rows).")
+
+    first_table = next(iter(intersectional_by_model.values()))
+    metric = st.selectbox(
+        "Fairness metric",
+        [c for c in first_table.columns if c != "n"],
+        key="intersection_metric",
+    )
+
+    matrix = pd.DataFrame(
+        {col: table[metric] for col, table in intersectional_by_model.items()}
+    ).T
+    if matrix.empty:
+        st.warning("No intersection meets the minimum row count.")
+        st.stop()
+
+    st.pyplot(
+        plot_models_groups_heatmap(
+            matrix, title=f"{metric} by model and intersection"
+        )
+    )
+
+    model = st.selectbox("Model", pred_cols, key="intersection_model")
+    st.dataframe(intersectional_by_model[model], use_container_width=True)
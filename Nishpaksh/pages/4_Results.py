@@ -6,6 +6,8 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 
+from utils.two_class_metrics import worst_group_disparities
+
 st.set_page_config(layout="wide")
 st.title("Results — Fairness Assessment & Verdict")
 
@@ -157,6 +159,18 @@ METRIC_IDEALS = {
     "Equal Opportunity Difference": 0.0,
     "Error Rate Difference": 0.0,
     "Calibration Difference (global)": 0.0,
+    # Regression
+    "Mean Residual Difference": 0.0,
+    "Mean Prediction Difference": 0.0,
+    "MAE Ratio": 1.0,
+    "RMSE Ratio": 1.0,
+    "Bounded Group Loss": 0.0,
+    "KS Distance": 0.0,
+    "Wasserstein Distance": 0.0,
+    # Ranking / recommendation
+    "Exposure Ratio": 1.0,
+    "Top-k Selection Parity Difference": 0.0,
+    "Attention-Weighted Disparity": 0.0,
 }
 
 # --------------------------------------------------
@@ -481,6 +495,20 @@ for attr, bi in attr_BI.items():
                     "Within Threshold": "Yes" if within_threshold == True else "No" if within_threshold == False else "N/A"
                 })
             st.dataframe(pd.DataFrame(metric_details), use_container_width=True, hide_index=True)
+
+        # Worst unprivileged group per selected metric (multi-valued attributes)
+        group_table = inference.get("group_tables_by_attr", {}).get(attr, {}).get(model)
+        if group_table is not None and len(group_table) > 1:
+            with st.expander(f"Worst-group disparities for {attr}", expanded=False):
+                st.dataframe(
+                    worst_group_disparities(
+                        group_table,
+                        metric_names,
+                        ratio_metrics={m for m, v in METRIC_IDEALS.items() if v == 1.0},
+                    ),
+                    use_container_width=True,
+                    hide_index=True,
+                )
     else:
         st.info("No fairness metrics available for this protected attribute.")
 
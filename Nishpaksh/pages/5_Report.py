@@ -752,18 +752,19 @@ with tab_report:
         y_true = inference["y_true"]
         y_pred = df[results["selected_model"]].values
 
-        for idx, attr in enumerate(protected_attrs, start=1):
-            sens = df[attr].astype(str).values
+        if y_true is not None:
+            for idx, attr in enumerate(protected_attrs, start=1):
+                sens = df[attr].astype(str).values
 
-            fig_disp, _ = plot_disparity_in_performance(
-                y_true, y_pred, sens
-            )
-            insert_plot(doc, f"[[FIG_DISPARITY_ATTR{idx}]]", fig_disp)
+                fig_disp, _ = plot_disparity_in_performance(
+                    y_true, y_pred, sens
+                )
+                insert_plot(doc, f"[[FIG_DISPARITY_ATTR{idx}]]", fig_disp)
 
-            fig_err = plot_group_error_panel(
-                y_true, y_pred, sens, group_name=attr
-            )
-            insert_plot(doc, f"[[FIG_GROUP_ERROR_ATTR{idx}]]", fig_err)
+                fig_err = plot_group_error_panel(
+                    y_true, y_pred, sens, group_name=attr
+                )
+                insert_plot(doc, f"[[FIG_GROUP_ERROR_ATTR{idx}]]", fig_err)
 
         # ------------------------------
         # SAVE & DOWNLOAD
@@ -781,14 +782,15 @@ with tab_report:
         # ------------------------------
         # PLOTS (UI preview, unchanged)
         # ------------------------------
-        for idx, attr in enumerate(protected_attrs, start=1):
-            sens = df[attr].astype(str).values
+        if y_true is not None:
+            for idx, attr in enumerate(protected_attrs, start=1):
+                sens = df[attr].astype(str).values
 
-            fig1, _ = plot_disparity_in_performance(y_true, y_pred, sens)
-            insert_plot(doc, f"[[FIG_DISPARITY_ATTR{idx}]]", fig1)
+                fig1, _ = plot_disparity_in_performance(y_true, y_pred, sens)
+                insert_plot(doc, f"[[FIG_DISPARITY_ATTR{idx}]]", fig1)
 
-            fig2 = plot_group_error_panel(y_true, y_pred, sens, group_name=attr)
-            insert_plot(doc, f"[[FIG_GROUP_ERROR_ATTR{idx}]]", fig2)
+                fig2 = plot_group_error_panel(y_true, y_pred, sens, group_name=attr)
+                insert_plot(doc, f"[[FIG_GROUP_ERROR_ATTR{idx}]]", fig2)
 
         out = Path(tempfile.gettempdir()) / "Fairness_Evaluation_Report_Final.docx"
         doc.save(out)
@@ -806,14 +808,15 @@ with tab_report:
         y_true = inference["y_true"]
         y_pred = df[results["selected_model"]].values
 
-        for idx, attr in enumerate(protected_attrs, start=1):
-            sens = df[attr].astype(str).values
+        if y_true is not None:
+            for idx, attr in enumerate(protected_attrs, start=1):
+                sens = df[attr].astype(str).values
 
-            fig1, _ = plot_disparity_in_performance(y_true, y_pred, sens)
-            insert_plot(doc, f"[[FIG_DISPARITY_ATTR{idx}]]", fig1)
+                fig1, _ = plot_disparity_in_performance(y_true, y_pred, sens)
+                insert_plot(doc, f"[[FIG_DISPARITY_ATTR{idx}]]", fig1)
 
-            fig2 = plot_group_error_panel(y_true, y_pred, sens, group_name=attr)
-            insert_plot(doc, f"[[FIG_GROUP_ERROR_ATTR{idx}]]", fig2)
+                fig2 = plot_group_error_panel(y_true, y_pred, sens, group_name=attr)
+                insert_plot(doc, f"[[FIG_GROUP_ERROR_ATTR{idx}]]", fig2)
 
         out = Path(tempfile.gettempdir()) / "Fairness_Evaluation_Report_Final.docx"
         doc.save(out)
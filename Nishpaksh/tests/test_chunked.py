@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.chunked import accumulate_csv
+from utils.two_class_metrics import FairnessMetrics
+from utils.viz_utils import _as01, _as01_matrix
+
+METRICS = ["Statistical Parity Difference", "Disparate Impact", "Equal Opportunity Difference"]
+
+
+@pytest.fixture
+def float_labels(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 3000
+    frame = pd.DataFrame({
+        "sex": rng.choice(["M", "F"], n),
+        "label": rng.integers(0, 2, n).astype(float),
+        "pred": (rng.random(n) < 0.4).astype(float),
+    })
+    path = tmp_path / "float_labels.csv"
+    frame.to_csv(path, index=False)
+    return frame, path
+
+
+def test_as01_matches_floats_against_an_integer_label(float_labels):
+    frame, _ = float_labels
+    np.testing.assert_array_equal(_as01(frame["pred"], "1"), frame["pred"].to_numpy() == 1.0)
+    np.testing.assert_array_equal(_as01_matrix(frame[["pred"]], "1")[:, 0], frame["pred"].to_numpy() == 1.0)
+
+
+def test_chunked_agrees_with_in_memory_on_float_labels(float_labels):
+    frame, path = float_labels
+    in_memory = FairnessMetrics(
+        _as01(frame["label"], "1"), _as01(frame["pred"], "1"), frame["sex"], privileged_value="M"
+    ).get_all(METRICS)
+
+    accs = accumulate_csv(
+        path, "label", ["pred"], [{"attribute": "sex", "privileged_class": "M"}], "1", "1", chunk_size=700
+    )
+    streamed = accs["sex"]["pred"].finalize().get_all(METRICS)
+
+    assert accs["sex"]["pred"].n == len(frame)
+    for m in METRICS:
+        assert streamed[m] == pytest.approx(in_memory[m])
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from utils.multiclass_metrics import MulticlassAccumulator, encode_classes, multiclass_tensor
+
+
+def _frame(n=600, seed=0):
+    rng = np.random.default_rng(seed)
+    y = rng.integers(0, 3, n)
+    pred = np.where(rng.random(n) < 0.7, y, rng.integers(0, 3, n))
+    return y, pred, rng.choice(["a", "b"], n)
+
+
+def test_integer_classes_match_values():
+    assert encode_classes([0, 1, 2, 3], [0, 1, 2]).tolist() == [0, 1, 2, -1]
+    assert encode_classes(["1.0", "2"], [1, 2]).tolist() == [0, 1]
+
+
+def test_integer_classes_give_the_same_counts_as_labels():
+    y, pred, groups = _frame()
+    codes, labels = pd.factorize(groups)
+    as_int = multiclass_tensor(y, pred, [0, 1, 2], codes, len(labels))
+    as_str = multiclass_tensor(y, pred, ["0", "1", "2"], codes, len(labels))
+    assert as_int.sum() == len(y)
+    np.testing.assert_array_equal(as_int, as_str)
+
+
+def test_accumulator_with_integer_classes():
+    y, pred, groups = _frame()
+    acc = MulticlassAccumulator([0, 1, 2], privileged_value="a").update(y, pred, groups)
+    assert acc.classes == ["0", "1", "2"]
+    assert acc.counts.sum() == len(y)
+    table = acc.class_table()
+    assert table["n"].sum() == len(y)
+    assert table.drop(columns="n").notna().any().any()
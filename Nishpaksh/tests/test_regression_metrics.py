@@ -0,0 +1,43 @@
+import numpy as np
+
+from utils.regression_metrics import (
+    REGRESSION_METRICS,
+    bin_edges,
+    regression_group_table,
+    regression_metrics_from_sums,
+    regression_stats,
+)
+
+
+def _metrics(scale, seed=0, n=5000):
+    rng = np.random.default_rng(seed)
+    codes = rng.integers(0, 3, n)
+    y = rng.normal(size=n) + 0.3 * codes
+    pred = y + rng.normal(size=n) * (0.5 + 0.2 * codes) + 0.1 * codes
+    y, pred = y * scale, pred * scale
+    edges = bin_edges(pred, 200)
+    sums, hist = regression_stats(y, pred, codes, 3, edges)
+    is_priv = np.array([True, False, False])
+    return (
+        regression_metrics_from_sums(sums, is_priv, hist, edges),
+        regression_group_table(sums, ["a", "b", "c"], is_priv, hist, edges),
+    )
+
+
+def test_metrics_do_not_depend_on_the_target_scale():
+    unit, unit_table = _metrics(1.0)
+    big, big_table = _metrics(1e4)
+    for m in REGRESSION_METRICS:
+        np.testing.assert_allclose(big[m], unit[m], rtol=1e-6, err_msg=m)
+    np.testing.assert_allclose(big_table[REGRESSION_METRICS], unit_table[REGRESSION_METRICS], rtol=1e-6)
+
+
+def test_mean_differences_are_in_target_standard_deviations():
+    rng = np.random.default_rng(1)
+    y = rng.normal(size=2000)
+    codes = np.repeat([0, 1], 1000)
+    pred = y + 0.5 * codes
+    sums, _ = regression_stats(y, pred, codes, 2)
+    out = regression_metrics_from_sums(sums, np.array([True, False]))
+    gap = pred[codes == 1].mean() - pred[codes == 0].mean()
+    np.testing.assert_allclose(out["Mean Prediction Difference"], gap / y.std(), rtol=1e-9)
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from utils.two_class_metrics import FairnessAccumulator, FairnessMetrics, privileged_mask
+
+
+def _rows(n=4000, seed=0):
+    rng = np.random.default_rng(seed)
+    groups = rng.integers(0, 3, n)
+    y_true = rng.integers(0, 2, n)
+    y_pred = (rng.random(n) < 0.3 + 0.15 * groups).astype(int)
+    return y_true, y_pred, groups
+
+
+def test_privileged_mask_matches_text_and_numbers():
+    assert privileged_mask(np.array([0, 1, 2]), "1").tolist() == [False, True, False]
+    assert privileged_mask(np.array([0.0, 1.0]), "1").tolist() == [False, True]
+    assert privileged_mask(np.array(["a", "b"], dtype=object), "b").tolist() == [False, True]
+
+
+@pytest.mark.parametrize("privileged_value", [1, "1", "1.0"])
+def test_accumulator_agrees_with_in_memory_on_numeric_groups(privileged_value):
+    y_true, y_pred, groups = _rows()
+    in_memory = FairnessMetrics(y_true, y_pred, groups, privileged_value=privileged_value)
+
+    acc = FairnessAccumulator(privileged_value)
+    for part in np.array_split(np.arange(len(groups)), 4):
+        acc.update(y_true[part], y_pred[part], groups[part])
+    streamed = acc.finalize()
+
+    np.testing.assert_array_equal(streamed._priv_mask(), in_memory._priv_mask())
+    assert streamed._priv_mask().sum() == 1
+    expected = in_memory.get_all(["Disparate Impact", "Statistical Parity Difference"])
+    got = streamed.get_all(["Disparate Impact", "Statistical Parity Difference"])
+    for m, v in expected.items():
+        assert got[m] == pytest.approx(v)
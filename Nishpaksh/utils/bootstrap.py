@@ -0,0 +1,220 @@
+# utils/bootstrap.py
+# Paired bootstrap over (group, label, prediction) count tensors
+#
+# One resample is drawn per replicate and reused for every model, every
+# protected attribute and every metric, so replicate b of model A and
+# replicate b of model B come from the same rows (paired distributions).
+
+import os
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils.two_class_metrics import confusion_tensor_multi, resample_counts
+
+
+def _pattern_codes(columns):
+    """Compact id (0..K-1) for each distinct row across the given integer columns."""
+    pid = np.zeros(len(columns[0]), dtype=np.int64)
+    for col in columns:
+        col = np.asarray(col, dtype=np.int64)
+        pid = pid * (int(col.max(initial=0)) + 1) + col
+        pid, _ = pd.factorize(pid)
+        pid = pid.astype(np.int64)
+    return pid
+
+
+def paired_bootstrap_counts(y_true, preds, groups, B, mode="counts", rng=None, max_block=8_000_000,
+                            sample_weight=None, survey=False):
+    """
+    Bootstrap count tensors for every protected attribute and every model.
+
+    y_true : (n,) array in {0,1}
+    preds  : (n, M) matrix in {0,1}, one column per model
+    groups : {attribute: (group_codes, n_groups)}
+    mode   : "counts" -> multinomial redraw over the distinct
+                         (label, groups, predictions) row patterns
+             "rows"   -> explicit row indices, np.random.choice style
+    sample_weight : optional frequency weights; each replicate then draws
+                    round(sum of weights) rows with probability
+                    proportional to weight
+    survey : sample_weight are survey weights instead; each replicate
+             draws the n observed rows uniformly and sums their weights,
+             so the spread does not depend on the scale of the weights
+
+    Returns {attribute: (B, M, G, 2, 2) counts}: int64, or float64 sums of
+    weights for survey weights.
+    """
+    rng = np.random if rng is None else rng
+    y_true = np.asarray(y_true)
+    P = np.asarray(preds)
+    if P.ndim == 1:
+        P = P[:, None]
+    n, M = P.shape
+
+    w = None if sample_weight is None else np.asarray(sample_weight, dtype=float)
+    survey = survey and w is not None
+
+    out = {
+        attr: np.zeros((B, M, G, 2, 2), dtype=np.float64 if survey else np.int64)
+        for attr, (_, G) in groups.items()
+    }
+    if n == 0 or B == 0 or M == 0:
+        return out
+
+    if mode == "rows":
+        size = n if w is None or survey else int(round(w.sum()))
+        p = None if w is None or survey else w / w.sum()
+        for b in range(B):
+            idx = rng.choice(n, size, replace=True, p=p)
+            t_b, P_b = y_true[idx], P[idx]
+            w_b = w[idx] if survey else None
+            for attr, (codes, G) in groups.items():
+                out[attr][b] = confusion_tensor_multi(t_b, P_b, codes[idx], G, sample_weight=w_b)
+        return out
+
+    t = (y_true == 1).astype(np.int64)
+    bits = (P == 1).view(np.int8)
+
+    if M <= 48:
+        pred_code = np.zeros(n, dtype=np.int64)
+        for j in range(M):
+            pred_code = (pred_code << 1) | bits[:, j]
+        pred_code, _ = pd.factorize(pred_code)
+        # Survey weights travel with their rows: the weight is part of the pattern
+        weight_code = [pd.factorize(w)[0].astype(np.int64)] if survey else []
+        pid = _pattern_codes([t] + [codes for codes, _ in groups.values()] + [pred_code] + weight_code)
+    else:
+        pid = np.arange(n, dtype=np.int64)  # too many models to compress rows
+    K = int(pid.max()) + 1
+    pattern_counts = np.bincount(pid, weights=None if survey else w, minlength=K)
+
+    # Any row of a pattern represents it: all bootstrapped columns agree
+    rep = np.empty(K, dtype=np.int64)
+    rep[pid] = np.arange(n)
+    t_rep = t[rep]
+    P_rep = bits[rep]
+    w_rep = w[rep] if survey else None
+
+    cells = {}
+    for attr, (codes, G) in groups.items():
+        base = codes[rep] * 2 + t_rep
+        cells[attr] = (G, [(c, np.flatnonzero(base == c)) for c in np.unique(base)])
+
+    step = max(1, max_block // K)
+    for start in range(0, B, step):
+        nb = min(step, B - start)
+        W = resample_counts(pattern_counts, nb, rng).astype(float)  # (nb, K)
+        if survey:
+            W *= w_rep  # redrawn rows carry their weights
+        for attr, (G, members) in cells.items():
+            block = np.zeros((nb, 2 * G, M, 2))
+            for c, idx in members:
+                n_c = W[:, idx].sum(axis=1)
+                pos = W[:, idx] @ P_rep[idx].astype(float)  # (nb, M) predicted positives
+                block[:, c, :, 1] = pos
+                block[:, c, :, 0] = n_c[:, None] - pos
+            # (nb, G, 2[y_true], M, 2[y_pred]) -> (nb, M, G, 2, 2)
+            block = block.reshape(nb, G, 2, M, 2).transpose(0, 3, 1, 2, 4)
+            out[attr][start:start + nb] = block if survey else np.rint(block).astype(np.int64)
+    return out
+
+
+def paired_differences(fairness_bootstrap, model_a, model_b):
+    """
+    {metric: {"A − B": [...]}} from a {metric: {model: [...]}} bootstrap whose
+    replicates are paired across models. Feeds plot_fairness_error_bars.
+    """
+    label = f"{model_a} − {model_b}"
+    out = {}
+    for metric, per_model in fairness_bootstrap.items():
+        if model_a not in per_model or model_b not in per_model:
+            continue
+        a = np.asarray(per_model[model_a], dtype=float)
+        b = np.asarray(per_model[model_b], dtype=float)
+        out[metric] = {label: (a - b).tolist()}
+    return out
+
+
+def adaptive_bootstrap(replicate, seed=0, metrics=None, tol=0.005, ci=0.95,
+                       batch_size=50, min_replicates=100, max_replicates=2000,
+                       max_seconds=30.0, n_workers=None):
+    """
+    Run a bootstrap in seeded batches until its confidence intervals settle.
+
+    replicate(rng, n) must return {key: array of shape (n, ...)} holding n
+    replicates drawn with the numpy Generator `rng`. Batch k always uses the
+    k-th child of SeedSequence(seed), whichever worker runs it, and batches
+    are folded in order, so a given seed gives the same replicates and the
+    same stopping point on every run and for any number of workers.
+
+    After each batch (once min_replicates are in) the percentile CI of every
+    key in `metrics` (all keys when None or when none of them is returned)
+    is compared with the previous one; sampling stops when no endpoint moved
+    by `tol` or more, at max_replicates, or when max_seconds of wall time
+    have passed (the only case that depends on machine speed). A replicate
+    that returns no keys has nothing to resample and ends the run.
+
+    Returns (samples {key: (B, ...) array}, info dict).
+    """
+    n_workers = n_workers or min(8, os.cpu_count() or 1)
+    seeds = np.random.SeedSequence(seed)
+    q = [50 * (1 - ci), 50 * (1 + ci)]
+
+    batches = []
+    total = 0
+    previous = None
+    converged = timed_out = False
+    start = time.monotonic()
+
+    def run(args):
+        child, n = args
+        return replicate(np.random.default_rng(child), n)
+
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        while total < max_replicates and not (converged or timed_out):
+            sizes = []
+            for _ in range(n_workers):
+                n = min(batch_size, max_replicates - total - sum(sizes))
+                if n <= 0:
+                    break
+                sizes.append(n)
+
+            for n, batch in zip(sizes, pool.map(run, zip(seeds.spawn(len(sizes)), sizes))):
+                if not batch:
+                    converged = True  # nothing to resample
+                    break
+                batches.append(batch)
+                total += n
+                if total < min_replicates:
+                    continue
+
+                # Selected keys the replicates do not produce leave every key to converge
+                keys = [k for k in (metrics or []) if k in batch] or list(batch)
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN slices
+                    bounds = {
+                        k: np.nanpercentile(np.concatenate([b[k] for b in batches]), q, axis=0)
+                        for k in keys
+                    }
+                if previous is not None:
+                    moved = [np.abs(bounds[k] - previous[k]) for k in keys]
+                    converged = all(np.all(~(m >= tol)) for m in moved)  # NaN: nothing to converge
+                previous = bounds
+                if converged:
+                    break
+
+            timed_out = not converged and time.monotonic() - start > max_seconds
+
+    samples = {k: np.concatenate([b[k] for b in batches]) for k in batches[0]} if batches else {}
+    info = {
+        "replicates": total,
+        "converged": converged,
+        "timed_out": timed_out,
+        "seconds": time.monotonic() - start,
+        "seed": seed,
+    }
+    return samples, info
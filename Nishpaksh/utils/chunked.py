@@ -0,0 +1,204 @@
+# utils/chunked.py
+# Out-of-core evaluation of CSV files too large to load into memory
+#
+# Only the ground-truth, protected and prediction columns are read, chunk by
+# chunk, and every chunk is reduced to per-group confusion counts that are
+# folded into FairnessAccumulator objects. Memory depends on the chunk size
+# and the number of groups, not on the file size. Every problem type shares
+# one reduction loop (reduce_chunks) and differs only in how a chunk is
+# parsed and folded into its accumulators.
+
+import numpy as np
+import pandas as pd
+
+from utils.multiclass_metrics import MulticlassAccumulator, multiclass_tensor
+from utils.ranking_metrics import RankingAccumulator, ranking_sums
+from utils.regression_metrics import RegressionAccumulator, regression_stats
+from utils.two_class_metrics import FairnessAccumulator, confusion_tensor_multi, encode_groups, match_value
+
+
+def iter_csv_chunks(source, columns, chunk_size):
+    """
+    Chunks of the given columns, read as raw text. `source` is a path or
+    file object, or an in-memory DataFrame, which is yielded whole.
+    """
+    if isinstance(source, pd.DataFrame):
+        return iter([source[columns]])
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return pd.read_csv(source, usecols=columns, dtype=str, chunksize=chunk_size)
+
+
+def chunk_weights(chunk, weight_col):
+    """Non-negative row weights of a chunk (missing or unparseable = 0), or None."""
+    if weight_col is None:
+        return None
+    return pd.to_numeric(chunk[weight_col], errors="coerce").fillna(0).clip(lower=0).to_numpy(dtype=float)
+
+
+def group_codes(values, privileged_value):
+    """
+    encode_groups of a protected column read as text, with every value that
+    matches the privileged class relabelled to it.
+    """
+    sens = pd.Series(values).astype(str).to_numpy(dtype=object)
+    sens[match_value(sens, privileged_value)] = privileged_value
+    return encode_groups(sens)
+
+
+def reduce_chunks(chunks, protected_attrs, models, new_accumulator, prepare, fold):
+    """
+    Fold chunks into {attribute: {model: accumulator}}.
+
+    new_accumulator(privileged_class) starts one accumulator, prepare(chunk)
+    parses the chunk's target, prediction and weight columns once, and
+    fold(by_model, prepared, codes, labels) adds that chunk's rows, grouped
+    by one attribute, to the attribute's {model: accumulator}.
+    """
+    accs = {
+        p["attribute"]: {col: new_accumulator(p["privileged_class"]) for col in models}
+        for p in protected_attrs
+    }
+    for chunk in chunks:
+        prepared = prepare(chunk)
+        for p in protected_attrs:
+            codes, labels = group_codes(chunk[p["attribute"]], p["privileged_class"])
+            fold(accs[p["attribute"]], prepared, codes, labels)
+    return accs
+
+
+def _columns(*cols, weight_col=None):
+    return list(dict.fromkeys([*cols, *([weight_col] if weight_col else [])]))
+
+
+def accumulate_csv(source, label_col, pred_cols, protected_attrs, pos_true, pos_pred,
+                   chunk_size=500_000, weight_col=None):
+    """
+    Stream a CSV into {attribute: {model: FairnessAccumulator}}.
+
+    Rows whose protected value matches the configured privileged class are
+    relabelled to it, so the accumulators agree with the in-memory path.
+    With weight_col, every row counts with that column's weight.
+    """
+    attrs = [p["attribute"] for p in protected_attrs]
+    columns = _columns(label_col, *attrs, *pred_cols, weight_col=weight_col)
+
+    def prepare(chunk):
+        y_true = match_value(chunk[label_col], pos_true)
+        P = np.column_stack([match_value(chunk[col], pos_pred) for col in pred_cols])
+        w = chunk_weights(chunk, weight_col)
+        return y_true, P, w, None if w is None else float(np.square(w).sum())
+
+    def fold(by_model, prepared, codes, labels):
+        y_true, P, w, weight_sq = prepared
+        counts = confusion_tensor_multi(y_true, P, codes, len(labels), sample_weight=w)
+        for j, col in enumerate(pred_cols):
+            by_model[col].add_counts(counts[j], labels, weight_sq)
+
+    return reduce_chunks(
+        iter_csv_chunks(source, columns, chunk_size), protected_attrs, pred_cols,
+        FairnessAccumulator, prepare, fold,
+    )
+
+
+def accumulate_regression_csv(source, label_col, pred_cols, protected_attrs, edges=None,
+                              chunk_size=500_000, weight_col=None):
+    """
+    Stream a CSV of continuous targets and predictions into
+    {attribute: {model: RegressionAccumulator}}. `edges` (e.g. from a
+    preview of the file) fixes the prediction histogram bins up front.
+    """
+    attrs = [p["attribute"] for p in protected_attrs]
+    columns = _columns(label_col, *attrs, *pred_cols, weight_col=weight_col)
+
+    def prepare(chunk):
+        y = pd.to_numeric(chunk[label_col], errors="coerce").to_numpy(dtype=float)
+        P = np.column_stack([pd.to_numeric(chunk[col], errors="coerce").to_numpy(dtype=float) for col in pred_cols])
+        return y, P, chunk_weights(chunk, weight_col)
+
+    def fold(by_model, prepared, codes, labels):
+        y, P, w = prepared
+        sums, hist = regression_stats(y, P, codes, len(labels), edges, w)
+        for j, col in enumerate(pred_cols):
+            by_model[col].add_sums(sums[j], labels, None if hist is None else hist[j])
+
+    return reduce_chunks(
+        iter_csv_chunks(source, columns, chunk_size), protected_attrs, pred_cols,
+        lambda priv: RegressionAccumulator(priv, edges), prepare, fold,
+    )
+
+
+def accumulate_multiclass_csv(source, label_col, pred_cols, protected_attrs, classes,
+                              chunk_size=500_000, weight_col=None):
+    """
+    Stream a CSV into {attribute: {model: MulticlassAccumulator}} over a
+    fixed list of classes; labels or predictions outside it are skipped.
+    """
+    attrs = [p["attribute"] for p in protected_attrs]
+    columns = _columns(label_col, *attrs, *pred_cols, weight_col=weight_col)
+
+    def prepare(chunk):
+        y = chunk[label_col].to_numpy(dtype=object)
+        return y, chunk[pred_cols].to_numpy(dtype=object), chunk_weights(chunk, weight_col)
+
+    def fold(by_model, prepared, codes, labels):
+        y, P, w = prepared
+        counts = multiclass_tensor(y, P, classes, codes, len(labels), w)
+        for j, col in enumerate(pred_cols):
+            by_model[col].add_counts(counts[j], labels)
+
+    return reduce_chunks(
+        iter_csv_chunks(source, columns, chunk_size), protected_attrs, pred_cols,
+        lambda priv: MulticlassAccumulator(classes, priv), prepare, fold,
+    )
+
+
+def iter_query_partitions(chunks, query_col):
+    """
+    Re-cut chunks of a file grouped by query so that no query spans two
+    partitions: the trailing query of each chunk is held back and prepended
+    to the next one.
+    """
+    carry = None
+    for chunk in chunks:
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        q = chunk[query_col].to_numpy()
+        other = np.flatnonzero(q != q[-1]) if len(q) else np.zeros(0, dtype=np.intp)
+        cut = other[-1] + 1 if len(other) else 0
+        carry = chunk.iloc[cut:]
+        if cut:
+            yield chunk.iloc[:cut]
+    if carry is not None and len(carry):
+        yield carry
+
+
+def accumulate_ranking_csv(source, query_col, score_cols, protected_attrs, k=10, patience=0.5,
+                           chunk_size=500_000):
+    """
+    Stream a CSV of (query, item attributes, scores) impressions, grouped by
+    query, into {attribute: {model: RankingAccumulator}} one query
+    partition at a time. An in-memory frame need not be grouped by query.
+    """
+    attrs = [p["attribute"] for p in protected_attrs]
+    columns = _columns(query_col, *attrs, *score_cols)
+
+    chunks = iter_csv_chunks(source, columns, chunk_size)
+    if not isinstance(source, pd.DataFrame):
+        chunks = iter_query_partitions(chunks, query_col)
+
+    def prepare(part):
+        q_codes, _ = pd.factorize(part[query_col], use_na_sentinel=False)
+        S = np.column_stack([pd.to_numeric(part[col], errors="coerce").to_numpy(dtype=float) for col in score_cols])
+        return q_codes, S
+
+    def fold(by_model, prepared, codes, labels):
+        q_codes, S = prepared
+        sums = ranking_sums(q_codes, S, codes, len(labels), k, patience)
+        for j, col in enumerate(score_cols):
+            by_model[col].add_sums(sums[j], labels)
+
+    return reduce_chunks(
+        chunks, protected_attrs, score_cols,
+        lambda priv: RankingAccumulator(priv, k, patience), prepare, fold,
+    )
@@ -0,0 +1,136 @@
+# utils/confidence_intervals.py
+# Closed-form confidence intervals for the count-based fairness metrics
+#
+# Every interval is a function of the (group x y_true x y_pred) counts only,
+# so it costs a handful of array operations instead of a bootstrap:
+#   - rate differences : Newcombe hybrid score interval (from Wilson intervals)
+#   - AOD / Equalized Odds : MOVER combination of the TPR and FPR intervals
+#   - DI, Selection Rate Ratio, Accuracy Ratio : log-ratio (delta method) interval
+
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+from utils.two_class_metrics import _ratio, _safe_ratio, rate_counts
+
+
+def wilson_interval(k, n, z=1.96):
+    """Wilson score interval of k successes in n trials; NaN where n == 0."""
+    k = np.asarray(k, dtype=float)
+    n = np.asarray(n, dtype=float)
+    p = _ratio(k, n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        denom = 1 + z ** 2 / n
+        centre = (p + z ** 2 / (2 * n)) / denom
+        half = z * np.sqrt(p * (1 - p) / n + z ** 2 / (4 * n ** 2)) / denom
+    return centre - half, centre + half
+
+
+def newcombe_interval(k1, n1, k2, n2, z=1.96):
+    """(estimate, lower, upper) of p1 - p2 (Newcombe's method 10)."""
+    p1, p2 = _ratio(k1, n1), _ratio(k2, n2)
+    l1, u1 = wilson_interval(k1, n1, z)
+    l2, u2 = wilson_interval(k2, n2, z)
+    d = p1 - p2
+    return (
+        d,
+        d - np.sqrt((p1 - l1) ** 2 + (u2 - p2) ** 2),
+        d + np.sqrt((u1 - p1) ** 2 + (p2 - l2) ** 2),
+    )
+
+
+def log_ratio_interval(k1, n1, k2, n2, z=1.96):
+    """
+    (estimate, lower, upper) of p1 / p2 from the delta-method standard error
+    of log(p1 / p2). Zero counts get a 0.5 continuity correction in the
+    standard error only. The estimate follows the point metric's convention
+    (_safe_ratio): 0 when p2 is 0 or undefined.
+    """
+    k1, n1, k2, n2 = (np.asarray(a, dtype=float) for a in (k1, n1, k2, n2))
+    r = _safe_ratio(_ratio(k1, n1), _ratio(k2, n2))
+
+    zero = (k1 == 0) | (k2 == 0)
+    c1, c2 = np.where(zero, k1 + 0.5, k1), np.where(zero, k2 + 0.5, k2)
+    m1, m2 = np.where(zero, n1 + 1.0, n1), np.where(zero, n2 + 1.0, n2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        se = np.sqrt(1 / c1 - 1 / m1 + 1 / c2 - 1 / m2)
+        centre = np.where(zero, (c1 / m1) / (c2 / m2), r)
+    return r, np.minimum(centre * np.exp(-z * se), r), np.maximum(centre * np.exp(z * se), r)
+
+
+def _mover_sum(weights, intervals):
+    """MOVER interval of sum(w_i * d_i) for independent estimates d_i, w_i > 0."""
+    est = sum(w * d for w, (d, _, _) in zip(weights, intervals))
+    lo = est - np.sqrt(sum((w * (d - l)) ** 2 for w, (d, l, _) in zip(weights, intervals)))
+    hi = est + np.sqrt(sum((w * (u - d)) ** 2 for w, (d, _, u) in zip(weights, intervals)))
+    return est, lo, hi
+
+
+def _abs_interval(d, lo, hi):
+    """Interval of |d| implied by an interval (lo, hi) of d."""
+    covers = (lo <= 0) & (hi >= 0)
+    a_lo = np.where(covers, 0.0, np.minimum(np.abs(lo), np.abs(hi)))
+    a_hi = np.maximum(np.abs(lo), np.abs(hi))
+    return np.abs(d), a_lo, a_hi
+
+
+_DIFFERENCES = {
+    "Statistical Parity Difference": "SR",
+    "Selection Rate Difference": "SR",
+    "Equal Opportunity Difference": "TPR",
+    "False Positive Rate Difference": "FPR",
+    "False Negative Rate Difference": "FNR",
+    "Error Rate Difference": "ERR",
+    "Accuracy Difference": "ACC",
+    "Precision Difference": "PPV",
+    "NPV Difference": "NPV",
+}
+
+_RATIOS = {
+    "Disparate Impact": "SR",
+    "Selection Rate Ratio": "SR",
+    "Accuracy Ratio": "ACC",
+}
+
+
+def analytic_intervals(counts, is_priv, ci=0.95):
+    """
+    {metric: (estimate, lower, upper)} for every metric with a closed-form
+    interval, unprivileged vs pooled privileged, from (..., G, 2, 2) counts.
+    Leading dimensions (e.g. models) broadcast.
+    """
+    counts = np.asarray(counts, dtype=float)
+    is_priv = np.asarray(is_priv, dtype=bool)
+    priv = counts[..., is_priv, :, :].sum(axis=-3)
+    unpriv = counts[..., ~is_priv, :, :].sum(axis=-3)
+    z = norm.ppf(0.5 + ci / 2)
+
+    def diff(rate):
+        return newcombe_interval(*rate_counts(unpriv, rate), *rate_counts(priv, rate), z)
+
+    out = {m: diff(rate) for m, rate in _DIFFERENCES.items()}
+    for m, rate in _RATIOS.items():
+        out[m] = log_ratio_interval(*rate_counts(unpriv, rate), *rate_counts(priv, rate), z)
+
+    tpr, fpr = out["Equal Opportunity Difference"], out["False Positive Rate Difference"]
+    out["Average Odds Difference"] = _mover_sum((0.5, 0.5), (tpr, fpr))
+    out["Equalized Odds"] = _mover_sum((0.5, 0.5), (_abs_interval(*tpr), _abs_interval(*fpr)))
+    return out
+
+
+def intervals_frame(intervals, models):
+    """
+    Long (Metric, Model, Mean, Lower, Upper) frame from analytic_intervals()
+    over an (M,)-shaped leading dimension; feeds plot_fairness_error_bars.
+    """
+    rows = []
+    for metric, (est, lo, hi) in intervals.items():
+        for j, model in enumerate(models):
+            rows.append({
+                "Metric": metric,
+                "Model": model,
+                "Mean": float(est[j]),
+                "Lower": float(lo[j]),
+                "Upper": float(hi[j]),
+            })
+    return pd.DataFrame(rows, columns=["Metric", "Model", "Mean", "Lower", "Upper"])
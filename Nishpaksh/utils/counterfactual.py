@@ -0,0 +1,178 @@
+# utils/counterfactual.py
+# Counterfactual fairness of an uploaded model
+#
+# Every protected attribute is swapped through all of its categories (and,
+# when requested, every joint combination across attributes) and the model
+# is asked again. Rows are scored in fixed-size chunks: each chunk is copied
+# once into a working frame whose protected columns are overwritten in
+# place per scenario, so memory is bounded by the chunk, never by X. Rows
+# that already hold a scenario's values are not re-scored. Flips are reduced
+# to per-(scenario, original group) sums with bincount.
+
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+from utils.chunked import chunk_weights
+from utils.multiclass_metrics import class_labels
+
+FLIP_FIELDS = ("n", "flips", "to_positive", "to_negative")
+
+
+def iter_frame_chunks(frame, chunk_size=50_000):
+    """Row slices of an in-memory frame (views, not copies)."""
+    for start in range(0, len(frame), chunk_size):
+        yield frame.iloc[start:start + chunk_size]
+
+
+def _constant_like(s, value):
+    """A column of `value` with the dtype of `s`, so encoders see what they were fit on."""
+    if isinstance(s.dtype, np.dtype):
+        return np.full(len(s), value, dtype=s.dtype)
+    return pd.Series(value, index=s.index).astype(s.dtype)
+
+
+def counterfactual_plans(categories, joint=True, max_joint=64):
+    """
+    [(attributes, targets)]: every attribute on its own with each of its
+    categories as a target, then (with joint and at most max_joint
+    combinations) all attributes together over every combination.
+    """
+    attrs = list(categories)
+    plans = [((a,), [(v,) for v in categories[a]]) for a in attrs]
+    if joint and len(attrs) > 1:
+        targets = list(product(*(categories[a] for a in attrs)))
+        if len(targets) <= max_joint:
+            plans.append((tuple(attrs), targets))
+    return plans
+
+
+class CounterfactualAccumulator:
+    """
+    Per-(scenario, original group) flip sums of one model over streamed
+    chunks. A row's group is its original value (combination) of the
+    swapped attributes; values outside `categories` fall into "(other)".
+    A scenario only counts the rows it actually changes.
+    """
+
+    def __init__(self, predict, features, categories, positive=None, joint=True, max_joint=64):
+        self.predict = predict
+        self.features = list(features)
+        self.categories = {a: list(v) for a, v in categories.items()}
+        self.positive = None if positive is None else class_labels([positive])[0]
+        self.plans = counterfactual_plans(self.categories, joint, max_joint)
+
+        # Group ids are mixed-radix over (categories + "(other)") of each attribute
+        self._radix = [[len(self.categories[a]) + 1 for a in attrs] for attrs, _ in self.plans]
+        self.sums = [
+            np.zeros((len(targets), int(np.prod(radix)), len(FLIP_FIELDS)))
+            for (_, targets), radix in zip(self.plans, self._radix)
+        ]
+        self.any_flip = [np.zeros((int(np.prod(radix)), 2)) for radix in self._radix]
+
+    def _codes(self, X):
+        return {
+            a: pd.Categorical(X[a], categories=cats).codes.astype(np.intp) % (len(cats) + 1)
+            for a, cats in self.categories.items()
+        }
+
+    def _is_positive(self, pred):
+        if self.positive is None:
+            return np.zeros(len(pred), dtype=bool)
+        return class_labels(pred) == self.positive
+
+    def update(self, X, sample_weight=None):
+        X = X[self.features]
+        w = np.ones(len(X)) if sample_weight is None else np.asarray(sample_weight, dtype=float)
+        base = np.asarray(self.predict(X))
+        base_pos = self._is_positive(base)
+        codes = self._codes(X)
+
+        work = X.copy()  # the only copy: one chunk, reused by every scenario
+        for i, (attrs, targets) in enumerate(self.plans):
+            key = np.zeros(len(X), dtype=np.intp)
+            for a, r in zip(attrs, self._radix[i]):
+                key = key * r + codes[a]
+            size = self.sums[i].shape[1]
+
+            any_flip = np.zeros(len(X), dtype=bool)
+            for t, target in enumerate(targets):
+                changed = np.zeros(len(X), dtype=bool)
+                for a, v in zip(attrs, target):
+                    changed |= codes[a] != self.categories[a].index(v)
+                    work[a] = _constant_like(X[a], v)
+
+                # Rows already at the target cannot flip: only the others are scored
+                pred = base.copy()
+                if changed.all():
+                    pred = np.asarray(self.predict(work))
+                elif changed.any():
+                    pred[changed] = np.asarray(self.predict(work[changed]))
+                flip = changed & (pred != base)
+                pred_pos = self._is_positive(pred)
+                any_flip |= flip
+
+                for j, mask in enumerate((changed, flip, flip & pred_pos, flip & base_pos)):
+                    self.sums[i][t, :, j] += np.bincount(key, weights=w * mask, minlength=size)
+
+            for a in attrs:
+                work[a] = X[a]
+            self.any_flip[i][:, 0] += np.bincount(key, weights=w, minlength=size)
+            self.any_flip[i][:, 1] += np.bincount(key, weights=w * any_flip, minlength=size)
+        return self
+
+    def _group_labels(self, i):
+        attrs = self.plans[i][0]
+        return [
+            " ∧ ".join(f"{a}={str(v).strip()}" for a, v in zip(attrs, combo))
+            for combo in product(*([*self.categories[a], "(other)"] for a in attrs))
+        ]
+
+    def flip_table(self):
+        """Flip rate of every (attributes, original group, target) with changed rows."""
+        rows = []
+        for i, (attrs, targets) in enumerate(self.plans):
+            groups = self._group_labels(i)
+            for t, target in enumerate(targets):
+                for g in np.flatnonzero(self.sums[i][t, :, 0] > 0):
+                    n, flips, up, down = self.sums[i][t, g]
+                    rows.append({
+                        "Attribute": " × ".join(attrs),
+                        "Group": groups[g],
+                        "Set to": ", ".join(str(v).strip() for v in target),
+                        "n": n,
+                        "Flip rate": flips / n,
+                        "To positive": up / n if self.positive is not None else np.nan,
+                        "To negative": down / n if self.positive is not None else np.nan,
+                    })
+        return pd.DataFrame(
+            rows, columns=["Attribute", "Group", "Set to", "n", "Flip rate", "To positive", "To negative"]
+        )
+
+    def summary(self):
+        """Share of each group's rows whose prediction changes under any swap of the attributes."""
+        rows = []
+        for i, (attrs, _) in enumerate(self.plans):
+            groups = self._group_labels(i)
+            for g in np.flatnonzero(self.any_flip[i][:, 0] > 0):
+                n, flipped = self.any_flip[i][g]
+                rows.append({
+                    "Attribute": " × ".join(attrs),
+                    "Group": groups[g],
+                    "n": n,
+                    "Any-flip rate": flipped / n,
+                })
+        return pd.DataFrame(rows, columns=["Attribute", "Group", "n", "Any-flip rate"])
+
+
+def counterfactual_flips(predict, chunks, features, categories, positive=None, joint=True, max_joint=64,
+                         weight_col=None):
+    """
+    Stream `chunks` (DataFrames holding `features`, and weight_col if
+    given) through a CounterfactualAccumulator. Returns (flip_table, summary).
+    """
+    acc = CounterfactualAccumulator(predict, features, categories, positive, joint, max_joint)
+    for chunk in chunks:
+        acc.update(chunk, chunk_weights(chunk, weight_col))
+    return acc.flip_table(), acc.summary()
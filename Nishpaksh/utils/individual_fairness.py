@@ -0,0 +1,155 @@
+# utils/individual_fairness.py
+# Neighbourhood-based individual fairness metrics
+#
+# Radius / k-nearest-neighbour queries go through a KD-tree or ball tree in
+# fixed-size query chunks, so memory stays bounded by the chunk size rather
+# than growing with the n x n distance matrix.
+
+import numpy as np
+from scipy.stats import norm
+from sklearn.neighbors import BallTree, KDTree, NearestNeighbors
+
+
+def _as_matrix(X):
+    X = np.asarray(X, dtype=float)
+    return X.reshape(-1, 1) if X.ndim == 1 else X
+
+
+def _build_tree(X):
+    # KD-trees degrade in high dimensions; ball trees hold up better there
+    return KDTree(X) if X.shape[1] <= 15 else BallTree(X)
+
+
+def _radius_counts(tree, Q, r, chunk_size):
+    out = np.empty(len(Q), dtype=np.int64)
+    for s in range(0, len(Q), chunk_size):
+        out[s:s + chunk_size] = tree.query_radius(Q[s:s + chunk_size], r, count_only=True)
+    return out
+
+
+def awareness_sums(X, y_pred, radius=0.1, rows=None, chunk_size=10000):
+    """
+    For each query row i (all rows, or the indices in `rows`) return
+      N_i = number of other rows strictly closer than `radius`
+      D_i = sum of |y_i - y_j| over those rows
+    Binary predictions only need neighbour counts; other predictions fall
+    back to chunked neighbour lists.
+    """
+    if radius <= 0:
+        raise ValueError("radius must be positive")
+
+    X = _as_matrix(X)
+    y = np.asarray(y_pred, dtype=float)
+    rows = np.arange(len(y)) if rows is None else np.asarray(rows)
+    r = np.nextafter(radius, 0)  # query_radius is inclusive; metric uses '<'
+
+    Q, yq = X[rows], y[rows]
+    tree = _build_tree(X)
+    N = _radius_counts(tree, Q, r, chunk_size) - 1  # drop the row itself
+
+    if np.isin(y, (0.0, 1.0)).all():
+        D = np.zeros(len(rows), dtype=np.int64)
+        for val in (0.0, 1.0):
+            other = y != val
+            query = yq == val
+            if other.any() and query.any():
+                D[query] = _radius_counts(_build_tree(X[other]), Q[query], r, chunk_size)
+        return N, D.astype(float)
+
+    D = np.zeros(len(rows))
+    for s in range(0, len(rows), chunk_size):
+        ind = tree.query_radius(Q[s:s + chunk_size], r)
+        lengths = np.fromiter((len(a) for a in ind), dtype=np.int64, count=len(ind))
+        if lengths.sum() == 0:
+            continue
+        local = np.repeat(np.arange(len(ind)), lengths)
+        nbrs = np.concatenate(ind)
+        D[s:s + len(ind)] = np.bincount(
+            local, weights=np.abs(yq[s:s + len(ind)][local] - y[nbrs]), minlength=len(ind)
+        )
+    return N, D
+
+
+def fairness_through_awareness(X, y_pred, radius=0.1, sample_size=None, ci=0.95,
+                               random_state=None, chunk_size=10000):
+    """
+    Mean |y_i - y_j| over all pairs closer than `radius`.
+
+    With sample_size set, only that many query rows are drawn (uniformly,
+    without replacement) and the pair mean is estimated with a ratio
+    estimator; its standard error uses the delta method with a finite
+    population correction.
+
+    Returns {"value", "std_error", "ci_low", "ci_high", "n_queries"}.
+    """
+    n = len(y_pred)
+    if n == 0:
+        return {"value": 0, "std_error": 0.0, "ci_low": 0, "ci_high": 0, "n_queries": 0}
+
+    rows = None
+    if sample_size is not None and sample_size < n:
+        rng = np.random.default_rng(random_state)
+        rows = rng.choice(n, size=int(sample_size), replace=False)
+
+    N, D = awareness_sums(X, y_pred, radius=radius, rows=rows, chunk_size=chunk_size)
+    m = len(N)
+
+    if N.sum() == 0:
+        return {"value": 0, "std_error": 0.0, "ci_low": 0, "ci_high": 0, "n_queries": m}
+
+    value = float(D.sum() / N.sum())
+    se = 0.0
+    if rows is not None and m > 1:
+        resid = D - value * N
+        se = float(np.sqrt((1 - m / n) * resid.var(ddof=1) / m) / N.mean())
+
+    z = norm.ppf(0.5 + ci / 2)
+    return {
+        "value": value,
+        "std_error": se,
+        "ci_low": float(value - z * se),
+        "ci_high": float(value + z * se),
+        "n_queries": m,
+    }
+
+
+def consistency(X, y_pred, k=5, sample_size=None, ci=0.95, random_state=None,
+                n_jobs=None, chunk_size=10000):
+    """
+    1 - mean over rows of mean |y_i - y_j| across the k nearest neighbours.
+
+    kneighbors runs in query chunks of `chunk_size` rows (parallelised with
+    `n_jobs`). With sample_size set, only that many query rows are drawn and
+    the standard error of the sample mean is reported.
+
+    Returns {"value", "std_error", "ci_low", "ci_high", "n_queries"}.
+    """
+    X = _as_matrix(X)
+    y = np.asarray(y_pred, dtype=float)
+    n = len(y)
+
+    rows = np.arange(n)
+    if sample_size is not None and sample_size < n:
+        rng = np.random.default_rng(random_state)
+        rows = rng.choice(n, size=int(sample_size), replace=False)
+
+    nbrs = NearestNeighbors(n_neighbors=k + 1, n_jobs=n_jobs).fit(X)
+
+    d = np.empty(len(rows))
+    for s in range(0, len(rows), chunk_size):
+        q = rows[s:s + chunk_size]
+        ind = nbrs.kneighbors(X[q], return_distance=False)[:, 1:]  # first hit is the row itself
+        d[s:s + len(q)] = np.abs(y[q][:, None] - y[ind]).mean(axis=1)
+
+    value = float(1 - d.mean())
+    m = len(rows)
+    se = float(np.sqrt((1 - m / n) * d.var(ddof=1) / m)) if m < n and m > 1 else 0.0
+
+    z = norm.ppf(0.5 + ci / 2)
+    return {
+        "value": value,
+        "std_error": se,
+        "ci_low": float(value - z * se),
+        "ci_high": float(value + z * se),
+        "n_queries": m,
+    }
@@ -0,0 +1,71 @@
+# utils/intersectional.py
+# Intersectional subgroups across several protected attributes
+
+import numpy as np
+import pandas as pd
+
+from utils.two_class_metrics import confusion_tensor_multi, group_metric_table
+
+
+def encode_intersections(columns):
+    """
+    Encode the tuple of several attribute columns into one compact group id.
+
+    Each column is factorized, the per-column codes are combined with
+    np.ravel_multi_index and re-factorized so that only non-empty
+    intersections get an id. Returns (codes, values) where values[k] is the
+    tuple of attribute values of intersection k.
+    """
+    per_attr = [pd.factorize(pd.Series(c), use_na_sentinel=False) for c in columns]
+    dims = tuple(len(u) for _, u in per_attr)
+    flat = np.ravel_multi_index([c for c, _ in per_attr], dims)
+    codes, uniq_flat = pd.factorize(flat)
+
+    parts = np.unravel_index(np.asarray(uniq_flat), dims)
+    values = list(zip(*(np.asarray(u)[p] for (_, u), p in zip(per_attr, parts))))
+    return codes, values
+
+
+def intersection_label(attrs, values):
+    return " ∧ ".join(f"{a}={v}" for a, v in zip(attrs, values))
+
+
+def intersectional_group_tables(y_true, preds, models, columns, attrs, privileged, min_support=30,
+                                sample_weight=None, reference=None):
+    """
+    Metrics of every non-empty intersection against a reference
+    intersection (by default the all-privileged one), for every model, from
+    one (model x intersection x y_true x y_pred) count tensor.
+
+    preds      : (n, M) {0,1} prediction matrix, columns aligned with `models`
+    columns    : list of attribute arrays, aligned with `attrs`
+    privileged : tuple of privileged values, aligned with `attrs`
+    min_support: intersections with fewer rows (or less total weight) are
+                 dropped from the tables
+    reference  : tuple of values, aligned with `attrs`, of the intersection
+                 every other one is compared against
+
+    Returns ({model: (intersections x metrics) frame}, info). info holds the
+    reference "label", its support "n" and "ok", which is False when the
+    reference is empty or below min_support (its metrics are then NaN or
+    unreliable).
+    """
+    codes, values = encode_intersections(columns)
+    counts = confusion_tensor_multi(y_true, preds, codes, len(values), sample_weight=sample_weight)
+
+    reference = tuple(str(p) for p in (privileged if reference is None else reference))
+    is_priv = np.array([tuple(str(v) for v in vals) == reference for vals in values], dtype=bool)
+    labels = [intersection_label(attrs, vals) for vals in values]
+
+    support = float(counts[0][is_priv].sum()) if len(models) else 0.0
+    info = {
+        "label": intersection_label(attrs, reference),
+        "n": support,
+        "ok": support > 0 and support >= min_support,
+    }
+
+    tables = {}
+    for j, model in enumerate(models):
+        table = group_metric_table(counts[j], labels, is_priv)
+        tables[model] = table[table["n"] >= min_support]
+    return tables, info
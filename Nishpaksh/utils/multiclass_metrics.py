@@ -0,0 +1,202 @@
+# utils/multiclass_metrics.py
+# Multi-class fairness from one (group x true class x predicted class) tensor
+#
+# The K x K confusion matrix of every group comes out of a single bincount.
+# Each class is then scored one-vs-rest by folding that tensor into the
+# usual (y_true x y_pred) 2 x 2 counts, so every class-wise metric reuses
+# the count-based metric registry of the binary case.
+
+import numpy as np
+import pandas as pd
+
+from utils.two_class_metrics import GroupIndexMixin, _ratio, encode_groups, fairness_from_counts
+
+MULTICLASS_METRICS = [
+    "Statistical Parity Difference",
+    "Equal Opportunity Difference",
+    "Average Odds Difference",
+    "Error Rate Difference",
+]
+
+# macro: mean absolute per-class value; worst: the signed value of the class
+# furthest from 0. Signed one-vs-rest differences of a metric like SPD sum to
+# zero over the classes, so a plain mean would always hide the disparity.
+CLASS_AGGREGATIONS = ("macro", "worst")
+
+
+def class_labels(values):
+    """
+    Class labels as strings. Numeric values, including numbers read as text,
+    are written canonically so that 1, 1.0 and "1.0" are the same class "1".
+    """
+    s = pd.Series(values)
+    if not pd.api.types.is_numeric_dtype(s):
+        num = pd.to_numeric(s, errors="coerce")
+        if num.notna().sum() == s.notna().sum():
+            s = num
+    if pd.api.types.is_float_dtype(s):
+        whole = s.dropna()
+        if (whole == np.round(whole)).all():
+            s = s.astype("Int64")
+    return s.astype(str).where(s.notna(), None).to_numpy(dtype=object)
+
+
+def encode_classes(values, classes):
+    """
+    Integer class codes of `values` within `classes`; -1 for anything else.
+    Both sides are compared as class_labels, so classes may be given as numbers.
+    """
+    return pd.Index(class_labels(classes)).get_indexer(class_labels(values)).astype(np.intp)
+
+
+def multiclass_tensor(y_true, y_pred, classes, group_codes=None, n_groups=1, sample_weight=None):
+    """
+    (G, K, K) counts indexed [group, true class, predicted class], or
+    (M, G, K, K) for an (n, M) matrix of M models' predictions, in one
+    bincount. Rows whose label or prediction is not in `classes` are
+    skipped. float64 weight sums when sample_weight is given.
+    """
+    K = len(classes)
+    t = encode_classes(y_true, classes)
+    P = np.asarray(y_pred)
+    single = P.ndim == 1
+    P = P[:, None] if single else P
+    M = P.shape[1]
+    codes = np.zeros(len(t), dtype=np.intp) if group_codes is None else np.asarray(group_codes, dtype=np.intp)
+
+    p = np.column_stack([encode_classes(P[:, j], classes) for j in range(M)])
+    cell = (codes * K + t)[:, None] * K + p + (n_groups * K * K) * np.arange(M)
+    keep = (t[:, None] >= 0) & (p >= 0)
+
+    if sample_weight is None:
+        out = np.bincount(cell[keep], minlength=M * n_groups * K * K)
+    else:
+        w = np.broadcast_to(np.asarray(sample_weight, dtype=float)[:, None], cell.shape)
+        out = np.bincount(cell[keep], weights=w[keep], minlength=M * n_groups * K * K)
+
+    out = out.reshape(M, n_groups, K, K)
+    return out[0] if single else out
+
+
+def one_vs_rest_counts(tensor):
+    """(..., K, K) confusion matrices -> (..., K, 2, 2) one-vs-rest counts per class."""
+    T = np.asarray(tensor)
+    tp = np.diagonal(T, axis1=-2, axis2=-1)
+    fn = T.sum(axis=-1) - tp
+    fp = T.sum(axis=-2) - tp
+    tn = T.sum(axis=(-2, -1))[..., None] - tp - fn - fp
+
+    out = np.empty(T.shape[:-1] + (2, 2), dtype=T.dtype)
+    out[..., 0, 0], out[..., 0, 1] = tn, fp
+    out[..., 1, 0], out[..., 1, 1] = fn, tp
+    return out
+
+
+def per_class_metrics(tensor, is_priv, metrics=None):
+    """
+    {metric: (..., K) array} of every class scored one-vs-rest, pooled
+    unprivileged groups against the pooled privileged class, from
+    (..., G, K, K) counts.
+    """
+    T = np.asarray(tensor)
+    is_priv = np.asarray(is_priv, dtype=bool)
+    priv = one_vs_rest_counts(T[..., is_priv, :, :].sum(axis=-3))
+    unpriv = one_vs_rest_counts(T[..., ~is_priv, :, :].sum(axis=-3))
+    return fairness_from_counts(priv, unpriv, MULTICLASS_METRICS if metrics is None else metrics)
+
+
+def aggregate_classes(per_class, how="macro"):
+    """Collapse the class axis (last) of per_class_metrics() output; see CLASS_AGGREGATIONS."""
+    if how not in CLASS_AGGREGATIONS:
+        raise ValueError(f"Unknown class aggregation: {how}")
+
+    out = {}
+    for m, vals in per_class.items():
+        vals = np.asarray(vals, dtype=float)
+        dev = np.abs(vals)
+        ok = ~np.isnan(dev)
+        if how == "macro":
+            out[m] = _ratio(np.where(ok, dev, 0.0).sum(axis=-1), ok.sum(axis=-1))
+        else:
+            idx = np.argmax(np.where(ok, dev, -1.0), axis=-1)
+            out[m] = np.take_along_axis(vals, idx[..., None], axis=-1)[..., 0]
+    return out
+
+
+def class_table(tensor, classes, is_priv, metrics=None):
+    """(classes x metrics) frame for one model, with each class's true support "n"."""
+    T = np.asarray(tensor)
+    table = pd.DataFrame(
+        per_class_metrics(T, is_priv, metrics),
+        index=pd.Index(list(classes), name="class"),
+    )
+    table.insert(0, "n", T.sum(axis=(0, 2)))
+    return table
+
+
+def multiclass_group_table(tensor, groups, is_priv, how="macro", metrics=None):
+    """
+    (groups x metrics) frame like group_metric_table: each non-privileged
+    group against the pooled privileged class, class metrics aggregated
+    with `how`. Includes group size "n".
+    """
+    T = np.asarray(tensor)
+    is_priv = np.asarray(is_priv, dtype=bool)
+    priv = one_vs_rest_counts(T[is_priv].sum(axis=0))
+    others = T[~is_priv]
+
+    per_class = fairness_from_counts(
+        priv[None], one_vs_rest_counts(others), MULTICLASS_METRICS if metrics is None else metrics
+    )
+    table = pd.DataFrame(
+        aggregate_classes(per_class, how),
+        index=pd.Index(np.asarray(groups)[~is_priv], name="group"),
+    )
+    table.insert(0, "n", others.sum(axis=(1, 2)))
+    return table
+
+
+class MulticlassAccumulator(GroupIndexMixin):
+    """
+    Mergeable (group x true class x predicted class) count state of one
+    model over a fixed list of classes, the multi-class counterpart of
+    FairnessAccumulator. Classes are kept as their class_labels.
+    """
+
+    _group_arrays = ("counts",)
+
+    def __init__(self, classes, privileged_value=1):
+        self.classes = list(class_labels(classes))
+        self.privileged_value = privileged_value
+        self.groups = []
+        self._index = {}
+        K = len(self.classes)
+        self.counts = np.zeros((0, K, K), dtype=np.int64)
+
+    def update(self, y_true, y_pred, groups, sample_weight=None):
+        codes, labels = encode_groups(groups)
+        counts = multiclass_tensor(y_true, y_pred, self.classes, codes, len(labels), sample_weight)
+        return self.add_counts(counts, labels)
+
+    def add_counts(self, counts, labels):
+        """Fold in a pre-computed (G, K, K) tensor whose groups are `labels`."""
+        counts = np.asarray(counts)
+        ids = self._group_ids(labels)
+        if counts.dtype.kind == "f" and self.counts.dtype.kind != "f":
+            self.counts = self.counts.astype(np.float64)  # weighted from here on
+        self.counts[ids] += counts
+        return self
+
+    def merge(self, other):
+        if other.privileged_value != self.privileged_value or other.classes != self.classes:
+            raise ValueError("Cannot merge accumulators with different privileged values or classes")
+        return self.add_counts(other.counts, other.groups)
+
+    def per_class(self, metrics=None):
+        return per_class_metrics(self.counts, self._is_priv(), metrics)
+
+    def class_table(self, metrics=None):
+        return class_table(self.counts, self.classes, self._is_priv(), metrics)
+
+    def group_table(self, how="macro", metrics=None):
+        return multiclass_group_table(self.counts, self.groups, self._is_priv(), how, metrics)
@@ -0,0 +1,190 @@
+# utils/permutation.py
+# Permutation significance tests over (group, label, prediction) count tensors
+#
+# Shuffling the group labels of the rows only moves each model's
+# (y_true, y_pred) cells between groups of fixed sizes, so a permutation is a
+# random table with the observed group sizes and pooled cell counts. Tables
+# for a whole batch of permutations are drawn together, one vectorized
+# hypergeometric draw per (group, cell), and scored with metrics_from_tensor,
+# so thousands of permutations cost about as much as one bootstrap batch.
+
+import numpy as np
+import pandas as pd
+
+from utils.two_class_metrics import RATIO_METRICS, metrics_from_tensor
+
+# Multiple-testing corrections across protected attributes
+PVALUE_CORRECTIONS = {
+    "Holm": "holm",
+    "Bonferroni": "bonferroni",
+    "Benjamini–Hochberg (FDR)": "bh",
+    "None": "none",
+}
+
+# numpy's hypergeometric sampler rejects populations of 10**9 or more
+HYPERGEOMETRIC_MAX = 10**9 - 1
+
+
+def _hypergeometric(rng, ngood, nbad, nsample):
+    """
+    rng.hypergeometric, except where either population is beyond
+    HYPERGEOMETRIC_MAX: there a moment-matched normal draw, rounded and kept
+    within the feasible range, stands in (it is exact to well under one
+    record's share at that size).
+    """
+    big = (ngood > HYPERGEOMETRIC_MAX) | (nbad > HYPERGEOMETRIC_MAX)
+    if not big.any():
+        return rng.hypergeometric(ngood, nbad, nsample)
+
+    out = np.empty(big.shape, dtype=np.int64)
+    out[~big] = rng.hypergeometric(ngood[~big], nbad[~big], nsample[~big])
+
+    good, bad, n = (np.asarray(a[big], dtype=float) for a in (ngood, nbad, nsample))
+    N = good + bad
+    p = good / N
+    sd = np.sqrt(n * p * (1 - p) * (N - n) / np.maximum(N - 1, 1))
+    x = np.rint(rng.normal(n * p, sd))
+    out[big] = np.clip(x, np.maximum(n - bad, 0), np.minimum(n, good))
+    return out
+
+
+def permute_counts(counts, B, rng=None):
+    """
+    B group-label permutations of (..., G, 2, 2) counts, shape (B, ..., G, 2, 2).
+
+    Every permuted table keeps each group's size and the pooled cell counts
+    of its leading index (e.g. model), as shuffling group labels over rows
+    does. Weighted counts are rounded to whole records first. Cells of a
+    billion records or more are dealt from a normal approximation.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    c = np.rint(np.asarray(counts, dtype=float)).astype(np.int64)
+    *lead, G, _, _ = c.shape
+    c = c.reshape(*lead, G, 4)
+
+    remaining = np.broadcast_to(c.sum(axis=-2), (B, *lead, 4)).copy()  # cells not yet dealt
+    out = np.empty((B, *lead, G, 4), dtype=np.int64)
+    for g in range(G - 1):
+        need = np.broadcast_to(c[..., g, :].sum(axis=-1), (B, *lead)).copy()
+        rest = remaining.sum(axis=-1)
+        for k in range(3):
+            rest = rest - remaining[..., k]
+            x = _hypergeometric(rng, remaining[..., k], rest, need)
+            out[..., g, k] = x
+            remaining[..., k] -= x
+            need -= x
+        out[..., g, 3] = need
+        remaining[..., 3] -= need
+    out[..., G - 1, :] = remaining
+    return out.reshape(B, *lead, G, 2, 2)
+
+
+def _deviation(values, metric, ratio_metrics):
+    """Distance of a metric value from no disparity: |log v| for ratios, |v| otherwise."""
+    v = np.asarray(values, dtype=float)
+    if metric in ratio_metrics:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.abs(np.log(v))
+    return np.abs(v)
+
+
+def permutation_pvalues(counts, is_priv, metrics=None, n_permutations=2000, batch_size=500, seed=0,
+                        ratio_metrics=RATIO_METRICS):
+    """
+    Two-sided permutation p-values of count-based metrics from (..., G, 2, 2)
+    counts: the share of group-label permutations whose metric lies at least
+    as far from no disparity as the observed one, (1 + hits) / (1 + valid).
+
+    Permutations run in seeded batches of batch_size. Returns
+    (observed, pvalues), both {metric: array over the leading dimensions};
+    p-values are NaN where the observed metric is undefined.
+    """
+    counts = np.asarray(counts)
+    observed = metrics_from_tensor(counts, is_priv, metrics)
+    obs_dev = {m: _deviation(v, m, ratio_metrics) for m, v in observed.items()}
+    hits = {m: np.zeros(np.shape(v)) for m, v in observed.items()}
+    valid = {m: np.zeros(np.shape(v)) for m, v in observed.items()}
+
+    seeds = np.random.SeedSequence(seed)
+    done = 0
+    while done < n_permutations:
+        nb = min(batch_size, n_permutations - done)
+        perm = permute_counts(counts, nb, np.random.default_rng(seeds.spawn(1)[0]))
+        for m, v in metrics_from_tensor(perm, is_priv, list(observed)).items():
+            dev = _deviation(v, m, ratio_metrics)
+            ok = ~np.isnan(dev)
+            # Relative tolerance so that ties with the observed value count as hits
+            hits[m] += (ok & (dev >= obs_dev[m] * (1 - 1e-9) - 1e-12)).sum(axis=0)
+            valid[m] += ok.sum(axis=0)
+        done += nb
+
+    pvalues = {
+        m: np.where(np.isnan(obs_dev[m]), np.nan, (1 + hits[m]) / (1 + valid[m]))
+        for m in observed
+    }
+    return observed, pvalues
+
+
+def adjust_pvalues(pvalues, method="holm"):
+    """
+    Multiple-testing adjusted p-values along the first axis (NaNs are left
+    out of the family): "holm", "bonferroni", "bh" (Benjamini–Hochberg) or
+    "none".
+    """
+    p = np.asarray(pvalues, dtype=float)
+    if method == "none":
+        return p.copy()
+    if method not in {"holm", "bonferroni", "bh"}:
+        raise ValueError(f"Unknown p-value correction: {method}")
+
+    out = np.full(p.shape, np.nan)
+    flat_p, flat_out = p.reshape(len(p), -1), out.reshape(len(p), -1)
+    for j in range(flat_p.shape[1]):
+        col = flat_p[:, j]
+        idx = np.flatnonzero(~np.isnan(col))
+        m = len(idx)
+        if not m:
+            continue
+        order = idx[np.argsort(col[idx], kind="stable")]
+        ranked = col[order]
+        if method == "bonferroni":
+            adj = ranked * m
+        elif method == "holm":
+            adj = np.maximum.accumulate(ranked * (m - np.arange(m)))
+        else:
+            adj = np.minimum.accumulate((ranked * m / np.arange(1, m + 1))[::-1])[::-1]
+        flat_out[order, j] = np.minimum(adj, 1.0)
+    return out
+
+
+def pvalue_tables(observed_by_attr, pvalues_by_attr, models, method="holm"):
+    """
+    {attribute: long (Metric, Model, Value, p-value, Adjusted p-value) frame}.
+    Each (metric, model) p-value is adjusted across the protected
+    attributes it was tested on.
+    """
+    attrs = list(pvalues_by_attr)
+    metrics = list(dict.fromkeys(m for a in attrs for m in pvalues_by_attr[a]))
+
+    adjusted = {a: {} for a in attrs}
+    for m in metrics:
+        tested = [a for a in attrs if m in pvalues_by_attr[a]]
+        adj = adjust_pvalues(np.stack([pvalues_by_attr[a][m] for a in tested]), method)
+        for a, row in zip(tested, adj):
+            adjusted[a][m] = row
+
+    tables = {}
+    for a in attrs:
+        rows = [
+            {
+                "Metric": m,
+                "Model": model,
+                "Value": float(observed_by_attr[a][m][j]),
+                "p-value": float(pvalues_by_attr[a][m][j]),
+                "Adjusted p-value": float(adjusted[a][m][j]),
+            }
+            for m in pvalues_by_attr[a]
+            for j, model in enumerate(models)
+        ]
+        tables[a] = pd.DataFrame(rows, columns=["Metric", "Model", "Value", "p-value", "Adjusted p-value"])
+    return tables
@@ -0,0 +1,180 @@
+# utils/ranking_metrics.py
+# Exposure fairness of ranked outputs (search results, recommendations)
+#
+# Rows are (query, item group, score) impressions. Items are ranked within
+# their query by score with one lexsort over all queries, and every row is
+# reduced to per-group sums of its position-discounted exposure, top-k
+# membership and attention. The sums add up across query partitions, so
+# logged data can be streamed one sorted partition at a time.
+
+import numpy as np
+import pandas as pd
+
+from utils.two_class_metrics import GroupIndexMixin, _ratio, encode_groups
+
+RANKING_FIELDS = ("n", "exposure", "top_k", "attention")
+
+RANKING_METRICS = [
+    "Exposure Ratio",
+    "Top-k Selection Parity Difference",
+    "Attention-Weighted Disparity",
+]
+
+RANKING_RATIO_METRICS = {"Exposure Ratio"}
+
+
+def query_ranks(query_codes, scores):
+    """
+    1-based rank of every row within its query, highest score first. Ties
+    keep row order and missing scores rank last.
+    """
+    q = np.asarray(query_codes)
+    s = np.asarray(scores, dtype=float)
+    s = np.where(np.isnan(s), -np.inf, s)
+    n = len(q)
+
+    order = np.lexsort((-s, q))
+    q_sorted = q[order]
+    first = np.r_[True, q_sorted[1:] != q_sorted[:-1]] if n else np.zeros(0, dtype=bool)
+    start = np.maximum.accumulate(np.where(first, np.arange(n), 0)) if n else np.zeros(0, dtype=np.intp)
+
+    ranks = np.empty(n, dtype=np.int64)
+    ranks[order] = np.arange(n) - start + 1
+    return ranks
+
+
+def position_weights(ranks, k=10, patience=0.5):
+    """
+    (exposure, in_top_k, attention) of each rank within a top-k slate:
+    exposure is the DCG discount 1 / log2(1 + rank), attention the cascade
+    probability patience^(rank-1) * (1 - patience) that a user stops there.
+    Positions below k get nothing.
+    """
+    r = np.asarray(ranks, dtype=float)
+    shown = r <= k
+    exposure = np.where(shown, 1.0 / np.log2(1.0 + r), 0.0)
+    attention = np.where(shown, (1.0 - patience) * patience ** (r - 1.0), 0.0)
+    return exposure, shown, attention
+
+
+def ranking_sums(query_codes, scores, group_codes=None, n_groups=1, k=10, patience=0.5):
+    """
+    (G, 4) per-group sums of RANKING_FIELDS, or (M, G, 4) for an (n, M)
+    matrix of M models' scores. Queries must be complete: a query split
+    across two calls would be ranked as two.
+    """
+    S = np.asarray(scores, dtype=float)
+    single = S.ndim == 1
+    S = S[:, None] if single else S
+    n, M = S.shape
+    codes = np.zeros(n, dtype=np.intp) if group_codes is None else np.asarray(group_codes, dtype=np.intp)
+
+    out = np.zeros((M, n_groups, len(RANKING_FIELDS)))
+    out[:, :, 0] = np.bincount(codes, minlength=n_groups)
+    for j in range(M):
+        exposure, top_k, attention = position_weights(query_ranks(query_codes, S[:, j]), k, patience)
+        out[j, :, 1] = np.bincount(codes, weights=exposure, minlength=n_groups)
+        out[j, :, 2] = np.bincount(codes, weights=top_k, minlength=n_groups)
+        out[j, :, 3] = np.bincount(codes, weights=attention, minlength=n_groups)
+    return out[0] if single else out
+
+
+def ranking_fairness(priv, unpriv):
+    """
+    {metric: value} of unprivileged against privileged sums (RANKING_FIELDS
+    on the last axis; leading dimensions broadcast):
+
+    - Exposure Ratio: mean exposure per unprivileged item over that of a
+      privileged item (ideal 1)
+    - Top-k Selection Parity Difference: top-k rate of unprivileged items
+      minus that of privileged items (ideal 0)
+    - Attention-Weighted Disparity: unprivileged share of the attention
+      minus its share of the items (ideal 0)
+    """
+    n_u, e_u, t_u, a_u = (unpriv[..., i] for i in range(len(RANKING_FIELDS)))
+    n_p, e_p, t_p, a_p = (priv[..., i] for i in range(len(RANKING_FIELDS)))
+    return {
+        "Exposure Ratio": _ratio(_ratio(e_u, n_u), _ratio(e_p, n_p)),
+        "Top-k Selection Parity Difference": _ratio(t_u, n_u) - _ratio(t_p, n_p),
+        "Attention-Weighted Disparity": _ratio(a_u, a_u + a_p) - _ratio(n_u, n_u + n_p),
+    }
+
+
+def ranking_metrics_from_sums(sums, is_priv):
+    """RANKING_METRICS of the pooled unprivileged groups from (..., G, 4) sums."""
+    sums = np.asarray(sums, dtype=float)
+    is_priv = np.asarray(is_priv, dtype=bool)
+    return ranking_fairness(sums[..., is_priv, :].sum(axis=-2), sums[..., ~is_priv, :].sum(axis=-2))
+
+
+def ranking_group_table(sums, groups, is_priv):
+    """
+    (groups x metrics) frame like group_metric_table: each non-privileged
+    group against the pooled privileged class. Includes group size "n".
+    """
+    sums = np.asarray(sums, dtype=float)
+    is_priv = np.asarray(is_priv, dtype=bool)
+    others = sums[~is_priv]
+
+    table = pd.DataFrame(
+        ranking_fairness(sums[is_priv].sum(axis=0)[None, :], others),
+        index=pd.Index(np.asarray(groups)[~is_priv], name="group"),
+    )
+    table.insert(0, "n", others[:, 0])
+    return table
+
+
+def ranking_group_summary(sums, groups):
+    """Per-group items, mean exposure, top-k rate and share of all attention."""
+    sums = np.asarray(sums, dtype=float)
+    return pd.DataFrame(
+        {
+            "n": sums[:, 0],
+            "Mean exposure": _ratio(sums[:, 1], sums[:, 0]),
+            "Top-k rate": _ratio(sums[:, 2], sums[:, 0]),
+            "Attention share": _ratio(sums[:, 3], sums[:, 3].sum()),
+        },
+        index=pd.Index(np.asarray(groups), name="group"),
+    )
+
+
+class RankingAccumulator(GroupIndexMixin):
+    """
+    Mergeable per-group ranking sums of one model, the ranking counterpart
+    of FairnessAccumulator. Every update must hold whole queries.
+    """
+
+    _group_arrays = ("sums",)
+
+    def __init__(self, privileged_value=1, k=10, patience=0.5):
+        self.privileged_value = privileged_value
+        self.k = k
+        self.patience = patience
+        self.groups = []
+        self._index = {}
+        self.sums = np.zeros((0, len(RANKING_FIELDS)))
+
+    def update(self, query_ids, scores, groups):
+        q_codes, _ = pd.factorize(pd.Series(query_ids), use_na_sentinel=False)
+        codes, labels = encode_groups(groups)
+        return self.add_sums(ranking_sums(q_codes, scores, codes, len(labels), self.k, self.patience), labels)
+
+    def add_sums(self, sums, labels):
+        """Fold in pre-computed (G, 4) sums whose groups are `labels`."""
+        ids = self._group_ids(labels)
+        self.sums[ids] += sums
+        return self
+
+    def merge(self, other):
+        if (other.privileged_value, other.k, other.patience) != (self.privileged_value, self.k, self.patience):
+            raise ValueError("Cannot merge accumulators with different privileged values or position weights")
+        return self.add_sums(other.sums, other.groups)
+
+    def metrics(self):
+        return {m: float(v) for m, v in ranking_metrics_from_sums(self.sums, self._is_priv()).items()}
+
+    def group_table(self):
+        return ranking_group_table(self.sums, self.groups, self._is_priv())
+
+    def group_summary(self):
+        return ranking_group_summary(self.sums, self.groups)
@@ -0,0 +1,276 @@
+# utils/regression_metrics.py
+# Group fairness of regression models from grouped sufficient statistics
+#
+# Every group is reduced to a few weighted sums (count, sums and sums of
+# squares of target, prediction and residual) plus a histogram of the
+# predictions on fixed bin edges. Sums of chunks, files or workers simply
+# add up, so every metric below comes out of one streaming pass over data of
+# any size.
+
+import numpy as np
+import pandas as pd
+
+from utils.two_class_metrics import GroupIndexMixin, _ratio, encode_groups
+
+STAT_FIELDS = ("n", "sum_y", "sum_y2", "sum_pred", "sum_pred2", "sum_res", "sum_res2", "sum_abs_res")
+
+# Scale-free, so thresholds and the Bias Index mean the same for any target:
+# the mean differences and the Wasserstein distance are in standard
+# deviations of the target, like Bounded Group Loss is relative to its variance
+REGRESSION_METRICS = [
+    "Mean Residual Difference",
+    "Mean Prediction Difference",
+    "MAE Ratio",
+    "RMSE Ratio",
+    "Bounded Group Loss",
+    "KS Distance",
+    "Wasserstein Distance",
+]
+
+REGRESSION_RATIO_METRICS = {"MAE Ratio", "RMSE Ratio"}
+
+
+def bin_edges(values, n_bins=100):
+    """
+    Histogram edges for the predictions: up to n_bins - 1 distinct quantiles
+    of `values` (e.g. a preview of the data) between open-ended outer bins,
+    so values from later chunks can never fall outside.
+    """
+    v = np.asarray(values, dtype=float).ravel()
+    v = v[np.isfinite(v)]
+    inner = np.unique(np.quantile(v, np.linspace(0.0, 1.0, max(n_bins - 1, 2)))) if len(v) else np.zeros(1)
+    return np.concatenate([[-np.inf], inner, [np.inf]])
+
+
+def regression_stats(y_true, y_pred, group_codes=None, n_groups=1, edges=None, sample_weight=None):
+    """
+    Per-group sufficient statistics of one pass over the rows.
+
+    Returns (sums, hist): sums has STAT_FIELDS on its last axis, shape
+    (G, 8), or (M, G, 8) for an (n, M) matrix of M models' predictions;
+    hist is the (G, bins) / (M, G, bins) weighted prediction histogram on
+    `edges`, or None without edges. Rows with a missing target or
+    prediction are skipped.
+    """
+    y = np.asarray(y_true, dtype=float)
+    P = np.asarray(y_pred, dtype=float)
+    single = P.ndim == 1
+    P = P[None, :] if single else P.T
+    M, n = P.shape
+
+    codes = np.zeros(n, dtype=np.intp) if group_codes is None else np.asarray(group_codes, dtype=np.intp)
+    w = np.ones(n) if sample_weight is None else np.asarray(sample_weight, dtype=float)
+    flat = (codes + n_groups * np.arange(M)[:, None]).ravel()
+
+    valid = np.isfinite(P) & np.isfinite(y)
+    W = np.where(valid, w, 0.0)
+    P = np.where(valid, P, 0.0)
+    Y = np.where(valid, y, 0.0)
+    WY, WP = W * Y, W * P
+    WR = WP - WY
+
+    stats = (W, WY, WY * Y, WP, WP * P, WR, WR * (P - Y), np.abs(WR))
+    sums = np.stack(
+        [np.bincount(flat, weights=s.ravel(), minlength=M * n_groups) for s in stats],
+        axis=-1,
+    ).reshape(M, n_groups, len(STAT_FIELDS))
+
+    hist = None
+    if edges is not None:
+        bins = len(edges) - 1
+        b = np.clip(np.searchsorted(edges, P, side="right") - 1, 0, bins - 1)
+        hist = np.bincount(
+            (flat * bins + b.ravel()), weights=W.ravel(), minlength=M * n_groups * bins
+        ).reshape(M, n_groups, bins)
+
+    if single:
+        return sums[0], None if hist is None else hist[0]
+    return sums, hist
+
+
+def _moments(sums):
+    n = sums[..., 0]
+    return {f: _ratio(sums[..., i], n) for i, f in enumerate(STAT_FIELDS) if i}
+
+
+def target_variance(sums):
+    """Variance of the target over all groups (last two axes: groups, fields)."""
+    m = _moments(sums.sum(axis=-2))
+    return m["sum_y2"] - m["sum_y"] ** 2
+
+
+def target_sd(sums):
+    """Standard deviation of the target over all groups, the scale of the difference metrics."""
+    return np.sqrt(np.maximum(target_variance(sums), 0.0))
+
+
+def group_loss(sums, var_y):
+    """Each group's MSE relative to the target variance (1 = no better than the mean)."""
+    return _ratio(_moments(sums)["sum_res2"], np.asarray(var_y)[..., None])
+
+
+def distribution_gaps(hist_u, hist_p, edges):
+    """
+    Kolmogorov-Smirnov and Wasserstein-1 distances between two prediction
+    histograms on the same edges. Both are exact when the edges contain
+    every distinct prediction; otherwise they are accurate to the bin width.
+    The open-ended outer bins do not contribute to the Wasserstein distance.
+    """
+    cu, cp = np.cumsum(hist_u, axis=-1), np.cumsum(hist_p, axis=-1)
+    gap = np.abs(_ratio(cu, cu[..., -1:]) - _ratio(cp, cp[..., -1:]))
+    width = np.diff(np.asarray(edges, dtype=float))
+    width = np.where(np.isfinite(width), width, 0.0)
+    with np.errstate(invalid="ignore"):
+        return gap.max(axis=-1), (gap * width).sum(axis=-1)
+
+
+def regression_fairness(priv, unpriv, priv_hist=None, unpriv_hist=None, edges=None, sd_y=None):
+    """
+    {metric: value} of unprivileged against privileged sums (STAT_FIELDS on
+    the last axis; leading dimensions broadcast). Differences are
+    unprivileged minus privileged, ratios unprivileged over privileged.
+    Differences and the Wasserstein distance are divided by sd_y, the
+    target's standard deviation (by default over both sides' rows).
+    Bounded Group Loss needs every group and is left to the callers.
+    """
+    u, p = _moments(unpriv), _moments(priv)
+    if sd_y is None:
+        sd_y = target_sd((np.asarray(priv) + np.asarray(unpriv))[..., None, :])
+    out = {
+        "Mean Residual Difference": _ratio(u["sum_res"] - p["sum_res"], sd_y),
+        "Mean Prediction Difference": _ratio(u["sum_pred"] - p["sum_pred"], sd_y),
+        "MAE Ratio": _ratio(u["sum_abs_res"], p["sum_abs_res"]),
+        "RMSE Ratio": _ratio(np.sqrt(u["sum_res2"]), np.sqrt(p["sum_res2"])),
+    }
+    if priv_hist is None or unpriv_hist is None:
+        nan = np.full(np.shape(out["MAE Ratio"]), np.nan)
+        out["KS Distance"], out["Wasserstein Distance"] = nan, nan
+    else:
+        ks, wasserstein = distribution_gaps(unpriv_hist, priv_hist, edges)
+        out["KS Distance"], out["Wasserstein Distance"] = ks, _ratio(wasserstein, sd_y)
+    return out
+
+
+def regression_metrics_from_sums(sums, is_priv, hist=None, edges=None, metrics=None):
+    """
+    REGRESSION_METRICS (or only those named in `metrics`) of the pooled
+    unprivileged groups against the privileged class from (..., G, 8) sums
+    and, for the distributional gaps, (..., G, bins) histograms. Bounded
+    Group Loss is the worst group's relative MSE.
+    """
+    sums = np.asarray(sums, dtype=float)
+    is_priv = np.asarray(is_priv, dtype=bool)
+    priv, unpriv = sums[..., is_priv, :].sum(axis=-2), sums[..., ~is_priv, :].sum(axis=-2)
+
+    ph = uh = None
+    if hist is not None:
+        hist = np.asarray(hist, dtype=float)
+        ph, uh = hist[..., is_priv, :].sum(axis=-2), hist[..., ~is_priv, :].sum(axis=-2)
+
+    out = regression_fairness(priv, unpriv, ph, uh, edges, target_sd(sums))
+    loss = group_loss(sums, target_variance(sums))
+    with np.errstate(invalid="ignore"):
+        out["Bounded Group Loss"] = np.nanmax(np.where(sums[..., 0] > 0, loss, np.nan), axis=-1)
+    return {m: out[m] for m in REGRESSION_METRICS if metrics is None or m in metrics}
+
+
+def regression_group_table(sums, groups, is_priv, hist=None, edges=None):
+    """
+    (groups x metrics) frame: each non-privileged group against the pooled
+    privileged class, like group_metric_table. "Bounded Group Loss" is the
+    group's own relative MSE. Includes group size "n".
+    """
+    sums = np.asarray(sums, dtype=float)
+    is_priv = np.asarray(is_priv, dtype=bool)
+    priv, others = sums[is_priv].sum(axis=0), sums[~is_priv]
+
+    ph = oh = None
+    if hist is not None:
+        hist = np.asarray(hist, dtype=float)
+        ph, oh = hist[is_priv].sum(axis=0), hist[~is_priv]
+
+    out = regression_fairness(
+        priv[None, :], others, None if ph is None else ph[None, :], oh, edges, target_sd(sums)
+    )
+    out["Bounded Group Loss"] = group_loss(sums, target_variance(sums))[~is_priv]
+
+    table = pd.DataFrame(
+        {m: out[m] for m in REGRESSION_METRICS},
+        index=pd.Index(np.asarray(groups)[~is_priv], name="group"),
+    )
+    table.insert(0, "n", others[:, 0])
+    return table
+
+
+def regression_group_summary(sums, groups):
+    """Per-group n, mean target, mean prediction, mean residual, MAE and RMSE."""
+    sums = np.asarray(sums, dtype=float)
+    m = _moments(sums)
+    return pd.DataFrame(
+        {
+            "n": sums[..., 0],
+            "Mean target": m["sum_y"],
+            "Mean prediction": m["sum_pred"],
+            "Mean residual": m["sum_res"],
+            "MAE": m["sum_abs_res"],
+            "RMSE": np.sqrt(m["sum_res2"]),
+        },
+        index=pd.Index(np.asarray(groups), name="group"),
+    )
+
+
+class RegressionAccumulator(GroupIndexMixin):
+    """
+    Mergeable per-group sufficient statistics of one regression model, the
+    regression counterpart of FairnessAccumulator. Histograms are kept only
+    when bin edges are given, and every accumulator that is merged must use
+    the same edges.
+    """
+
+    _group_arrays = ("sums", "hist")
+
+    def __init__(self, privileged_value=1, edges=None):
+        self.privileged_value = privileged_value
+        self.edges = None if edges is None else np.asarray(edges, dtype=float)
+        self.groups = []
+        self._index = {}
+        self.sums = np.zeros((0, len(STAT_FIELDS)))
+        self.hist = None if edges is None else np.zeros((0, len(edges) - 1))
+
+    def update(self, y_true, y_pred, groups, sample_weight=None):
+        codes, labels = encode_groups(groups)
+        sums, hist = regression_stats(y_true, y_pred, codes, len(labels), self.edges, sample_weight)
+        return self.add_sums(sums, labels, hist)
+
+    def add_sums(self, sums, labels, hist=None):
+        """Fold in pre-computed (G, 8) sums (and (G, bins) histograms) whose groups are `labels`."""
+        ids = self._group_ids(labels)
+        self.sums[ids] += sums
+        if self.hist is not None:
+            if hist is None:
+                raise ValueError("Histograms are required when the accumulator has bin edges")
+            self.hist[ids] += hist
+        return self
+
+    def merge(self, other):
+        if other.privileged_value != self.privileged_value:
+            raise ValueError("Cannot merge accumulators with different privileged values")
+        if (self.edges is None) != (other.edges is None) or (
+            self.edges is not None and not np.array_equal(self.edges, other.edges)
+        ):
+            raise ValueError("Cannot merge accumulators with different bin edges")
+        return self.add_sums(other.sums, other.groups, other.hist)
+
+    @property
+    def n(self):
+        return float(self.sums[:, 0].sum())
+
+    def metrics(self, metrics=None):
+        out = regression_metrics_from_sums(self.sums, self._is_priv(), self.hist, self.edges, metrics)
+        return {m: float(v) for m, v in out.items()}
+
+    def group_table(self):
+        return regression_group_table(self.sums, self.groups, self._is_priv(), self.hist, self.edges)
+
+    def group_summary(self):
+        return regression_group_summary(self.sums, self.groups)
@@ -0,0 +1,169 @@
+# utils/scoring.py
+# Model-in-the-loop scoring of an uploaded model file
+#
+# The uploaded bytes are unpickled only inside a pool of spawned worker
+# processes, never in the UI process: a model that crashes, hangs on import
+# or corrupts memory takes down a worker, not the app. (Unpickling still runs
+# the file's code in the worker; the pool isolates failures, it is not a
+# sandbox.) Rows are sent to the workers in fixed-size chunks with only the
+# model's input columns, and outputs are cached by (model hash, data hash).
+
+import hashlib
+import io
+import multiprocessing
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+_MODEL = None  # the unpickled model of this worker process
+
+
+def _load_worker_model(model_bytes):
+    global _MODEL
+    import joblib
+
+    _MODEL = joblib.load(io.BytesIO(model_bytes))
+
+
+def _describe_model():
+    names = getattr(_MODEL, "feature_names_in_", None)
+    classes = getattr(_MODEL, "classes_", None)
+    return {
+        "type": type(_MODEL).__name__,
+        "features": None if names is None else [str(c) for c in names],
+        "classes": None if classes is None else list(classes),
+        "predict_proba": callable(getattr(_MODEL, "predict_proba", None)),
+    }
+
+
+def _run_model(X, methods):
+    return [np.asarray(getattr(_MODEL, m)(X)) for m in methods]
+
+
+def model_digest(model_bytes):
+    return hashlib.sha256(model_bytes).hexdigest()
+
+
+def frame_digest(frame, columns=None):
+    """Content hash of frame[columns] (names, dtypes, values), one column at a time."""
+    h = hashlib.sha256()
+    for c in (frame.columns if columns is None else columns):
+        h.update(f"{c}:{frame[c].dtype}".encode())
+        h.update(pd.util.hash_pandas_object(frame[c], index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+class ScoreCache(OrderedDict):
+    """
+    Score cache for ScoringService.score that keeps only the `maxsize` most
+    recently used results, so per-row scores of old frames do not pile up.
+    """
+
+    def __init__(self, maxsize=4):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.maxsize:
+            self.popitem(last=False)
+
+
+class ScoringService:
+    """
+    An uploaded model behind a pool of worker processes. predict() and
+    predict_proba() accept frames of any size and fan them out in chunks of
+    chunk_size rows; score() adds the output columns and a result cache.
+    """
+
+    def __init__(self, model_bytes, n_workers=2, chunk_size=50_000):
+        self.digest = model_digest(model_bytes)
+        self.chunk_size = chunk_size
+        self.n_workers = n_workers
+        self._pool = ProcessPoolExecutor(
+            max_workers=n_workers,
+            mp_context=multiprocessing.get_context("spawn"),  # no fork of the UI's threads
+            initializer=_load_worker_model,
+            initargs=(model_bytes,),
+        )
+        try:
+            self.info = self._pool.submit(_describe_model).result()
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def features(self, columns, exclude=()):
+        """Input columns: the model's feature_names_in_, or every column not in `exclude`."""
+        names = self.info["features"]
+        if names is None:
+            return [c for c in columns if c not in set(exclude)]
+        by_name = {str(c): c for c in columns}
+        missing = [c for c in names if c not in by_name]
+        if missing:
+            raise ValueError(f"Model features missing from the data: {', '.join(missing)}")
+        return [by_name[c] for c in names]
+
+    def _map(self, frame, features, methods):
+        # Chunks are cut (and their columns selected) only as workers free
+        # up, so at most two chunks per worker exist beside the frame
+        features = list(frame.columns) if features is None else features
+        pending, parts = deque(), []
+        for start in range(0, len(frame), self.chunk_size):
+            chunk = frame.iloc[start:start + self.chunk_size][features]
+            pending.append(self._pool.submit(_run_model, chunk, methods))
+            if len(pending) >= 2 * self.n_workers:
+                parts.append(pending.popleft().result())
+        parts.extend(f.result() for f in pending)
+        if not parts:
+            return [np.empty(0) for _ in methods]
+        return [np.concatenate([p[i] for p in parts]) for i in range(len(methods))]
+
+    def predict(self, frame, features=None):
+        return self._map(frame, features, ["predict"])[0]
+
+    def predict_proba(self, frame, features=None):
+        return self._map(frame, features, ["predict_proba"])[0]
+
+    def score(self, frame, features, cache=None):
+        """
+        {"pred": predictions, "score": positive-class probability or None} of
+        frame[features]. Binary classifiers get 0/1 predictions for their
+        second class, the one predict_proba[:, 1] refers to. `cache` is any
+        dict (e.g. a bounded ScoreCache); results are stored under
+        (model hash, data hash).
+        """
+        key = (self.digest, frame_digest(frame, features))
+        if cache is not None and key in cache:
+            return cache[key]
+
+        classes = self.info["classes"]
+        binary = classes is not None and len(classes) == 2
+        if binary and self.info["predict_proba"]:
+            pred, proba = self._map(frame, features, ["predict", "predict_proba"])  # one round trip
+            score = proba[:, 1]
+        else:
+            pred, score = self.predict(frame, features), None
+        if binary:
+            pred = (pred == classes[1]).astype(np.int64)
+
+        out = {"pred": pred, "score": score}
+        if cache is not None:
+            cache[key] = out
+        return out
@@ -0,0 +1,265 @@
+# utils/slice_finder.py
+# Worst-subgroup discovery over conjunctions of discretized features
+#
+# Every feature is discretized into a few codes. The lattice of conjunctions
+# ("Age<28 ∧ Sex=Female ∧ ...") is searched level by level. Up to
+# EXHAUSTIVE_LEVELS items, all slices over one combination of features are
+# counted together by a single bincount of their mixed-radix key and the
+# (y_true, y_pred) cell. A slice is refined only if
+#   - its support reaches min_support (support only shrinks when refined),
+#   - every parent one level up was refinable itself, and
+#   - an optimistic bound on the gap of any refinement with enough support
+#     can still beat the current k-th best slice.
+# Deeper levels expand the beam_width most unfair refinable slices, each on
+# its own rows only, so the cost no longer grows with C(features, level).
+
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from utils.two_class_metrics import _ratio, rate_counts
+
+# Slice metric -> rate whose gap to the whole population is scored
+SLICE_METRICS = {
+    "Selection Rate": "SR",
+    "True Positive Rate": "TPR",
+    "False Positive Rate": "FPR",
+    "Error Rate": "ERR",
+    "Accuracy": "ACC",
+}
+
+EXHAUSTIVE_LEVELS = 2
+
+
+def discretize(frame, columns=None, n_bins=4, max_categories=8):
+    """
+    Encode features into small integer codes. Returns (names, codes, labels):
+    codes[f] is an intp array, labels[f][c] the item label of code c.
+
+    Numeric features with more than n_bins distinct values are cut at
+    quantiles ("Age<28", "28≤Age<37", "Age≥47"); other features keep their
+    max_categories - 1 most frequent values and pool the rest as "other".
+    Missing values get a code of their own. Columns with no observed value
+    cannot separate any rows and are skipped, so `names` may be shorter
+    than `columns`.
+    """
+    names, codes, labels = [], [], []
+    for col in (frame.columns if columns is None else columns):
+        s = frame[col]
+        if not s.notna().any():
+            continue
+
+        # Distinct values of a prefix settle most columns without hashing all of them
+        if (
+            pd.api.types.is_numeric_dtype(s)
+            and not pd.api.types.is_bool_dtype(s)
+            and (s.iloc[:10000].nunique() > n_bins or s.nunique() > n_bins)
+        ):
+            v = s.to_numpy(dtype=float)
+            edges = np.unique(np.nanquantile(v, np.linspace(0.0, 1.0, n_bins + 1)[1:-1]))
+            c = np.searchsorted(edges, v, side="right")
+            lab = [f"{col}<{edges[0]:g}"]
+            lab += [f"{lo:g}≤{col}<{hi:g}" for lo, hi in zip(edges[:-1], edges[1:])]
+            lab += [f"{col}≥{edges[-1]:g}"]
+            missing = np.isnan(v)
+        else:
+            raw, uniques = pd.factorize(s)
+            missing = raw < 0
+            order = np.argsort(-np.bincount(raw[~missing], minlength=len(uniques)), kind="stable")
+            top = order[: max_categories - 1] if len(order) > max_categories else order
+
+            remap = np.full(len(uniques), len(top), dtype=np.intp)  # the rest -> "other"
+            remap[top] = np.arange(len(top))
+            c = np.where(missing, 0, remap[raw])
+            lab = [f"{col}={str(uniques[i]).strip()}" for i in top]
+            if len(top) < len(order):
+                lab.append(f"{col}=other")
+
+        c = np.asarray(c, dtype=np.intp)
+        if missing.any():
+            c = np.where(missing, len(lab), c)
+            lab.append(f"{col} missing")
+
+        names.append(col)
+        codes.append(c)
+        labels.append(lab)
+    return names, codes, labels
+
+
+def _refinement_bound(num, den, ref, min_support):
+    """
+    Largest |rate - ref| of any refinement of a slice with rate num / den
+    whose support is at least min_support: refinements keep at most num
+    numerator and den - num other rows.
+    """
+    m = float(min_support)
+    hi = np.minimum(num, m) / m
+    lo = np.maximum(m - (den - num), 0.0) / m
+    return np.maximum(hi - ref, ref - lo)
+
+
+def find_slices(codes, labels, y_true, y_pred, metric="Selection Rate", min_support=30, max_level=3,
+                top_k=10, beam_width=100, sample_weight=None):
+    """
+    Top-k slices (conjunctions of up to max_level items) whose rate differs
+    most from the whole population. Support is counted in the rate's own
+    denominator rows (e.g. actual positives for the true positive rate), or
+    their total weight.
+
+    Returns a frame with Slice, Level, n, Support, Rate and Gap (slice rate
+    minus overall rate) sorted by |Gap|, and the search statistics;
+    stats["complete"] is False when the beam dropped a refinable slice, so
+    that a better slice past EXHAUSTIVE_LEVELS may have been missed.
+    """
+    rate = SLICE_METRICS[metric]
+    cards = [len(lab) for lab in labels]
+    F = len(codes)
+
+    cell = 2 * (np.asarray(y_true) == 1).astype(np.intp) + (np.asarray(y_pred) == 1)
+    w = None if sample_weight is None else np.asarray(sample_weight, dtype=float)
+    overall = np.bincount(cell, weights=w, minlength=4).reshape(2, 2)
+    ref = float(_ratio(*rate_counts(overall, rate)))
+
+    found = []           # (|gap|, level, items, n, den, rate); items = ((feature, code), ...)
+    kth = 0.0
+    stats = {"levels": 0, "feature_sets": 0, "slices": 0, "complete": True}
+
+    def keep(level, gap, items, n, den, r):
+        nonlocal found, kth
+        found.append((gap, level, items, n, den, r))
+        if len(found) > 4 * top_k:
+            found = sorted(found, key=lambda f: -f[0])[:top_k]
+        kth = sorted((f[0] for f in found), reverse=True)[top_k - 1] if len(found) >= top_k else 0.0
+
+    # ---------- Exhaustive levels: one bincount per feature combination ----------
+    # Feature-major codes in the smallest dtype that holds them, and the same
+    # codes pre-combined with the confusion cell: one multiply-add per extension
+    small = np.int16 if max(cards, default=0) * 4 < 2 ** 15 else np.intp
+    code_matrix = np.empty((F, len(cell)), dtype=small)
+    for f, c in enumerate(codes):
+        code_matrix[f] = c
+    code_cells = code_matrix * 4 + cell.astype(small)
+    refinable = {}       # feats -> boolean array over the mixed-radix value index
+    frontier = []        # (|gap|, bound, items) of refinable slices of the last level
+
+    level_sets = [(f,) for f in range(F)]
+    for level in range(1, min(max_level, EXHAUSTIVE_LEVELS) + 1):
+        if not level_sets:
+            break
+        stats["levels"] = level
+        evaluated = {}
+
+        prefix, prefix_key = None, None
+        for feats in level_sets:
+            shape = tuple(cards[f] for f in feats)
+            size = int(np.prod(shape))
+
+            # Sets are sorted, so consecutive ones share the mixed-radix key of their prefix
+            if feats[:-1] != prefix:
+                prefix, prefix_key = feats[:-1], np.zeros(len(cell), dtype=np.intp)
+                for f in prefix:
+                    prefix_key = prefix_key * cards[f] + codes[f]
+            key = prefix_key * (cards[feats[-1]] * 4) + code_cells[feats[-1]]
+            counts = np.bincount(key, weights=w, minlength=size * 4).reshape(size, 2, 2)
+            stats["feature_sets"] += 1
+
+            num, den = (np.asarray(a, dtype=float) for a in rate_counts(counts, rate))
+            ok = (den >= min_support) & (den > 0)
+            if level > 1:
+                grid = np.ones(shape, dtype=bool)
+                for i in range(level):
+                    parent = refinable[feats[:i] + feats[i + 1:]].reshape(shape[:i] + shape[i + 1:])
+                    grid &= np.expand_dims(parent, i)
+                ok &= grid.ravel()
+
+            idx = np.flatnonzero(ok)
+            stats["slices"] += len(idx)
+            r = num[idx] / den[idx]
+            gap = np.abs(r - ref)
+            for j in np.flatnonzero(gap > kth):
+                items = tuple(zip(feats, (int(v) for v in np.unravel_index(idx[j], shape))))
+                keep(level, gap[j], items, counts[idx[j]].sum(), den[idx[j]], r[j])
+
+            evaluated[feats] = (idx, gap, _refinement_bound(num[idx], den[idx], ref, min_support), shape)
+
+        # Refine only where the bound can still beat the final k-th best of this level
+        refinable, frontier = {}, []
+        for feats, (idx, gap, bound, shape) in evaluated.items():
+            mask = np.zeros(int(np.prod(shape)), dtype=bool)
+            mask[idx[bound > kth]] = True
+            refinable[feats] = mask
+            for j in np.flatnonzero(bound > kth):
+                frontier.append((gap[j], bound[j], tuple(zip(feats, (int(v) for v in np.unravel_index(idx[j], shape))))))
+
+        # A feature set is searched only if every parent set still has a refinable slice
+        live = sorted(f for f, m in refinable.items() if m.any())
+        live_set = set(live)
+        level_sets = [
+            feats + (g,)
+            for feats in live
+            for g in range(feats[-1] + 1, F)
+            if all(sub + (g,) in live_set for sub in combinations(feats, level - 1))
+        ]
+
+    # ---------- Beam levels: refine the most unfair slices on their own rows ----------
+    if max_level > EXHAUSTIVE_LEVELS and frontier:
+        offsets = np.cumsum([0] + [c * 4 for c in cards])
+        item_feat = np.repeat(np.arange(F), cards)
+        item_code = np.concatenate([np.arange(c) for c in cards])
+
+        for level in range(EXHAUSTIVE_LEVELS + 1, max_level + 1):
+            frontier = [s for s in frontier if s[1] > kth]
+            if not frontier:
+                break
+            stats["levels"] = level
+            if len(frontier) > beam_width:
+                stats["complete"] = False
+            beam = sorted(frontier, key=lambda s: -s[0])[:beam_width]
+
+            frontier, seen = [], set()
+            for _, _, items in beam:
+                rows = codes[items[0][0]] == items[0][1]
+                for f, v in items[1:]:
+                    rows &= codes[f] == v
+                rows = np.flatnonzero(rows)
+
+                # All one-item extensions of the slice in one bincount over (row, feature)
+                key = code_matrix[:, rows].astype(np.intp) * 4 + cell[rows] + offsets[:-1, None]
+                rw = None if w is None else np.broadcast_to(w[rows], key.shape).ravel()
+                counts = np.bincount(key.ravel(), weights=rw, minlength=offsets[-1]).reshape(-1, 2, 2)
+                stats["feature_sets"] += 1
+
+                num, den = (np.asarray(a, dtype=float) for a in rate_counts(counts, rate))
+                ok = (den >= min_support) & (den > 0)
+                ok[np.isin(item_feat, [f for f, _ in items])] = False
+                r = _ratio(num, den)
+                gap = np.abs(r - ref)
+                bound = _refinement_bound(num, den, ref, min_support)
+
+                for j in np.flatnonzero(ok):
+                    child = tuple(sorted(items + ((int(item_feat[j]), int(item_code[j])),)))
+                    if child in seen:
+                        continue
+                    seen.add(child)
+                    stats["slices"] += 1
+                    if gap[j] > kth:
+                        keep(level, gap[j], child, counts[j].sum(), den[j], r[j])
+                    if bound[j] > kth:
+                        frontier.append((gap[j], bound[j], child))
+
+    found = sorted(found, key=lambda f: -f[0])[:top_k]
+    rows = [
+        {
+            "Slice": " ∧ ".join(labels[f][v] for f, v in items),
+            "Level": level,
+            "n": n,
+            "Support": den,
+            "Rate": r,
+            "Gap": r - ref,
+        }
+        for _, level, items, n, den, r in found
+    ]
+    table = pd.DataFrame(rows, columns=["Slice", "Level", "n", "Support", "Rate", "Gap"])
+    stats["overall_rate"] = ref
+    return table, stats
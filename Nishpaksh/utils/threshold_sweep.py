@@ -0,0 +1,98 @@
+# utils/threshold_sweep.py
+# Fairness metrics across every decision threshold of a score column
+#
+# Scores are sorted once; within each (group, y_true) cell the number of rows
+# scoring at or above a threshold is then a binary search into the cell's
+# sorted scores, so the whole curve costs O(n log n + T * cells * log n)
+# instead of one full evaluation per threshold.
+
+import numpy as np
+import pandas as pd
+
+from utils.two_class_metrics import RATIO_METRICS, metrics_from_tensor, rates_from_counts
+
+
+def default_thresholds(scores, max_points=1001):
+    """All distinct finite scores, or `max_points` score quantiles if there are more."""
+    s = np.asarray(scores, dtype=float)
+    s = s[np.isfinite(s)]
+    uniq = np.unique(s)
+    if len(uniq) <= max_points:
+        return uniq
+    return np.unique(np.quantile(s, np.linspace(0.0, 1.0, max_points)))
+
+
+def sweep_counts(y_true, scores, group_codes, n_groups, thresholds, sample_weight=None):
+    """
+    Count tensors of the predictions 1[score >= threshold] for every
+    threshold, shape (T, n_groups, 2, 2). Missing scores are never positive.
+    With sample_weight the cells are weight sums, read off each cell's
+    cumulative weights at the same binary-search positions.
+    """
+    s = np.asarray(scores, dtype=float)
+    s = np.where(np.isnan(s), -np.inf, s)
+    thresholds = np.asarray(thresholds, dtype=float)
+
+    base = 2 * np.asarray(group_codes, dtype=np.intp) + (np.asarray(y_true) == 1)
+    order = np.argsort(s, kind="stable")
+    s_sorted, b_sorted = s[order], base[order]
+    w_sorted = None if sample_weight is None else np.asarray(sample_weight, dtype=float)[order]
+
+    dtype = np.int64 if w_sorted is None else np.float64
+    out = np.zeros((len(thresholds), 2 * n_groups, 2), dtype=dtype)
+    for c in range(2 * n_groups):
+        in_cell = b_sorted == c
+        s_c = s_sorted[in_cell]  # still sorted
+        first = np.searchsorted(s_c, thresholds, side="left")
+        if w_sorted is None:
+            total, below = len(s_c), first
+        else:
+            cum = np.concatenate([[0.0], np.cumsum(w_sorted[in_cell])])
+            total, below = cum[-1], cum[first]
+        out[:, c, 1] = total - below
+        out[:, c, 0] = below
+    return out.reshape(len(thresholds), n_groups, 2, 2)
+
+
+def threshold_sweep(y_true, scores, group_codes, n_groups, is_priv, thresholds=None, max_points=1001,
+                    metrics=None, sample_weight=None):
+    """
+    One row per threshold: overall selection rate / accuracy / TPR / FPR and
+    every count-based fairness metric (unprivileged vs privileged), or only
+    those named in `metrics`.
+    """
+    if thresholds is None:
+        thresholds = default_thresholds(scores, max_points=max_points)
+
+    counts = sweep_counts(y_true, scores, group_codes, n_groups, thresholds, sample_weight)
+    overall = rates_from_counts(counts.sum(axis=1))
+
+    curve = pd.DataFrame({
+        "Threshold": thresholds,
+        "Selection Rate": overall["SR"],
+        "Accuracy": overall["ACC"],
+        "TPR": overall["TPR"],
+        "FPR": overall["FPR"],
+    })
+    for m, vals in metrics_from_tensor(counts, is_priv, metrics).items():
+        curve[m] = vals
+    return curve
+
+
+def select_operating_point(curve, limits, objective="Accuracy"):
+    """
+    Threshold row maximising `objective` among those where every metric in
+    `limits` ({metric: tolerance}) lies within tolerance of its ideal value
+    (1 for ratios, 0 otherwise). Returns None if no threshold qualifies.
+    """
+    feasible = pd.Series(True, index=curve.index)
+    for m, tol in limits.items():
+        if m not in curve.columns:
+            continue
+        ideal = 1.0 if m in RATIO_METRICS else 0.0
+        feasible &= (curve[m] - ideal).abs() <= tol
+
+    candidates = curve[feasible & curve[objective].notna()]
+    if candidates.empty:
+        return None
+    return candidates.loc[candidates[objective].idxmax()]
@@ -2,7 +2,584 @@
 
 import numpy as np
 import pandas as pd
-from sklearn.metrics.pairwise import euclidean_distances
+
+from utils.individual_fairness import consistency, fairness_through_awareness
+
+
+# ============================
+# Confusion-count core
+# ============================
+# Every binary group metric below is a function of how many rows fall into
+# each (group, y_true, y_pred) cell, so a single bincount over combined
+# integer codes replaces one masked pass over the rows per metric.
+
+def _as_counts(counts):
+    """Counts as int64, or float64 when they are (possibly fractional) weights."""
+    counts = np.asarray(counts)
+    return counts.astype(np.float64) if counts.dtype.kind == "f" else counts.astype(np.int64)
+
+
+def confusion_tensor(y_true, y_pred, group_codes=None, n_groups=1, sample_weight=None):
+    """
+    Count rows per (group, y_true, y_pred) cell in one pass.
+
+    y_true / y_pred are binary {0,1}; group_codes are integers in
+    [0, n_groups). Returns an int64 array of shape (n_groups, 2, 2)
+    indexed as [group, y_true, y_pred]; with sample_weight the cells hold
+    float64 sums of weights instead.
+    """
+    t = (np.asarray(y_true) == 1).astype(np.intp)
+    p = (np.asarray(y_pred) == 1).astype(np.intp)
+    codes = 2 * t + p
+    if group_codes is not None:
+        codes += 4 * np.asarray(group_codes, dtype=np.intp)
+    if sample_weight is not None:
+        counts = np.bincount(codes, weights=np.asarray(sample_weight, dtype=float), minlength=4 * n_groups)
+        return counts.reshape(n_groups, 2, 2)
+    counts = np.bincount(codes, minlength=4 * n_groups)
+    return counts.reshape(n_groups, 2, 2).astype(np.int64)
+
+
+def confusion_tensor_multi(y_true, preds, group_codes=None, n_groups=1, sample_weight=None):
+    """
+    Count tensors for many prediction columns at once.
+
+    preds is an (n, M) matrix of {0,1} predictions (one column per model).
+    Rows are ordered once by their (group, y_true) cell, and the predicted
+    positives of every model are summed over each contiguous cell block of
+    the reordered matrix. Returns shape (M, n_groups, 2, 2); float64 weight
+    sums when sample_weight is given.
+    """
+    P = np.asarray(preds)
+    if P.ndim == 1:
+        P = P[:, None]
+    M = P.shape[1]
+
+    base = (np.asarray(y_true) == 1).astype(np.intp)
+    if group_codes is not None:
+        base += 2 * np.asarray(group_codes, dtype=np.intp)
+    n_cells = 2 * n_groups
+
+    rows = np.bincount(base, minlength=n_cells)
+    w = None if sample_weight is None else np.asarray(sample_weight, dtype=float)
+    n_base = rows if w is None else np.bincount(base, weights=w, minlength=n_cells)
+    dtype = np.int64 if w is None else np.float64
+
+    pos = np.zeros((n_cells, M), dtype=dtype)
+    present = rows > 0
+    if present.any() and M > 0:
+        # Small integer keys sort with a linear-time radix sort
+        key = base.astype(np.uint16) if n_cells <= np.iinfo(np.uint16).max else base
+        order = np.argsort(key, kind="stable")
+        P_sorted = (P == 1).view(np.int8)[order]
+        w_sorted = None if w is None else w[order]
+        starts = np.cumsum(rows) - rows
+        for c in np.flatnonzero(present):
+            block = slice(starts[c], starts[c] + rows[c])
+            if w is None:
+                pos[c] = P_sorted[block].sum(axis=0, dtype=np.int64)
+            else:
+                pos[c] = w_sorted[block] @ P_sorted[block]
+
+    out = np.empty((M, n_groups, 2, 2), dtype=dtype)
+    pos = pos.reshape(n_groups, 2, M).transpose(2, 0, 1)
+    out[..., 1] = pos
+    out[..., 0] = n_base.reshape(n_groups, 2)[None] - pos
+    return out
+
+
+def encode_groups(sensitive_attr):
+    """Factorize a sensitive attribute into integer codes and group labels."""
+    codes, groups = pd.factorize(pd.Series(sensitive_attr), use_na_sentinel=False)
+    return codes, np.asarray(groups)
+
+
+def match_value(values, target):
+    """
+    Rows equal to `target`, compared on raw text and, when both sides parse
+    as numbers, numerically (so "1" matches a positive class shown as "1.0").
+    The one label-matching rule of the in-memory and the chunked paths;
+    booleans compare as text ("True"), as they read from a CSV.
+    """
+    s = pd.Series(values)
+    eq = (s.astype(str) == str(target)).to_numpy()
+    try:
+        num = float(target)
+    except (TypeError, ValueError):
+        return eq
+    if pd.api.types.is_bool_dtype(s):
+        return eq
+    return eq | (pd.to_numeric(s, errors="coerce") == num).to_numpy()
+
+
+def privileged_mask(groups, privileged_value):
+    """
+    Which groups are the privileged class, by match_value, so a numeric
+    group column and a privileged value typed as text ("1") agree.
+    """
+    return np.asarray(match_value(groups, privileged_value), dtype=bool)
+
+
+def collapse_duplicates(frame, columns=None, weight=None, weight_name="weight"):
+    """
+    One row per distinct combination of `columns` (all columns by default)
+    with a `weight_name` column holding how many rows it stands for, or the
+    sum of an existing `weight` column. Every weighted metric on the result
+    equals the unweighted (or `weight`-weighted) metric on `frame`.
+    """
+    columns = list(frame.columns.drop(weight, errors="ignore") if columns is None else columns)
+    grouped = frame.groupby(columns, dropna=False, sort=False)
+    out = grouped.size() if weight is None else grouped[weight].sum()
+    return out.rename(weight_name).reset_index()
+
+
+def _ratio(num, den):
+    """Elementwise num / den with NaN where den == 0 (mean of an empty slice)."""
+    num = np.asarray(num, dtype=float)
+    den = np.asarray(den, dtype=float)
+    out = np.full(np.broadcast(num, den).shape, np.nan)
+    np.divide(num, den, out=out, where=den != 0)
+    return out
+
+
+def rates_from_counts(c):
+    """
+    Confusion rates from counts of shape (..., 2, 2) indexed [y_true, y_pred].
+    Leading dimensions broadcast (groups, models, bootstrap replicates, ...).
+    """
+    c = np.asarray(c)
+    tn, fp = c[..., 0, 0], c[..., 0, 1]
+    fn, tp = c[..., 1, 0], c[..., 1, 1]
+    n = tn + fp + fn + tp
+    return {
+        "n": n,
+        "SR": _ratio(tp + fp, n),
+        "ACC": _ratio(tp + tn, n),
+        "ERR": _ratio(fp + fn, n),
+        "TPR": _ratio(tp, tp + fn),
+        "FPR": _ratio(fp, fp + tn),
+        "FNR": _ratio(fn, fn + tp),
+        "PPV": _ratio(tp, tp + fp),
+        "NPV": _ratio(tn, tn + fn),
+    }
+
+
+def _safe_ratio(num, den):
+    """Ratio metric convention of FairnessMetrics: 0 when the denominator is not > 0."""
+    num = np.asarray(num, dtype=float)
+    den = np.asarray(den, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(den > 0, num / np.where(den > 0, den, 1.0), 0.0)
+
+
+# --------------------------------------------------
+# Metric registry
+# --------------------------------------------------
+# Every rate of a (..., 2, 2) block [y_true, y_pred] as
+# (numerator cells, denominator cells)
+RATE_CELLS = {
+    "SR": ([(0, 1), (1, 1)], [(0, 0), (0, 1), (1, 0), (1, 1)]),
+    "ACC": ([(0, 0), (1, 1)], [(0, 0), (0, 1), (1, 0), (1, 1)]),
+    "ERR": ([(0, 1), (1, 0)], [(0, 0), (0, 1), (1, 0), (1, 1)]),
+    "TPR": ([(1, 1)], [(1, 0), (1, 1)]),
+    "FPR": ([(0, 1)], [(0, 0), (0, 1)]),
+    "FNR": ([(1, 0)], [(1, 0), (1, 1)]),
+    "PPV": ([(1, 1)], [(0, 1), (1, 1)]),
+    "NPV": ([(0, 0)], [(0, 0), (1, 0)]),
+}
+
+
+def rate_counts(c, rate):
+    """(numerator, denominator) counts of one rate from (..., 2, 2) counts."""
+    num, den = RATE_CELLS[rate]
+    c = np.asarray(c)
+    return sum(c[..., t, p] for t, p in num), sum(c[..., t, p] for t, p in den)
+
+
+def _difference(rate):
+    return (rate,), lambda u, p: u[rate] - p[rate]
+
+
+def _quotient(rate):
+    return (rate,), lambda u, p: _safe_ratio(u[rate], p[rate])
+
+
+# Binary metric -> (rates it depends on, f(unprivileged rates, privileged rates))
+METRIC_REGISTRY = {
+    "Statistical Parity Difference": _difference("SR"),
+    "Disparate Impact": _quotient("SR"),
+    "Selection Rate Difference": _difference("SR"),
+    "Selection Rate Ratio": _quotient("SR"),
+    "Equal Opportunity Difference": _difference("TPR"),
+    "Average Odds Difference": (
+        ("TPR", "FPR"),
+        lambda u, p: 0.5 * ((u["TPR"] - p["TPR"]) + (u["FPR"] - p["FPR"])),
+    ),
+    "False Positive Rate Difference": _difference("FPR"),
+    "False Negative Rate Difference": _difference("FNR"),
+    "Error Rate Difference": _difference("ERR"),
+    "Accuracy Difference": _difference("ACC"),
+    "Accuracy Ratio": _quotient("ACC"),
+    "Precision Difference": _difference("PPV"),
+    "NPV Difference": _difference("NPV"),
+    "Equalized Odds": (
+        ("TPR", "FPR"),
+        lambda u, p: 0.5 * (np.abs(u["TPR"] - p["TPR"]) + np.abs(u["FPR"] - p["FPR"])),
+    ),
+}
+
+
+def fairness_from_counts(priv, unpriv, metrics=None):
+    """
+    Binary group fairness metrics (unprivileged vs privileged) from the two
+    (..., 2, 2) count blocks. Returns {metric name: array over leading dims}.
+
+    With `metrics` given, only those registry entries are evaluated and only
+    the rates they depend on are computed (once each, however many metrics
+    share them).
+    """
+    names = list(METRIC_REGISTRY) if metrics is None else [m for m in metrics if m in METRIC_REGISTRY]
+    rates = {r for m in names for r in METRIC_REGISTRY[m][0]}
+
+    ru = {r: _ratio(*rate_counts(unpriv, r)) for r in rates}
+    rp = {r: _ratio(*rate_counts(priv, r)) for r in rates}
+    return {m: METRIC_REGISTRY[m][1](ru, rp) for m in names}
+
+
+def between_group_entropy(counts, alpha=2):
+    """
+    Between-group generalized entropy of mean predictions from counts of
+    shape (..., G, 2, 2). alpha=1 is the Theil index. Empty groups are skipped.
+    """
+    counts = np.asarray(counts)
+    n_g = counts.sum(axis=(-1, -2)).astype(float)
+    pos_g = counts[..., :, 1].sum(axis=-1).astype(float)
+    n = n_g.sum(axis=-1, keepdims=True)
+    mu = _ratio(pos_g.sum(axis=-1, keepdims=True), n)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = (pos_g / n_g) / mu
+        if alpha == 0:
+            terms = -np.log(r)
+        elif alpha == 1:
+            terms = r * np.log(r)
+        else:
+            terms = (r ** alpha - 1) / (alpha * (alpha - 1))
+        out = np.nansum(terms * (n_g / n), axis=-1)
+
+    return np.where(np.squeeze(mu, axis=-1) > 0, out, 0.0)
+
+
+# ============================
+# Individual-level generalized entropy
+# ============================
+# The benefit of a row is b = y_pred - y_true + 1: 0 for a false negative, 1
+# for a correct prediction and 2 for a false positive. b takes only these
+# three values, so each group's power sums sum(b) and sum(b^alpha) follow
+# from its (y_true, y_pred) counts for every alpha, and the index and its
+# between/within-group decomposition need no per-row benefit arrays.
+
+# Benefit of each [y_true, y_pred] cell
+BENEFITS = np.array([[1.0, 2.0], [0.0, 1.0]])
+
+
+def _entropy_summand(b, alpha):
+    """Power-sum summand of GE(alpha): b^alpha, b·log b (alpha=1, 0·log 0 = 0) or log b (alpha=0)."""
+    b = np.asarray(b, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if alpha == 0:
+            return np.log(b)
+        if alpha == 1:
+            return np.where(b > 0, b * np.log(np.where(b > 0, b, 1.0)), 0.0)
+        return b ** float(alpha)
+
+
+def _entropy_from_sums(n, s1, s_alpha, alpha):
+    """GE(alpha) of n values with sum s1 and summand sum s_alpha; NaN when the mean is not positive."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mu = s1 / n
+        if alpha == 0:
+            out = np.log(mu) - s_alpha / n
+        elif alpha == 1:
+            out = s_alpha / s1 - np.log(mu)
+        else:
+            out = (s_alpha / (n * mu ** alpha) - 1) / (alpha * (alpha - 1))
+        return np.where(mu > 0, out, np.nan)
+
+
+def benefit_power_sums(counts, alpha=2):
+    """
+    Per-group (n, sum(b), sum of the GE(alpha) summand) of the benefits
+    b = y_pred - y_true + 1, each of shape (..., G), from (..., G, 2, 2) counts.
+    """
+    c = np.asarray(counts, dtype=float)
+    summand = _entropy_summand(BENEFITS, alpha)
+    with np.errstate(invalid="ignore"):
+        s_alpha = np.where(c > 0, c * summand, 0.0).sum(axis=(-1, -2))
+    return c.sum(axis=(-1, -2)), (c * BENEFITS).sum(axis=(-1, -2)), s_alpha
+
+
+def individual_entropy(counts, alpha=2):
+    """
+    Individual-level generalized entropy index of the benefits
+    b = y_pred - y_true + 1 and its exact decomposition
+    index = between + within, from (..., G, 2, 2) counts. alpha=1 is the
+    Theil index; alpha <= 0 is infinite when any row has b = 0.
+
+    Returns {"index", "between", "within"} over the leading dimensions, and
+    per group (..., G) "group_index" and "group_within" (the group's share of
+    the within term: its weight (n_g/n)(mu_g/mu)^alpha times its own index).
+    """
+    n_g, s1_g, sa_g = benefit_power_sums(counts, alpha)
+    n, s1 = n_g.sum(axis=-1), s1_g.sum(axis=-1)
+    index = _entropy_from_sums(n, s1, sa_g.sum(axis=-1), alpha)
+    group_index = _entropy_from_sums(n_g, s1_g, sa_g, alpha)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mu_g = s1_g / n_g
+        # Between: every row replaced by its group's mean benefit
+        between_sum = np.where(n_g > 0, n_g * _entropy_summand(mu_g, alpha), 0.0).sum(axis=-1)
+        between = _entropy_from_sums(n, s1, between_sum, alpha)
+
+        weight = (n_g / n[..., None]) * (mu_g / (s1 / n)[..., None]) ** alpha
+        group_within = np.where((n_g > 0) & (weight != 0), weight * group_index, 0.0)
+        within = group_within.sum(axis=-1)
+
+    # Zero benefits make alpha <= 0 infinite in total and within groups alike
+    within = np.where(np.isfinite(index), within, index)
+    return {
+        "index": index,
+        "between": between,
+        "within": within,
+        "group_index": group_index,
+        "group_within": group_within,
+    }
+
+
+# Order matches FairnessMetrics.get_all()
+COUNT_METRICS = [
+    "Statistical Parity Difference",
+    "Disparate Impact",
+    "Selection Rate Difference",
+    "Selection Rate Ratio",
+    "Thiel Index",
+    "Generalized Entropy (α=2)",
+    "Equal Opportunity Difference",
+    "Average Odds Difference",
+    "False Positive Rate Difference",
+    "False Negative Rate Difference",
+    "Error Rate Difference",
+    "Accuracy Difference",
+    "Accuracy Ratio",
+    "Precision Difference",
+    "NPV Difference",
+    "Equalized Odds",
+]
+
+
+# Between-group entropy metrics and their alpha; these need the full group
+# tensor rather than the pooled privileged / unprivileged blocks
+ENTROPY_METRICS = {"Thiel Index": 1, "Generalized Entropy (α=2)": 2}
+
+# Individual-level entropy of benefits: (alpha, component of individual_entropy()).
+# Not in COUNT_METRICS, so only computed when asked for by name.
+INDIVIDUAL_ENTROPY_METRICS = {
+    "Individual Entropy (α=2)": (2, "index"),
+    "Individual Entropy, between groups (α=2)": (2, "between"),
+}
+
+
+# Ratio metrics are ideal at 1, the remaining binary metrics at 0
+RATIO_METRICS = {"Disparate Impact", "Selection Rate Ratio", "Accuracy Ratio"}
+
+
+def group_metric_table(counts, groups, is_priv):
+    """
+    (groups x metrics) frame: each non-privileged group against the pooled
+    privileged class, from a (G, 2, 2) count tensor. Includes group size "n".
+    """
+    counts = np.asarray(counts)
+    is_priv = np.asarray(is_priv, dtype=bool)
+    priv = counts[is_priv].sum(axis=0)
+    others = counts[~is_priv]
+
+    table = pd.DataFrame(
+        fairness_from_counts(priv[None, :, :], others),
+        index=pd.Index(np.asarray(groups)[~is_priv], name="group"),
+    )
+    table.insert(0, "n", others.sum(axis=(1, 2)))
+    return table
+
+
+def worst_group_disparities(table, metrics=None, ratio_metrics=RATIO_METRICS):
+    """
+    For each metric column of a group_metric_table, the group furthest from
+    the metric's ideal value (1 for `ratio_metrics`, 0 otherwise).
+    """
+    metrics = [m for m in (metrics or table.columns) if m in table.columns and m != "n"]
+    rows = []
+    for m in metrics:
+        vals = pd.to_numeric(table[m], errors="coerce")
+        dev = (vals - (1.0 if m in ratio_metrics else 0.0)).abs()
+        if dev.notna().any():
+            g = dev.idxmax()
+            rows.append({"Metric": m, "Worst group": g, "Value": float(vals[g]), "n": int(table.loc[g, "n"])})
+    return pd.DataFrame(rows, columns=["Metric", "Worst group", "Value", "n"])
+
+
+def metrics_from_tensor(counts, is_priv, metrics=None):
+    """
+    Count-based FairnessMetrics metrics from a (..., G, 2, 2) tensor: all of
+    COUNT_METRICS, or only the names in `metrics`, which may also include
+    INDIVIDUAL_ENTROPY_METRICS (other names are ignored). is_priv
+    is a boolean mask over the G groups. Leading dimensions are evaluated
+    together, e.g. B bootstrap replicates in one call.
+    """
+    names = COUNT_METRICS if metrics is None else list(dict.fromkeys(
+        m for m in metrics if m in COUNT_METRICS or m in INDIVIDUAL_ENTROPY_METRICS
+    ))
+    counts = np.asarray(counts)
+
+    out = {}
+    binary = [m for m in names if m in METRIC_REGISTRY]
+    if binary:
+        is_priv = np.asarray(is_priv, dtype=bool)
+        priv = counts[..., is_priv, :, :].sum(axis=-3)
+        unpriv = counts[..., ~is_priv, :, :].sum(axis=-3)
+        out.update(fairness_from_counts(priv, unpriv, binary))
+    decompositions = {}
+    for m in names:
+        if m in ENTROPY_METRICS:
+            out[m] = between_group_entropy(counts, alpha=ENTROPY_METRICS[m])
+        elif m in INDIVIDUAL_ENTROPY_METRICS:
+            alpha, part = INDIVIDUAL_ENTROPY_METRICS[m]
+            if alpha not in decompositions:
+                decompositions[alpha] = individual_entropy(counts, alpha)
+            out[m] = decompositions[alpha][part]
+    return {k: out[k] for k in names}
+
+
+def kish_effective_size(sample_weight):
+    """Kish's effective sample size (sum w)^2 / sum w^2 of survey weights."""
+    w = np.asarray(sample_weight, dtype=float)
+    sq = float((w * w).sum())
+    return float(w.sum()) ** 2 / sq if sq > 0 else 0.0
+
+
+def effective_counts(counts, n_eff):
+    """
+    Survey-weighted counts of shape (..., G, 2, 2) rescaled so that each
+    tensor sums to n_eff (e.g. kish_effective_size). Every rate is unchanged
+    while the Wilson, Newcombe, bootstrap and permutation machinery sees the
+    sampling error of n_eff records, whatever the scale of the weights.
+    """
+    counts = np.asarray(counts, dtype=float)
+    total = counts.sum(axis=(-3, -2, -1), keepdims=True)
+    return counts * _safe_ratio(n_eff, total)
+
+
+def resample_counts(counts, B, rng=None):
+    """
+    Count-space bootstrap: B multinomial redraws of the cell counts.
+
+    Resampling n rows with replacement only changes how many rows land in
+    each cell, so this has the same distribution as a row bootstrap at
+    O(cells) per replicate. Returns shape (B, *counts.shape).
+
+    Weighted counts are redrawn as round(total weight) rows with cell
+    probabilities proportional to the weights, which is exact for
+    frequency weights. Survey weights are resampled on their effective
+    sample size instead: pass effective_counts(counts, n_eff).
+    """
+    rng = np.random if rng is None else rng
+    counts = np.asarray(counts, dtype=float)
+    total = counts.sum()
+    n = int(round(total))
+    if n == 0:
+        return np.zeros((B,) + counts.shape, dtype=np.int64)
+    draws = rng.multinomial(n, counts.ravel() / total, size=B)
+    return draws.reshape((B,) + counts.shape)
+
+
+# --------------------------------------------------
+# Calibration (score-based)
+# --------------------------------------------------
+CALIBRATION_METRIC = "Calibration Difference (global)"
+
+
+def calibration_sums(y_true, scores, group_codes=None, n_groups=1, n_bins=10, sample_weight=None):
+    """
+    Reliability sums per (group, equal-width score bin), shape
+    (3, G, n_bins): [rows, sum of scores, sum of y_true] (each weighted by
+    sample_weight when given).
+
+    All three come from bincounts over the one index group * n_bins + bin,
+    so sums from separate chunks can simply be added. Scores are clipped
+    to [0, 1]; rows with a missing score are left out.
+    """
+    s = np.asarray(scores, dtype=float)
+    y = (np.asarray(y_true) == 1).astype(float)
+    g = np.zeros(len(s), dtype=np.intp) if group_codes is None else np.asarray(group_codes, dtype=np.intp)
+    w = np.ones(len(s)) if sample_weight is None else np.asarray(sample_weight, dtype=float)
+
+    ok = ~np.isnan(s)
+    s, y, g, w = s[ok], y[ok], g[ok], w[ok]
+    s = np.clip(s, 0.0, 1.0)
+    idx = g * n_bins + np.minimum((s * n_bins).astype(np.intp), n_bins - 1)
+
+    size = n_groups * n_bins
+    sums = np.stack([
+        np.bincount(idx, weights=w, minlength=size),
+        np.bincount(idx, weights=w * s, minlength=size),
+        np.bincount(idx, weights=w * y, minlength=size),
+    ])
+    return sums.reshape(3, n_groups, n_bins)
+
+
+def calibration_sums_from_counts(counts, n_bins=10):
+    """
+    Reliability sums of hard 0/1 predictions read off (..., G, 2, 2) counts:
+    predicted negatives fall in the first bin, predicted positives in the last.
+    """
+    counts = np.asarray(counts, dtype=float)
+    sums = np.zeros((3,) + counts.shape[:-2] + (n_bins,))
+    sums[0, ..., 0] = counts[..., :, 0].sum(axis=-1)
+    sums[2, ..., 0] = counts[..., 1, 0]
+    sums[0, ..., -1] = sums[1, ..., -1] = counts[..., :, 1].sum(axis=-1)
+    sums[2, ..., -1] = counts[..., 1, 1]
+    return sums
+
+
+def expected_calibration_error(sums):
+    """ECE over the last (bin) axis of (3, ..., n_bins) sums; NaN when empty."""
+    n, sp, sy = sums
+    return _ratio(np.abs(sy - sp).sum(axis=-1), n.sum(axis=-1))
+
+
+def calibration_from_sums(sums, is_priv):
+    """
+    From (3, ..., G, n_bins) reliability sums:
+      "ece" : (..., G) expected calibration error of every group
+      "gap" : (..., G, n_bins) mean outcome - mean score per bin (NaN if empty)
+      CALIBRATION_METRIC : (...) ECE of the pooled unprivileged groups minus
+                           ECE of the pooled privileged groups
+    """
+    sums = np.asarray(sums, dtype=float)
+    is_priv = np.asarray(is_priv, dtype=bool)
+    n, sp, sy = sums
+
+    ece_priv = expected_calibration_error(sums[..., is_priv, :].sum(axis=-2))
+    ece_unpriv = expected_calibration_error(sums[..., ~is_priv, :].sum(axis=-2))
+
+    return {
+        "ece": expected_calibration_error(sums),
+        "gap": _ratio(sy - sp, n),
+        CALIBRATION_METRIC: np.nan_to_num(ece_unpriv - ece_priv),
+    }
+
+
+def _scalar(v):
+    return float(v) if np.ndim(v) == 0 else v
 
 
 class GroupMetrics:
@@ -10,20 +587,31 @@ class GroupMetrics:
     Performance metrics based on confusion matrix.
     """
 
-    def __init__(self, y_true, y_pred):
+    def __init__(self, y_true, y_pred, sample_weight=None):
         self.y_true = np.array(y_true)
         self.y_pred = np.array(y_pred)
+        self.sample_weight = None if sample_weight is None else np.asarray(sample_weight, dtype=float)
+        self.counts = confusion_tensor(self.y_true, self.y_pred, sample_weight=self.sample_weight)[0]
         self._compute_confusion_metrics()
 
+    @classmethod
+    def from_counts(cls, counts):
+        """Build from a (2, 2) [y_true, y_pred] count matrix without row data."""
+        obj = cls.__new__(cls)
+        obj.y_true = obj.y_pred = obj.sample_weight = None
+        obj.counts = _as_counts(counts).reshape(2, 2)
+        obj._compute_confusion_metrics()
+        return obj
+
     def _compute_confusion_metrics(self):
-        y_true, y_pred = self.y_true, self.y_pred
+        c = self.counts
 
-        self.TP = np.sum((y_true == 1) & (y_pred == 1))
-        self.TN = np.sum((y_true == 0) & (y_pred == 0))
-        self.FP = np.sum((y_true == 0) & (y_pred == 1))
-        self.FN = np.sum((y_true == 1) & (y_pred == 0))
+        self.TP = c[1, 1]
+        self.TN = c[0, 0]
+        self.FP = c[0, 1]
+        self.FN = c[1, 0]
 
-        self.ACC = (self.TP + self.TN) / len(y_true)
+        self.ACC = (self.TP + self.TN) / c.sum()
         self.TPR = self.TP / (self.TP + self.FN) if (self.TP + self.FN) > 0 else 0
         self.TNR = self.TN / (self.TN + self.FP) if (self.TN + self.FP) > 0 else 0
         self.FPR = self.FP / (self.FP + self.TN) if (self.FP + self.TN) > 0 else 0
@@ -34,11 +622,13 @@ class GroupMetrics:
         self.FOR = self.FN / (self.FN + self.TN) if (self.FN + self.TN) > 0 else 0
 
     def get_all(self):
+        # Weighted counts are reported as weight sums
+        count = int if self.counts.dtype.kind == "i" else (lambda v: round(float(v), 4))
         return {
-        "TP": int(self.TP),
-        "TN": int(self.TN),
-        "FP": int(self.FP),
-        "FN": int(self.FN),
+        "TP": count(self.TP),
+        "TN": count(self.TN),
+        "FP": count(self.FP),
+        "FN": count(self.FN),
         "Accuracy": round(self.ACC, 4),
         "TPR (Recall)": round(self.TPR, 4),
         "TNR": round(self.TNR, 4),
@@ -56,9 +646,16 @@ class FairnessMetrics:
     """
     Fairness metrics based on sensitive attributes.
     Includes group-level disparities and individual-level fairness.
+
+    Group metrics are derived from a (group x y_true x y_pred) count tensor
+    built once in the constructor; y_true / y_pred are expected in {0,1}.
+    With sample_weight every count is a sum of weights (frequency weights
+    from collapse_duplicates, or survey weights). The neighbourhood metrics
+    (FTA, consistency) stay unweighted.
     """
 
-    def __init__(self, y_true, y_pred, sensitive_attr, X=None, model=None, sensitive_attr_indices=None, privileged_value=1):
+    def __init__(self, y_true, y_pred, sensitive_attr, X=None, model=None, sensitive_attr_indices=None,
+                 privileged_value=1, y_score=None, n_bins=10, sample_weight=None):
         self.y_true = np.array(y_true)
         self.y_pred = np.array(y_pred)
         self.sensitive_attr = np.array(sensitive_attr)
@@ -66,37 +663,81 @@ class FairnessMetrics:
         self.model = model
         self.sensitive_attr_indices = sensitive_attr_indices
         self.privileged_value = privileged_value
+        self.sample_weight = None if sample_weight is None else np.asarray(sample_weight, dtype=float)
+
+        codes, self.groups = encode_groups(self.sensitive_attr)
+        self.counts = confusion_tensor(
+            self.y_true, self.y_pred, codes, len(self.groups), sample_weight=self.sample_weight
+        )
+
+        # Calibration uses scores when given, otherwise the hard predictions
+        self.calibration = (
+            calibration_sums(self.y_true, y_score, codes, len(self.groups), n_bins, self.sample_weight)
+            if y_score is not None else calibration_sums_from_counts(self.counts, n_bins)
+        )
+
+    @classmethod
+    def from_counts(cls, counts, groups, privileged_value=1):
+        """
+        Build from a (G, 2, 2) count tensor and its G group labels. Only the
+        count-based metrics are available on such an instance.
+        """
+        obj = cls.__new__(cls)
+        obj.y_true = obj.y_pred = obj.sensitive_attr = obj.sample_weight = None
+        obj.X = obj.model = obj.sensitive_attr_indices = None
+        obj.privileged_value = privileged_value
+        obj.groups = np.asarray(groups)
+        obj.counts = _as_counts(counts)
+        obj.calibration = calibration_sums_from_counts(obj.counts)
+        return obj
+
+    def _priv_mask(self):
+        return privileged_mask(self.groups, self.privileged_value)
+
+    def _split_counts(self):
+        """Collapse the group tensor to (privileged, unprivileged) 2x2 blocks."""
+        is_priv = self._priv_mask()
+        return self.counts[is_priv].sum(axis=0), self.counts[~is_priv].sum(axis=0)
+
+    def group_fairness(self):
+        """All count-based binary group metrics as {name: float}."""
+        priv, unpriv = self._split_counts()
+        return {k: _scalar(v) for k, v in fairness_from_counts(priv, unpriv).items()}
+
+    def per_group_metrics(self):
+        """Every non-privileged group against the privileged class, in one frame."""
+        return group_metric_table(self.counts, self.groups, self._priv_mask())
+
+    def _metric(self, name):
+        priv, unpriv = self._split_counts()
+        return _scalar(fairness_from_counts(priv, unpriv, [name])[name])
 
     # Group fairness
     def statistical_parity_difference(self):
-        priv = self.sensitive_attr == self.privileged_value
-        unpriv = ~priv
-        p_priv = np.mean(self.y_pred[priv] == 1)
-        p_unpriv = np.mean(self.y_pred[unpriv] == 1)
-        return p_unpriv - p_priv
+        return self._metric("Statistical Parity Difference")
 
     def disparate_impact(self):
-        priv = self.sensitive_attr == self.privileged_value
-        unpriv = ~priv
-        p_priv = np.mean(self.y_pred[priv] == 1)
-        p_unpriv = np.mean(self.y_pred[unpriv] == 1)
-        return p_unpriv / p_priv if p_priv > 0 else 0
+        return self._metric("Disparate Impact")
 
     def thiel_index(self):
-        df = pd.DataFrame({'pred': self.y_pred, 'group': self.sensitive_attr})
-        group_means = df.groupby('group')['pred'].mean()
-        overall_mean = df['pred'].mean()
-        if overall_mean == 0:
-            return 0
-        terms = (group_means / overall_mean) * np.log(group_means / overall_mean)
-        weights = df['group'].value_counts(normalize=True).sort_index()
-        return (terms * weights).sum()
+        return _scalar(between_group_entropy(self.counts, alpha=1))
 
     def cohens_d(self):
         df = pd.DataFrame({'score': self.y_pred, 'group': self.sensitive_attr})
         groups = df['group'].unique()
         if len(groups) != 2:
             raise ValueError("Cohen's d requires exactly two groups")
+        if self.sample_weight is not None:
+            # Frequency-weighted mean and unbiased variance per group
+            stats = []
+            for g in groups:
+                m = (df['group'] == g).to_numpy()
+                x, w = df['score'].to_numpy(dtype=float)[m], self.sample_weight[m]
+                mean = np.average(x, weights=w)
+                stats.append((mean, np.sum(w * (x - mean) ** 2) / (w.sum() - 1)))
+            (m1, v1), (m2, v2) = stats
+            pooled_std = np.sqrt((v1 + v2) / 2)
+            return (m1 - m2) / pooled_std if pooled_std > 0 else 0
         s1 = df[df['group'] == groups[0]]['score']
         s2 = df[df['group'] == groups[1]]['score']
         mean_diff = s1.mean() - s2.mean()
@@ -105,54 +746,47 @@ class FairnessMetrics:
 
     # Label fairness
     def equal_opportunity_difference(self):
-        priv = self.sensitive_attr == self.privileged_value
-        unpriv = ~priv
-        tpr_priv = np.mean(self.y_pred[priv & (self.y_true == 1)] == 1)
-        tpr_unpriv = np.mean(self.y_pred[unpriv & (self.y_true == 1)] == 1)
-        return tpr_unpriv - tpr_priv
+        return self._metric("Equal Opportunity Difference")
 
     def average_odds_difference(self):
-        priv = self.sensitive_attr == self.privileged_value
-        unpriv = ~priv
-        tpr_diff = np.mean(self.y_pred[unpriv & (self.y_true == 1)] == 1) - \
-                   np.mean(self.y_pred[priv & (self.y_true == 1)] == 1)
-        fpr_diff = np.mean(self.y_pred[unpriv & (self.y_true == 0)] == 1) - \
-                   np.mean(self.y_pred[priv & (self.y_true == 0)] == 1)
-        return 0.5 * (tpr_diff + fpr_diff)
+        return self._metric("Average Odds Difference")
 
     def error_rate_difference(self):
-        priv = self.sensitive_attr == self.privileged_value
-        unpriv = ~priv
-        err_priv = np.mean(self.y_pred[priv] != self.y_true[priv])
-        err_unpriv = np.mean(self.y_pred[unpriv] != self.y_true[unpriv])
-        return err_unpriv - err_priv
+        return self._metric("Error Rate Difference")
 
     def equalized_odds(self):
-        tpr_diff = self.equal_opportunity_difference()
-        fpr_diff = np.mean(self.y_pred[(self.sensitive_attr != self.privileged_value) & (self.y_true == 0)] == 1) - \
-                   np.mean(self.y_pred[(self.sensitive_attr == self.privileged_value) & (self.y_true == 0)] == 1)
-        return 0.5 * (abs(tpr_diff) + abs(fpr_diff))
-
-    def fairness_through_awareness(self):
+        return self._metric("Equalized Odds")
+
+    def fairness_through_awareness(self, radius=0.1, sample_size=None, random_state=None):
+        """
+        Mean |y_i - y_j| over pairs closer than `radius` (radius-neighbour
+        queries, no n x n matrix). sample_size switches to the sampled
+        estimator; see utils.individual_fairness for its confidence bound.
+        """
         if self.X is None:
             raise ValueError("X must be provided for fairness_through_awareness")
-        sim_matrix = euclidean_distances(self.X)
-        diffs = []
-        for i in range(len(self.y_pred)):
-            for j in range(i + 1, len(self.y_pred)):
-                if sim_matrix[i, j] < 0.1:  # highly similar
-                    diffs.append(abs(self.y_pred[i] - self.y_pred[j]))
-        return np.mean(diffs) if diffs else 0
-
-    def counterfactual_fairness(self):
+        return fairness_through_awareness(
+            self.X, self.y_pred, radius=radius,
+            sample_size=sample_size, random_state=random_state,
+        )["value"]
+
+    def counterfactual_fairness(self, chunk_size=50_000):
+        """
+        Share of rows whose prediction changes when the binary sensitive
+        features are flipped (1 - x), scored chunk by chunk so that only one
+        chunk is ever copied. utils.counterfactual swaps categorical
+        attributes through all of their values.
+        """
         if self.model is None or self.X is None or self.sensitive_attr_indices is None:
             raise ValueError("model, X, and sensitive_attr_indices must be provided for counterfactual_fairness")
-        X_flipped = self.X.copy()
-        for i in self.sensitive_attr_indices:
-            X_flipped[:, i] = 1 - X_flipped[:, i]  # flip binary sensitive features
-        preds_orig = self.model.predict(self.X)
-        preds_flipped = self.model.predict(X_flipped)
-        return np.mean(preds_orig != preds_flipped)
+        flips = np.zeros(len(self.X), dtype=bool)
+        for start in range(0, len(self.X), chunk_size):
+            chunk = self.X[start:start + chunk_size]
+            flipped = chunk.copy()
+            for i in self.sensitive_attr_indices:
+                flipped[:, i] = 1 - flipped[:, i]  # flip binary sensitive features
+            flips[start:start + chunk_size] = self.model.predict(chunk) != self.model.predict(flipped)
+        return np.average(flips, weights=self.sample_weight)
      # ============================
 
 # ============================
@@ -161,145 +795,217 @@ class FairnessMetrics:
     # Selection rate fairness
     # ----------------------------
     def selection_rate_difference(self):
-        priv = self.sensitive_attr == self.privileged_value
-        unpriv = ~priv
-        sr_priv = np.mean(self.y_pred[priv] == 1)
-        sr_unpriv = np.mean(self.y_pred[unpriv] == 1)
-        return sr_unpriv - sr_priv
+        return self._metric("Selection Rate Difference")
 
     def selection_rate_ratio(self):
-        priv = self.sensitive_attr == self.privileged_value
-        unpriv = ~priv
-        sr_priv = np.mean(self.y_pred[priv] == 1)
-        sr_unpriv = np.mean(self.y_pred[unpriv] == 1)
-        return sr_unpriv / sr_priv if sr_priv > 0 else 0
+        return self._metric("Selection Rate Ratio")
 
 
     # ----------------------------
     # Error-rate parity metrics
     # ----------------------------
     def false_positive_rate_difference(self):
-        priv = self.sensitive_attr == self.privileged_value
-        unpriv = ~priv
-        fpr_priv = np.mean(self.y_pred[priv & (self.y_true == 0)] == 1)
-        fpr_unpriv = np.mean(self.y_pred[unpriv & (self.y_true == 0)] == 1)
-        return fpr_unpriv - fpr_priv
+        return self._metric("False Positive Rate Difference")
 
     def false_negative_rate_difference(self):
-        priv = self.sensitive_attr == self.privileged_value
-        unpriv = ~priv
-        fnr_priv = np.mean(self.y_pred[priv & (self.y_true == 1)] == 0)
-        fnr_unpriv = np.mean(self.y_pred[unpriv & (self.y_true == 1)] == 0)
-        return fnr_unpriv - fnr_priv
+        return self._metric("False Negative Rate Difference")
 
 
     # ----------------------------
     # Accuracy parity
     # ----------------------------
     def accuracy_difference(self):
-        priv = self.sensitive_attr == self.privileged_value
-        unpriv = ~priv
-        acc_priv = np.mean(self.y_pred[priv] == self.y_true[priv])
-        acc_unpriv = np.mean(self.y_pred[unpriv] == self.y_true[unpriv])
-        return acc_unpriv - acc_priv
+        return self._metric("Accuracy Difference")
 
     def accuracy_ratio(self):
-        priv = self.sensitive_attr == self.privileged_value
-        unpriv = ~priv
-        acc_priv = np.mean(self.y_pred[priv] == self.y_true[priv])
-        acc_unpriv = np.mean(self.y_pred[unpriv] == self.y_true[unpriv])
-        return acc_unpriv / acc_priv if acc_priv > 0 else 0
+        return self._metric("Accuracy Ratio")
 
 
     # ----------------------------
     # Predictive value parity
     # ----------------------------
     def precision_difference(self):
-        priv = self.sensitive_attr == self.privileged_value
-        unpriv = ~priv
-        ppv_priv = np.mean(self.y_true[priv & (self.y_pred == 1)] == 1)
-        ppv_unpriv = np.mean(self.y_true[unpriv & (self.y_pred == 1)] == 1)
-        return ppv_unpriv - ppv_priv
+        return self._metric("Precision Difference")
 
     def negative_predictive_value_difference(self):
-        priv = self.sensitive_attr == self.privileged_value
-        unpriv = ~priv
-        npv_priv = np.mean(self.y_true[priv & (self.y_pred == 0)] == 0)
-        npv_unpriv = np.mean(self.y_true[unpriv & (self.y_pred == 0)] == 0)
-        return npv_unpriv - npv_priv
+        return self._metric("NPV Difference")
 
 
     # ----------------------------
     # Generalized Entropy Index 
     # ----------------------------
     def generalized_entropy_index(self, alpha=2):
-        df = pd.DataFrame({'pred': self.y_pred, 'group': self.sensitive_attr})
-        group_means = df.groupby('group')['pred'].mean()
-        overall_mean = df['pred'].mean()
+        return _scalar(between_group_entropy(self.counts, alpha=alpha))
 
-        if overall_mean == 0:
-            return 0
+    def individual_entropy(self, alpha=2):
+        """Individual-level GE(alpha) of b = y_pred - y_true + 1: {"index", "between", "within"}."""
+        parts = individual_entropy(self.counts, alpha)
+        return {k: _scalar(parts[k]) for k in ("index", "between", "within")}
 
-        if alpha == 0:
-            terms = -np.log(group_means / overall_mean)
-        elif alpha == 1:
-            terms = (group_means / overall_mean) * np.log(group_means / overall_mean)
-        else:
-            terms = ((group_means / overall_mean) ** alpha - 1) / (alpha * (alpha - 1))
 
-        weights = df['group'].value_counts(normalize=True).sort_index()
-        return (terms * weights).sum()
+    # ----------------------------
+    # Calibration
+    # ----------------------------
+    def calibration_difference(self):
+        return _scalar(calibration_from_sums(self.calibration, self._priv_mask())[CALIBRATION_METRIC])
+
+    def calibration_by_group(self):
+        """Per-group ECE and reliability gap (mean outcome - mean score) of every score bin."""
+        cal = calibration_from_sums(self.calibration, self._priv_mask())
+        n_bins = cal["gap"].shape[-1]
+        table = pd.DataFrame(
+            cal["gap"],
+            index=pd.Index(self.groups, name="group"),
+            columns=[f"gap {b / n_bins:.1f}–{(b + 1) / n_bins:.1f}" for b in range(n_bins)],
+        )
+        table.insert(0, "ECE", cal["ece"])
+        table.insert(0, "n", self.calibration[0].sum(axis=-1).astype(np.int64))
+        return table
 
 
     # ----------------------------
     # Consistency (Individual fairness)
     # ----------------------------
-    def consistency(self, k=5):
+    def consistency(self, k=5, sample_size=None, n_jobs=None, random_state=None):
+        """
+        k-NN consistency with chunked, vectorized neighbour aggregation.
+        sample_size switches to the subsampled estimator; see
+        utils.individual_fairness for its standard error.
+        """
         if self.X is None:
             raise ValueError("X must be provided for consistency")
 
-        from sklearn.neighbors import NearestNeighbors
-        nbrs = NearestNeighbors(n_neighbors=k + 1).fit(self.X)
-        _, indices = nbrs.kneighbors(self.X)
-
-        diffs = []
-        for i in range(len(self.y_pred)):
-            neighbors = indices[i][1:]
-            diffs.append(np.mean(np.abs(self.y_pred[i] - self.y_pred[neighbors])))
-        return 1 - np.mean(diffs)
+        return consistency(
+            self.X, self.y_pred, k=k, sample_size=sample_size,
+            n_jobs=n_jobs, random_state=random_state,
+        )["value"]
 
 
 # ============================
 # UPDATE get_all() METHOD
 # ============================
 
-    def get_all(self):
-        metrics = {
-            "Statistical Parity Difference": self.statistical_parity_difference(),
-            "Disparate Impact": self.disparate_impact(),
-            "Selection Rate Difference": self.selection_rate_difference(),
-            "Selection Rate Ratio": self.selection_rate_ratio(),
-            "Thiel Index": self.thiel_index(),
-            "Generalized Entropy (α=2)": self.generalized_entropy_index(alpha=2),
-            "Equal Opportunity Difference": self.equal_opportunity_difference(),
-            "Average Odds Difference": self.average_odds_difference(),
-            "False Positive Rate Difference": self.false_positive_rate_difference(),
-            "False Negative Rate Difference": self.false_negative_rate_difference(),
-            "Error Rate Difference": self.error_rate_difference(),
-            "Accuracy Difference": self.accuracy_difference(),
-            "Accuracy Ratio": self.accuracy_ratio(),
-            "Precision Difference": self.precision_difference(),
-            "NPV Difference": self.negative_predictive_value_difference(),
-            "Equalized Odds": self.equalized_odds(),
+    def get_all(self, metrics=None):
+        """
+        Every available metric, or only the names in `metrics`. Count-based
+        metrics share one pass over their common rates; the neighbourhood
+        and counterfactual metrics run only when requested (or by default).
+        """
+        def wanted(name):
+            return metrics is None or name in metrics
+
+        out = {
+            k: _scalar(v)
+            for k, v in metrics_from_tensor(self.counts, self._priv_mask(), metrics).items()
         }
+        if wanted(CALIBRATION_METRIC):
+            out[CALIBRATION_METRIC] = self.calibration_difference()
 
         if self.X is not None:
-            metrics["Fairness Through Awareness"] = self.fairness_through_awareness()
-            metrics["Consistency"] = self.consistency()
+            if wanted("Fairness Through Awareness"):
+                out["Fairness Through Awareness"] = self.fairness_through_awareness()
+            if wanted("Consistency"):
+                out["Consistency"] = self.consistency()
 
         if self.model is not None and self.sensitive_attr_indices is not None:
-            metrics["Counterfactual Fairness"] = self.counterfactual_fairness()
+            if wanted("Counterfactual Fairness"):
+                out["Counterfactual Fairness"] = self.counterfactual_fairness()
+
+        return out
+
+
+
+class GroupIndexMixin:
+    """
+    Group bookkeeping shared by the mergeable accumulators: groups keep the
+    order they were first seen in, and every per-group array named in
+    _group_arrays (leading axis = group, None = not kept) grows with zero
+    rows as new groups arrive.
+    """
 
-        return metrics
+    _group_arrays = ()
 
+    def _group_ids(self, labels):
+        ids = np.empty(len(labels), dtype=np.intp)
+        for i, g in enumerate(labels):
+            if g not in self._index:
+                self._index[g] = len(self.groups)
+                self.groups.append(g)
+            ids[i] = self._index[g]
 
+        for name in self._group_arrays:
+            arr = getattr(self, name)
+            missing = 0 if arr is None else len(self.groups) - len(arr)
+            if missing > 0:
+                pad = np.zeros((missing,) + arr.shape[1:], dtype=arr.dtype)
+                setattr(self, name, np.concatenate([arr, pad]))
+        return ids
+
+    def _is_priv(self):
+        return privileged_mask(self.groups, self.privileged_value)
+
+
+class FairnessAccumulator(GroupIndexMixin):
+    """
+    Mergeable (group x y_true x y_pred) count state.
+
+    update() folds in one chunk of rows, merge() adds another accumulator
+    (e.g. from a different file or worker) and finalize() returns a
+    count-backed FairnessMetrics. Memory depends on the number of groups,
+    not the number of rows, and merging is associative and commutative.
+    weight_sq (the sum of squared row weights) gives the Kish effective
+    sample size of survey weights.
+    """
+
+    _group_arrays = ("counts",)
+
+    def __init__(self, privileged_value=1):
+        self.privileged_value = privileged_value
+        self.groups = []
+        self._index = {}
+        self.counts = np.zeros((0, 2, 2), dtype=np.int64)
+        self.weight_sq = 0.0
+
+    def update(self, y_true, y_pred, groups, sample_weight=None):
+        codes, labels = encode_groups(groups)
+        counts = confusion_tensor(y_true, y_pred, codes, len(labels), sample_weight=sample_weight)
+        weight_sq = None if sample_weight is None else float(np.square(np.asarray(sample_weight, dtype=float)).sum())
+        return self.add_counts(counts, labels, weight_sq)
+
+    def add_counts(self, counts, labels, weight_sq=None):
+        """
+        Fold in a pre-computed (G, 2, 2) tensor whose groups are `labels`.
+        weight_sq is the sum of squared weights of its rows (unweighted: the
+        row count).
+        """
+        counts = _as_counts(counts)
+        ids = self._group_ids(labels)
+        if counts.dtype.kind == "f" and self.counts.dtype.kind != "f":
+            self.counts = self.counts.astype(np.float64)  # weighted from here on
+        self.counts[ids] += counts
+        self.weight_sq += float(counts.sum()) if weight_sq is None else float(weight_sq)
+        return self
+
+    def merge(self, other):
+        if other.privileged_value != self.privileged_value:
+            raise ValueError("Cannot merge accumulators with different privileged values")
+        return self.add_counts(other.counts, other.groups, other.weight_sq)
+
+    @property
+    def n(self):
+        total = self.counts.sum()
+        return int(total) if self.counts.dtype.kind == "i" else float(total)
+
+    @property
+    def effective_n(self):
+        """Kish effective sample size of the accumulated (survey) weights."""
+        return float(self.n) ** 2 / self.weight_sq if self.weight_sq > 0 else 0.0
+
+    def group_metrics(self):
+        """Overall performance (GroupMetrics) of everything accumulated so far."""
+        return GroupMetrics.from_counts(self.counts.sum(axis=0))
+
+    def finalize(self):
+        return FairnessMetrics.from_counts(
+            self.counts, np.array(self.groups, dtype=object), self.privileged_value
+        )
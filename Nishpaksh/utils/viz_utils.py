@@ -17,6 +17,8 @@ from matplotlib.figure import Figure
 from matplotlib.axes import Axes
 import seaborn as sns
 
+from utils.two_class_metrics import RATIO_METRICS, match_value
+
 #  styling
 plt.style.use('seaborn-v0_8-darkgrid')
 sns.set_palette("husl")
@@ -57,11 +59,11 @@ def _sort_models_axis(df: pd.DataFrame, metric: str) -> pd.DataFrame:
 
 
 def _as01(arr, positive: Optional[object] = None) -> np.ndarray:
-    """Coerce labels to {0,1}. If positive provided, equality->1 else 0."""
+    """Coerce labels to {0,1}. If positive provided, match_value->1 else 0."""
     a = pd.Series(arr).copy()
 
     if positive is not None:
-        return (a.astype(str) == str(positive)).astype(int).to_numpy()
+        return match_value(a, positive).astype(int)
 
     uniq = pd.unique(a.dropna())
     # Already numeric {0,1}?
@@ -89,6 +91,37 @@ def _as01(arr, positive: Optional[object] = None) -> np.ndarray:
     return a.notna().astype(int).to_numpy()
 
 
+def _as01_matrix(frame: pd.DataFrame, positive: object) -> np.ndarray:
+    """
+    Stack columns into an (n x M) int8 {0,1} matrix, 1 where a value
+    matches `positive` (match_value, the rule of _as01). Numeric columns
+    sharing a dtype are compared with the number together instead of being
+    converted to strings one by one.
+    """
+    out = np.zeros(frame.shape, dtype=np.int8)
+    try:
+        num = float(positive)
+    except (TypeError, ValueError, OverflowError):
+        num = None
+
+    by_dtype: Dict[object, List[int]] = {}
+    for j, dt in enumerate(frame.dtypes):
+        by_dtype.setdefault(dt, []).append(j)
+
+    for dt, idx in by_dtype.items():
+        if isinstance(dt, np.dtype) and dt.kind in "iuf":
+            # Text equality of a number implies numeric equality; "nan" matches missing values
+            if num is None:
+                continue
+            block = frame.iloc[:, idx].to_numpy()
+            with np.errstate(invalid="ignore"):
+                out[:, idx] = np.isnan(block) if np.isnan(num) else (block == num)
+        else:
+            for j in idx:
+                out[:, j] = match_value(frame.iloc[:, j], positive)
+    return out
+
+
 def _setup_professional_style(fig: Figure, ax: Axes):
     """Apply professional styling to figure and axes."""
     ax.spines['top'].set_visible(False)
@@ -171,8 +204,13 @@ def plot_fairness_error_bars(
     metrics_bootstrap: Dict[str, Dict[str, List[float]]],
     ci: float = 95.0,
     title: str = "Fairness metrics (bootstrap CI)",
+    intervals: Optional[pd.DataFrame] = None,
 ) -> Figure:
-    if not metrics_bootstrap:
+    """
+    Bars with CI whiskers per metric and model, either from bootstrap
+    samples or from precomputed (Metric, Model, Mean, Lower, Upper) rows.
+    """
+    if not metrics_bootstrap and intervals is None:
         fig, ax = plt.subplots(figsize=(10, 6))
         ax.text(0.5, 0.5, title, ha='center', va='center', fontsize=14)
         return fig
@@ -180,7 +218,11 @@ def plot_fairness_error_bars(
     records: List[dict] = []
     alpha = (100.0 - ci) / 2.0
 
-    for metric, per_model in metrics_bootstrap.items():
+    if intervals is not None:
+        finite = intervals[["Mean", "Lower", "Upper"]].apply(np.isfinite).all(axis=1)
+        records = intervals[finite].to_dict("records")
+
+    for metric, per_model in (metrics_bootstrap or {}).items():
         for model, values in per_model.items():
             if not values:
                 continue
@@ -388,6 +430,60 @@ def plot_fairness_accuracy_scatter(
     return fig
 
 
+# ============ threshold sweep ============
+
+def plot_threshold_sweep(
+    curve: pd.DataFrame,
+    metrics: List[str],
+    limits: Optional[Dict[str, float]] = None,
+    operating_point: Optional[float] = None,
+    performance_metric: str = "Accuracy",
+    title: str = "Fairness across decision thresholds",
+) -> Figure:
+    """Fairness metrics (left axis) and a performance metric (right axis) against the threshold."""
+    limits = limits or {}
+    metrics = [m for m in metrics if m in curve.columns]
+
+    fig, ax = plt.subplots(figsize=(10, 5))
+    if curve.empty or not metrics:
+        ax.text(0.5, 0.5, "No threshold curve available", ha="center", va="center", fontsize=12)
+        ax.set_title(title)
+        return fig
+
+    x = curve["Threshold"].to_numpy()
+    for i, m in enumerate(metrics):
+        color = MODEL_COLORS[i % len(MODEL_COLORS)]
+        ax.plot(x, _coerce_numeric(curve[m]), linewidth=2, color=color, label=m)
+        if m in limits:
+            ideal = 1.0 if m in RATIO_METRICS else 0.0
+            ax.axhspan(ideal - limits[m], ideal + limits[m], color=color, alpha=0.08)
+
+    ax.set_xlabel("Decision threshold", fontsize=11, fontweight="bold")
+    ax.set_ylabel("Fairness metric", fontsize=11, fontweight="bold")
+    ax.set_title(title, fontsize=13, fontweight="bold", pad=10)
+    _setup_professional_style(fig, ax)
+
+    handles, labels = ax.get_legend_handles_labels()
+    if performance_metric in curve.columns:
+        ax2 = ax.twinx()
+        line, = ax2.plot(x, _coerce_numeric(curve[performance_metric]), linestyle="--",
+                         linewidth=2, color=COLORS['grey'], label=performance_metric)
+        ax2.set_ylabel(performance_metric, fontsize=11, fontweight="bold")
+        ax2.grid(False)
+        handles.append(line)
+        labels.append(performance_metric)
+
+    if operating_point is not None:
+        handles.append(ax.axvline(operating_point, color=COLORS['danger'], linestyle=":",
+                                  linewidth=2, label="Operating point"))
+        labels.append("Operating point")
+
+    ax.legend(handles, labels, fontsize=9, framealpha=0.95, edgecolor="black",
+              loc="center left", bbox_to_anchor=(1.12, 0.5))
+    plt.tight_layout()
+    return fig
+
+
 # ============ disparity in performance ============
 
 def _group_error_breakdown(